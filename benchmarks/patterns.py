@@ -0,0 +1,74 @@
+"""
+Evaluations per second of content rules matching thousands of substrings,
+prefixes and suffixes on the same string variable, with and without the
+pattern index of RuleSet.
+
+    PYTHONPATH=. python benchmarks/patterns.py [rules] [evaluations]
+"""
+import random
+import string
+import sys
+import time
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.multipattern import AhoCorasick
+from business_rules.ruleset import RuleSet
+from business_rules.variables import BaseVariables, string_rule_variable
+
+
+class ContentVariables(BaseVariables):
+
+    def __init__(self, description):
+        self._description = description
+
+    @string_rule_variable()
+    def description(self):
+        return self._description
+
+
+def random_word(rng, length):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def generate_rules(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'conditions': {'name': 'description',
+                       'operator': rng.choice(['contains', 'contains',
+                                               'starts_with', 'ends_with']),
+                       'value': random_word(rng, rng.randint(4, 8))},
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': index}}],
+    } for index in range(count)]
+
+
+def generate_descriptions(count, seed=1):
+    rng = random.Random(seed)
+    return [' '.join(random_word(rng, rng.randint(2, 9))
+                     for _ in range(40)) for _ in range(count)]
+
+
+def measure(rule_set, descriptions):
+    actions = ReturnNumericActions()
+    start = time.perf_counter()
+    for description in descriptions:
+        rule_set.run_sync(ContentVariables(description), actions,
+                          stop_on_first_trigger=False)
+    return len(descriptions) / (time.perf_counter() - start)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    evaluations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rules = generate_rules(count)
+    descriptions = generate_descriptions(evaluations)
+    print(f'{count} rules, {evaluations} descriptions, automaton backend: '
+          f'{AhoCorasick([]).backend}')
+    for use_pattern_index in (False, True):
+        rule_set = RuleSet(rules, use_pattern_index=use_pattern_index)
+        print(f'pattern index {"on " if use_pattern_index else "off"}: '
+              f'{measure(rule_set, descriptions):10.0f} evaluations/s')
+
+
+if __name__ == '__main__':
+    main()
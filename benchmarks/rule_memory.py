@@ -0,0 +1,63 @@
+"""
+Memory used per rule by the rule dicts parsed from JSON and by the compact
+model built from them.
+
+    PYTHONPATH=. python benchmarks/rule_memory.py [number_of_rules]
+"""
+import json
+import random
+import sys
+import tracemalloc
+
+from business_rules.model import build_rules
+
+VARIABLES = [f'variable_{index}' for index in range(50)]
+OPERATORS = ['equal_to', 'greater_than', 'less_than', 'starts_with',
+             'contains']
+
+
+def generate_rules(count, seed=0):
+    """ Rule dicts with the shape and the repetition of real rule sets """
+    rng = random.Random(seed)
+    rules = []
+    for index in range(count):
+        conditions = [{
+            'name': rng.choice(VARIABLES),
+            'operator': rng.choice(OPERATORS),
+            'value': rng.choice([rng.randint(0, 100),
+                                 f'value {rng.randint(0, 20)}',
+                                 ['a', 'b', 'c']]),
+        } for _ in range(rng.randint(2, 6))]
+        rules.append({
+            'id': index,
+            'conditions': {'all': [conditions[0], {'any': conditions[1:]}]},
+            'actions': [{'name': 'set_discount',
+                         'params': {'percent': rng.choice([5, 10, 15])}}],
+        })
+    return rules
+
+
+def measure(load):
+    tracemalloc.start()
+    result = load()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    document = json.dumps(generate_rules(count))
+
+    rules, dict_size = measure(lambda: json.loads(document))
+    model, model_size = measure(lambda: build_rules(json.loads(document)))
+    assert [rule.to_dict() for rule in model[:100]] == rules[:100]
+
+    print(f'{count} rules')
+    print(f'dicts: {dict_size / count:8.0f} bytes per rule')
+    print(f'model: {model_size / count:8.0f} bytes per rule '
+          f'({model_size / dict_size:.0%})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Throughput of run_sync over a shared rule set and result cache with an
+increasing number of threads, relative to one thread, printed with the
+number of cores and whether the GIL is enabled.
+
+    PYTHONPATH=. python benchmarks/threads.py [evaluations_per_thread]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+from business_rules.actions import BaseActions, rule_action
+from business_rules.cache import ResultCache
+from business_rules.fields import FIELD_NUMERIC
+from business_rules.model import build_rules
+from business_rules.ruleset import RuleSet
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+REGIONS = ['north', 'south', 'east', 'west']
+
+
+class ProductVariables(BaseVariables):
+
+    def __init__(self, product):
+        self.product = product
+
+    @numeric_rule_variable()
+    def price(self):
+        return self.product['price']
+
+    @numeric_rule_variable()
+    def stock(self):
+        return self.product['stock']
+
+    @string_rule_variable()
+    def region(self):
+        return self.product['region']
+
+
+class ProductActions(BaseActions):
+
+    @rule_action(params={'percent': FIELD_NUMERIC})
+    def set_discount(self, percent):
+        return percent
+
+
+def generate_rules(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'priority': rng.randint(0, 10),
+        'conditions': {'all': [
+            {'name': 'region', 'operator': 'equal_to',
+             'value': rng.choice(REGIONS)},
+            {'name': 'price', 'operator': 'greater_than',
+             'value': rng.randint(0, 100)},
+            {'any': [
+                {'name': 'stock', 'operator': 'less_than',
+                 'value': rng.randint(0, 50)},
+                {'name': 'region', 'operator': 'starts_with',
+                 'value': rng.choice('nsew')},
+            ]},
+        ]},
+        'actions': [{'name': 'set_discount',
+                     'params': {'percent': rng.choice([5, 10, 15])}}],
+    } for _ in range(count)]
+
+
+def generate_products(count, seed=1):
+    rng = random.Random(seed)
+    return [{'price': rng.randint(0, 120), 'stock': rng.randint(0, 60),
+             'region': rng.choice(REGIONS)} for _ in range(count)]
+
+
+def measure(threads, rule_set, products, evaluations, result_cache):
+    barrier = threading.Barrier(threads + 1)
+    actions = ProductActions()
+
+    def work():
+        barrier.wait()
+        for index in range(evaluations):
+            rule_set.run_sync(ProductVariables(products[index % len(products)]),
+                              actions, stop_on_first_trigger=False,
+                              result_cache=result_cache)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return threads * evaluations / (time.perf_counter() - start)
+
+
+def main():
+    evaluations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    rule_set = RuleSet(build_rules(generate_rules(50)),
+                       use_decision_table=False)
+    products = generate_products(500)
+    result_cache = ResultCache(max_size=100000, shards=64)
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+
+    print(f'{os.cpu_count()} cores, GIL {"enabled" if gil else "disabled"}')
+    baseline = None
+    threads = 1
+    while threads <= 2 * (os.cpu_count() or 1):
+        throughput = measure(threads, rule_set, products, evaluations,
+                             result_cache)
+        baseline = baseline or throughput
+        print(f'{threads:3} threads: {throughput:10.0f} evaluations/s '
+              f'({throughput / baseline:.1f}x)')
+        threads *= 2
+    print(f'result cache: {result_cache.stats}')
+
+
+if __name__ == '__main__':
+    main()
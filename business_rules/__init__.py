@@ -1,4 +1,5 @@
-from .engine import run
+from .engine import run, run_all
+from .sync_engine import run_all_sync, run_sync
 from .utils import export_rule_data
 
 
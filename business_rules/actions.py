@@ -25,8 +25,11 @@ def _validate_action_parameters(func, params):
                         field_type, func.__name__, param_name))
 
 
-def rule_action(label=None, params=None):
+def rule_action(label=None, params=None, blocking=None):
     """ Decorator to make a function into a rule action
+
+    - blocking - whether the async engine calls the function in a thread
+      pool, see variables.rule_variable
     """
 
     def wrapper(func):
@@ -40,6 +43,7 @@ def rule_action(label=None, params=None):
         func.is_rule_action = True
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.params = params_
+        func.blocking = blocking
         return func
 
     return wrapper
@@ -50,6 +54,17 @@ class BaseActions(object):
     engine should inherit from this.
     """
 
+    # Set when the class is defined, see BaseVariables
+    has_coroutine_actions = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.has_coroutine_actions = any(
+            inspect.iscoroutinefunction(m[1])
+            for m in inspect.getmembers(cls)
+            if getattr(m[1], 'is_rule_action', False)
+        )
+
     @classmethod
     def get_all_actions(cls):
         methods = inspect.getmembers(cls)
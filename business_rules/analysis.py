@@ -0,0 +1,249 @@
+import json
+
+from .engine import get_rule_priority
+from .operators import SelectType, StringType
+from .optimizer import _bound, _tighter_lower, _tighter_upper, simplify
+from .utils import json_default
+
+_SUBSTRING_OPERATORS = ('starts_with', 'ends_with', 'contains')
+# string operators only true for values containing the condition's value
+_CONTAINING_OPERATORS = (
+    ('equal_to', 'equal_to_case_insensitive') + _SUBSTRING_OPERATORS)
+
+
+def analyze_rules(rules: list, variables=None) -> dict:
+    """
+    Find the rules of a rule list that can be dropped without changing which
+    actions can be triggered, nor the actions of the first rule triggered
+    when the rules are checked in priority order (`stop_on_first_trigger`):
+    - duplicates: rules with the same conditions and actions as a rule
+      checked before them
+    - subsumed: rules whose conditions imply the conditions of another rule
+      with the same actions, so the other rule triggers whenever they do.
+      The other rule is checked first, or no rule with other actions is
+      checked between them.
+    - never_fire: rules whose conditions can never be true
+
+    The implication check is sound but not complete: it uses numeric bounds
+    and, when the variables class is given to know the field types, the
+    string and select operator semantics.
+
+    :param rules: list of rule dicts
+    :param variables: optional BaseVariables subclass defining the variables
+    :return:
+    {
+        'duplicates': [{'index': index, 'duplicate_of': other_index}],
+        'subsumed': [{'index': index, 'subsumed_by': other_index}],
+        'never_fire': [index]
+    }
+    """
+    field_types = {}
+    if variables is not None:
+        field_types = {variable['name']: variable['field_type']
+                       for variable in variables.get_all_variables()}
+
+    report = {'duplicates': [], 'subsumed': [], 'never_fire': []}
+    simplified = []
+    removed = set()
+    for index, rule in enumerate(rules):
+        conditions, _ = simplify(rule['conditions'])
+        simplified.append(conditions)
+        if conditions is False:
+            report['never_fire'].append(index)
+            removed.add(index)
+
+    # the indexes in the order the rules are checked, see engine.sort_rules
+    order = sorted(range(len(rules)),
+                   key=lambda index: -get_rule_priority(rules[index]))
+    rank = {index: position for position, index in enumerate(order)}
+    actions = [_canonical(rule['actions']) for rule in rules]
+    never_fire = set(removed)
+
+    def checked_between(index, other):
+        """ Whether the rules checked between the two rules that can
+        trigger all have the actions of `index` """
+        start, end = sorted((rank[index], rank[other]))
+        return all(actions[between] == actions[index]
+                   or between in never_fire
+                   for between in order[start + 1:end])
+
+    seen = {}
+    by_actions = {}
+    for index in order:
+        if index in removed:
+            continue
+        key = _canonical(rules[index]['conditions']), actions[index]
+        if key in seen:
+            report['duplicates'].append(
+                {'index': index, 'duplicate_of': seen[key]})
+            removed.add(index)
+            continue
+        seen[key] = index
+        by_actions.setdefault(key[1], []).append(index)
+
+    for indexes in by_actions.values():
+        for index in indexes:
+            for other in indexes:
+                if other == index or other in removed:
+                    continue
+                if not implies(simplified[index], simplified[other],
+                               field_types):
+                    continue
+                # equivalent rules: keep the one checked first
+                if rank[other] > rank[index] and implies(
+                        simplified[other], simplified[index], field_types):
+                    continue
+                # the other rule checked later: a rule checked between them
+                # could trigger in place of the dropped one
+                if rank[other] > rank[index] and not checked_between(
+                        index, other):
+                    continue
+                report['subsumed'].append(
+                    {'index': index, 'subsumed_by': other})
+                removed.add(index)
+                break
+
+    report['duplicates'].sort(key=lambda item: item['index'])
+    report['subsumed'].sort(key=lambda item: item['index'])
+    return report
+
+
+def prune_rules(rules: list, variables=None, report: dict = None) -> list:
+    """ The rules that remain once the rules reported by analyze_rules are
+    dropped, in their original order """
+    if report is None:
+        report = analyze_rules(rules, variables)
+    removed = set(report['never_fire'])
+    removed.update(item['index'] for item in report['duplicates'])
+    removed.update(item['index'] for item in report['subsumed'])
+    return [rule for index, rule in enumerate(rules) if index not in removed]
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, default=json_default)
+
+
+def _kind(conditions):
+    if isinstance(conditions, bool):
+        return conditions
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        return keys[0]
+    return 'condition'
+
+
+def implies(conditions, other, field_types=None) -> bool:
+    """ Whether `conditions` being true guarantees `other` is true """
+    kind, other_kind = _kind(conditions), _kind(other)
+    if kind is False or other_kind is True:
+        return True
+    if kind is True or other_kind is False:
+        return False
+    if other_kind == 'all':
+        return all(implies(conditions, condition, field_types)
+                   for condition in other['all'])
+    if kind == 'any':
+        return all(implies(condition, other, field_types)
+                   for condition in conditions['any'])
+    if other_kind == 'any' and any(
+            implies(conditions, condition, field_types)
+            for condition in other['any']):
+        return True
+    if kind == 'all':
+        return any(implies(condition, other, field_types)
+                   for condition in conditions['all'])
+    if other_kind == 'condition':
+        return condition_implies(conditions, other, field_types)
+    return False
+
+
+def condition_implies(condition, other, field_types=None) -> bool:
+    """ Whether the single condition `condition` implies `other` """
+    if condition == other:
+        return True
+    if (condition['name'] != other['name']
+            or condition.get('value_is_variable')
+            or other.get('value_is_variable')):
+        return False
+
+    bound, other_bound = _bound(condition), _bound(other)
+    if bound is not None and other_bound is not None:
+        return _within(bound, other_bound)
+
+    field_type = (field_types or {}).get(condition['name'])
+    if field_type == StringType.name:
+        return _string_implies(condition, other)
+    if field_type == SelectType.name:
+        return (condition['operator'] == other['operator'] == 'contains'
+                and SelectType._case_insensitive_equal_to(
+                    condition['value'], other['value']))
+    if field_type == 'select_multiple':
+        return _select_multiple_implies(condition, other)
+    return False
+
+
+def _within(bound, other_bound):
+    """ Whether the interval `bound` is inside `other_bound` """
+    (lower, upper), (other_lower, other_upper) = bound, other_bound
+    if other_lower is not None and (
+            lower is None or _tighter_lower(other_lower, lower)):
+        return False
+    if other_upper is not None and (
+            upper is None or _tighter_upper(other_upper, upper)):
+        return False
+    return True
+
+
+def _string_implies(condition, other):
+    operator, value = condition['operator'], condition['value']
+    other_operator, other_value = other['operator'], other['value']
+    if not isinstance(value, str):
+        return False
+    if other_operator == 'non_empty':
+        return operator in _CONTAINING_OPERATORS and bool(value)
+    if not isinstance(other_value, str):
+        return False
+
+    if operator == 'equal_to':
+        # the variable value is known: evaluate the other operator on it
+        try:
+            return bool(getattr(StringType(value), other_operator)(other_value))
+        except (AssertionError, AttributeError, TypeError):
+            return False
+
+    if operator == other_operator == 'equal_to_case_insensitive':
+        return value.lower() == other_value.lower()
+
+    if operator in _SUBSTRING_OPERATORS:
+        if other_operator == 'contains':
+            return other_value in value
+        if other_operator == operator == 'starts_with':
+            return value.startswith(other_value)
+        if other_operator == operator == 'ends_with':
+            return value.endswith(other_value)
+    return False
+
+
+def _select_multiple_implies(condition, other):
+    operator, other_operator = condition['operator'], other['operator']
+    try:
+        values = {_fold_case(value) for value in condition['value']}
+        other_values = {_fold_case(value) for value in other['value']}
+    except TypeError:
+        return False
+
+    if operator == 'contains_all':
+        if other_operator == 'contains_all':
+            return other_values <= values
+        if other_operator == 'shares_at_least_one_element_with':
+            return bool(values & other_values)
+    if operator == other_operator == 'is_contained_by':
+        return values <= other_values
+    if operator == 'is_contained_by' and other_operator == \
+            'shares_no_elements_with':
+        return not values & other_values
+    return False
+
+
+def _fold_case(value):
+    return value.lower() if isinstance(value, str) else value
@@ -0,0 +1,160 @@
+import asyncio
+import inspect
+import logging
+import threading
+import weakref
+from collections.abc import Mapping
+
+from .cache import _MISSING, ShardedVariableCache
+
+logger = logging.getLogger(__name__)
+
+
+class _LoopState:
+    """ Keys waiting for the next dispatch and keys being loaded, for one
+    event loop """
+
+    def __init__(self):
+        self.pending = {}
+        self.in_flight = {}
+        self.scheduled = False
+
+
+class BatchLoader:
+    """
+    Collects the keys requested during one event loop iteration, by every
+    evaluation running on the loop, and loads them with a single call of
+    `load`. Each caller gets the value of its own key.
+
+    `load` is a function or coroutine function of the list of keys,
+    returning the values in the same order or a mapping of key to value.
+    """
+
+    def __init__(self, load, max_batch_size=None, cache_ttl=None,
+                 max_cache_size=10000):
+        if max_batch_size is not None and max_batch_size < 1:
+            raise AssertionError('max_batch_size must be at least 1')
+        self.load_function = load
+        self.max_batch_size = max_batch_size
+        self.cache_ttl = cache_ttl
+        self.cache = (ShardedVariableCache(max_size=max_cache_size)
+                      if cache_ttl is not None else None)
+        self.is_coroutine = inspect.iscoroutinefunction(load)
+        self.batches = 0
+        self.keys_loaded = 0
+        self._states = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            batches, keys_loaded = self.batches, self.keys_loaded
+        return {
+            'batches': batches,
+            'keys_loaded': keys_loaded,
+            'cache_size': len(self.cache) if self.cache is not None else 0,
+        }
+
+    def _state(self, loop):
+        with self._lock:
+            state = self._states.get(loop)
+            if state is None:
+                state = self._states[loop] = _LoopState()
+            return state
+
+    async def load(self, key):
+        """ The value of `key`, loaded in a batch with the other keys
+        requested in the same loop iteration """
+        if self.cache is not None:
+            value = self.cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        future = state.pending.get(key)
+        if future is None:
+            future = state.in_flight.get(key)
+        if future is None:
+            future = loop.create_future()
+            state.pending[key] = future
+            if not state.scheduled:
+                state.scheduled = True
+                loop.call_soon(self._dispatch, loop, state)
+        # a cancelled caller must not cancel the other callers of the key
+        return await asyncio.shield(future)
+
+    def load_sync(self, key):
+        """ Load a single key without an event loop """
+        if self.is_coroutine:
+            raise AssertionError(
+                'Batch loader {0} is a coroutine, use engine.run'.format(
+                    getattr(self.load_function, '__name__',
+                            self.load_function)))
+        if self.cache is not None:
+            value = self.cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+        value = self._values([key], self.load_function([key]))[0]
+        if isinstance(value, Exception):
+            raise value
+        if self.cache is not None:
+            self.cache.set(key, value, self.cache_ttl)
+        return value
+
+    def _dispatch(self, loop, state):
+        keys = list(state.pending)
+        futures = state.pending
+        state.pending = {}
+        state.scheduled = False
+        size = self.max_batch_size or len(keys)
+        for start in range(0, len(keys), size):
+            batch = {key: futures[key] for key in keys[start:start + size]}
+            state.in_flight.update(batch)
+            loop.create_task(self._load_batch(state, batch))
+
+    async def _load_batch(self, state, batch):
+        keys = list(batch)
+        with self._lock:
+            self.batches += 1
+            self.keys_loaded += len(keys)
+        logger.debug(f'business-rules batch of {len(keys)} keys')
+        try:
+            values = self.load_function(keys)
+            if asyncio.iscoroutine(values):
+                values = await values
+            values = self._values(keys, values)
+        except Exception as error:
+            values = [error] * len(keys)
+        except BaseException:
+            # cancelled or interrupted: the callers must not wait forever
+            for future in batch.values():
+                future.cancel()
+            raise
+        finally:
+            for key in keys:
+                state.in_flight.pop(key, None)
+
+        for key, value in zip(keys, values):
+            future = batch[key]
+            if future.done():
+                continue
+            if isinstance(value, Exception):
+                future.set_exception(value)
+                continue
+            if self.cache is not None:
+                self.cache.set(key, value, self.cache_ttl)
+            future.set_result(value)
+
+    def _values(self, keys, values):
+        """ The value, or the exception to raise, of every key """
+        if isinstance(values, Mapping):
+            return [values[key] if key in values else KeyError(
+                f'Batch loader returned no value for {key!r}')
+                for key in keys]
+        values = list(values)
+        if len(values) != len(keys):
+            raise AssertionError(
+                f'Batch loader returned {len(values)} values for '
+                f'{len(keys)} keys')
+        return values
@@ -0,0 +1,326 @@
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .utils import json_default
+
+_MISSING = object()
+
+
+def freeze_value(value):
+    """ Convert a variable value into a hashable equivalent """
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(freeze_value(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, freeze_value(item))
+                            for key, item in value.items()))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return value
+
+
+class _ResultShard:
+    """ Entries and statistics of the keys of one ResultCache shard """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+
+class ResultCache:
+    """
+    Bounded cache of condition outcomes keyed by the rule set version, the
+    conditions and the values of the variables the conditions read.
+    Entries expire after `ttl` seconds (never when None) and the least
+    recently used entry is evicted once `max_size` is reached.
+
+    With several `shards`, keys are spread by hash over shards with their
+    own lock and statistics, so that threads contend less; each shard then
+    evicts its own least recently used entries.
+    """
+
+    def __init__(self, max_size=10000, ttl=None, version=0, shards=1):
+        if shards < 1:
+            raise AssertionError('shards must be at least 1')
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self._shard_size = -(-max_size // shards)
+        self._shards = tuple(_ResultShard() for _ in range(shards))
+        self._condition_keys = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def _shard(self, key):
+        if len(self._shards) == 1:
+            return self._shards[0]
+        return self._shards[hash(key) % len(self._shards)]
+
+    def condition_key(self, conditions) -> str:
+        """ Canonical key of a condition tree, memoized per tree object """
+        cached = self._condition_keys.get(id(conditions))
+        if cached is not None and cached[0] is conditions:
+            return cached[1]
+        key = json.dumps(conditions, sort_keys=True, default=json_default)
+        with self._lock:
+            if len(self._condition_keys) >= self.max_size:
+                self._condition_keys.clear()
+            self._condition_keys[id(conditions)] = (conditions, key)
+        return key
+
+    def make_key(self, conditions, values: dict) -> tuple:
+        """ Key of the outcome of `conditions` for the variable `values` """
+        fingerprint = tuple(sorted(
+            (name, freeze_value(value)) for name, value in values.items()))
+        return self.version, self.condition_key(conditions), fingerprint
+
+    def get(self, key, default=None):
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key, _MISSING)
+            if entry is _MISSING:
+                shard.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del shard.entries[key]
+                shard.expirations += 1
+                shard.misses += 1
+                return default
+            shard.entries.move_to_end(key)
+            shard.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        shard = self._shard(key)
+        with shard.lock:
+            shard.entries[key] = (expires_at, value)
+            shard.entries.move_to_end(key)
+            while len(shard.entries) > self._shard_size:
+                shard.entries.popitem(last=False)
+                shard.evictions += 1
+
+    def bump_version(self):
+        """ Invalidate every entry, e.g. after the rule set changed """
+        with self._lock:
+            self.version += 1
+            self._condition_keys.clear()
+        self._clear_entries()
+
+    def clear(self):
+        with self._lock:
+            self._condition_keys.clear()
+        self._clear_entries()
+
+    def _clear_entries(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+
+    def _total(self, counter):
+        return sum(getattr(shard, counter) for shard in self._shards)
+
+    @property
+    def hits(self):
+        return self._total('hits')
+
+    @property
+    def misses(self):
+        return self._total('misses')
+
+    @property
+    def evictions(self):
+        return self._total('evictions')
+
+    @property
+    def expirations(self):
+        return self._total('expirations')
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class VariableCache:
+    """
+    Cache of variable values shared by threads and event loops. Concurrent
+    misses of the same key are deduplicated: the first caller computes the
+    value and the others wait for its result.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._values = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get(key, default)
+
+    def _get(self, key, default):
+        entry = self._values.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._values[key]
+            return default
+        self._values.move_to_end(key)
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._set(key, value, expires_at)
+
+    def _set(self, key, value, expires_at):
+        self._values[key] = (expires_at, value)
+        self._values.move_to_end(key)
+        if self.max_size is not None:
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _claim(self, key):
+        """ Return the cached value, the future of the pending computation,
+        or a new future the caller is responsible for resolving """
+        with self._lock:
+            value = self._get(key, _MISSING)
+            if value is not _MISSING:
+                return 'hit', value
+            future = self._pending.get(key)
+            if future is not None:
+                return 'wait', future
+            future = Future()
+            self._pending[key] = future
+            return 'own', future
+
+    def _release(self, key, future, value=_MISSING, ttl=None, error=None):
+        with self._lock:
+            if value is not _MISSING:
+                expires_at = (None if ttl is None
+                              else time.monotonic() + ttl)
+                self._set(key, value, expires_at)
+            del self._pending[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+
+    async def get_or_compute(self, key, compute, ttl=None):
+        """ Return the cached value of key, computing it with `compute`
+        (a function or coroutine function) on a miss """
+        while True:
+            state, payload = self._claim(key)
+            if state == 'hit':
+                return payload
+            if state == 'wait':
+                value = await asyncio.shield(asyncio.wrap_future(payload))
+                if value is _MISSING:
+                    # the computing caller was cancelled, try again
+                    continue
+                return value
+
+            try:
+                value = compute()
+                if asyncio.iscoroutine(value):
+                    value = await value
+            except asyncio.CancelledError:
+                self._release(key, payload)
+                raise
+            except Exception as error:
+                self._release(key, payload, error=error)
+                raise
+            self._release(key, payload, value, ttl)
+            return value
+
+    def get_or_compute_sync(self, key, compute, ttl=None):
+        """ Blocking variant of get_or_compute for synchronous `compute` """
+        while True:
+            state, payload = self._claim(key)
+            if state == 'hit':
+                return payload
+            if state == 'wait':
+                value = payload.result()
+                if value is _MISSING:
+                    continue
+                return value
+
+            try:
+                value = compute()
+            except Exception as error:
+                self._release(key, payload, error=error)
+                raise
+            except BaseException:
+                self._release(key, payload)
+                raise
+            self._release(key, payload, value, ttl)
+            return value
+
+
+class ShardedVariableCache:
+    """
+    VariableCache split by key hash into shards with their own lock, for
+    caches shared by many threads. Each shard evicts its own least recently
+    used entries.
+    """
+
+    def __init__(self, max_size=None, shards=16):
+        if shards < 1:
+            raise AssertionError('shards must be at least 1')
+        self.max_size = max_size
+        shard_size = None if max_size is None else -(-max_size // shards)
+        self.shards = tuple(VariableCache(max_size=shard_size)
+                            for _ in range(shards))
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def shard(self, key) -> VariableCache:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def get(self, key, default=None):
+        return self.shard(key).get(key, default)
+
+    def set(self, key, value, ttl=None):
+        self.shard(key).set(key, value, ttl)
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+    async def get_or_compute(self, key, compute, ttl=None):
+        return await self.shard(key).get_or_compute(key, compute, ttl)
+
+    def get_or_compute_sync(self, key, compute, ttl=None):
+        return self.shard(key).get_or_compute_sync(key, compute, ttl)
+
+
+GLOBAL_VARIABLE_CACHE = ShardedVariableCache(max_size=100000)
@@ -0,0 +1,244 @@
+"""
+Command line entry point:
+
+    python -m business_rules eval --rules rules.json --facts facts.jsonl
+
+Each line of the facts file is a JSON object of variable values, typed by
+the --schema file or after the values. Each line of the output is the
+actions triggered by one fact:
+
+    {"fact": 0, "actions": [{"name": "put_on_sale", "params": {...}}]}
+
+Facts are read, evaluated and written in batches; at most two batches per
+worker are in flight, so memory doesn't grow with the input.
+"""
+import argparse
+import collections
+import json
+import multiprocessing
+import sys
+import time
+
+from .actions import BaseActions
+from .loader import load_rules
+from .ruleset import RuleSet
+from .utils import json_default
+from .variables import MappingSchema, MappingVariables, infer_field_type
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class FactVariables(MappingVariables):
+    """
+    Variables reading the values of a plain mapping without a schema,
+    typed after the value: booleans, numbers, strings and lists. Missing
+    variables are undefined.
+    """
+
+    def __init__(self, values):
+        super().__init__(values, None)
+
+    def get_variable(self, name):
+        if name not in self.values:
+            raise AssertionError(
+                'Variable {0} is not defined in the facts'.format(name))
+        field_type = infer_field_type(self.values[name])
+        return field_type, field_type.cast(self.values[name])
+
+
+class RecordingActions(BaseActions):
+    """ Actions that only record that they were triggered """
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return _record
+
+
+def _record(**params):
+    return None
+
+
+class Evaluator:
+    """ The rules of a file, evaluated against one batch of fact lines at a
+    time """
+
+    def __init__(self, rules_path, first_match=False, schema_path=None):
+        self.errors = []
+        self.schema = None
+        if schema_path is not None:
+            self.schema = load_schema(schema_path)
+        self.rule_set = RuleSet(load_rules(rules_path, self.schema,
+                                           errors=self.errors))
+        self.first_match = first_match
+
+    def variables(self, facts):
+        if self.schema is None:
+            return FactVariables(facts)
+        return MappingVariables(facts, self.schema)
+
+    def evaluate(self, start, lines):
+        """ The output lines and the counts of one batch, `start` being the
+        index of its first fact """
+        output = []
+        counts = collections.Counter()
+        for index, line in enumerate(lines, start):
+            if not line.strip():
+                continue
+            counts['facts'] += 1
+            try:
+                facts = json.loads(line)
+                if not isinstance(facts, dict):
+                    raise ValueError('fact line is not a JSON object')
+                results = self.rule_set.run_sync(
+                    self.variables(facts), RecordingActions(),
+                    stop_on_first_trigger=self.first_match)
+            except Exception as error:
+                counts['errors'] += 1
+                output.append(json.dumps({'fact': index, 'error': str(
+                    error)}))
+                continue
+            if results:
+                counts['triggered'] += 1
+                counts['actions'] += len(results)
+                output.append(json.dumps({'fact': index, 'actions': [
+                    {'name': result['action_name'],
+                     'params': result['action_params']}
+                    for result in results]}, default=json_default))
+        return output, counts
+
+
+def load_schema(path) -> MappingSchema:
+    """ The schema of a JSON file holding the output of export_rule_data,
+    its `variables` list, or an object of variable name to field type """
+    with open(path) as schema_file:
+        fields = json.load(schema_file)
+    if isinstance(fields, dict) and isinstance(fields.get('variables'),
+                                               list):
+        fields = fields['variables']
+    return MappingSchema(fields)
+
+
+# the evaluator of a worker process
+_evaluator = None
+
+
+def _init_worker(rules_path, first_match, schema_path):
+    global _evaluator
+    _evaluator = Evaluator(rules_path, first_match, schema_path)
+
+
+def _evaluate_batch(batch):
+    return _evaluator.evaluate(*batch)
+
+
+def _batches(lines, batch_size):
+    batch, start = [], 0
+    for index, line in enumerate(lines):
+        batch.append(line)
+        if len(batch) == batch_size:
+            yield start, batch
+            batch, start = [], index + 1
+    if batch:
+        yield start, batch
+
+
+def evaluate_facts(rules_path, facts, output, workers=1,
+                   batch_size=DEFAULT_BATCH_SIZE, first_match=False,
+                   rule_errors=None, schema_path=None):
+    """
+    Evaluate every fact line of `facts` and write the actions triggered to
+    `output`, in the order of the facts.
+    :param facts: iterable of JSON lines
+    :param output: text file
+    :param workers: number of worker processes, evaluated in this process
+        when 1
+    :param rule_errors: list receiving the rules that could not be loaded,
+        see loader.iter_rules
+    :param schema_path: file of the variable types, see load_schema
+    :return: counts of facts, facts triggering rules, actions, errors and
+        rules that could not be loaded
+    """
+    evaluator = Evaluator(rules_path, first_match, schema_path)
+    if rule_errors is not None:
+        rule_errors.extend(evaluator.errors)
+    totals = collections.Counter(rule_errors=len(evaluator.errors))
+    batches = _batches(facts, batch_size)
+
+    def write(result):
+        lines, counts = result
+        for line in lines:
+            output.write(line)
+            output.write('\n')
+        totals.update(counts)
+
+    if workers <= 1:
+        for batch in batches:
+            write(evaluator.evaluate(*batch))
+        return totals
+
+    with multiprocessing.Pool(workers, _init_worker,
+                              (rules_path, first_match, schema_path)) as pool:
+        pending = collections.deque()
+        for batch in batches:
+            pending.append(pool.apply_async(_evaluate_batch, (batch,)))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().get())
+        while pending:
+            write(pending.popleft().get())
+    return totals
+
+
+def _eval_command(args):
+    start = time.perf_counter()
+    rule_errors = []
+    facts = sys.stdin if args.facts == '-' else open(args.facts)
+    output = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        totals = evaluate_facts(args.rules, facts, output, args.workers,
+                                args.batch_size, args.first_match,
+                                rule_errors, args.schema)
+    finally:
+        if facts is not sys.stdin:
+            facts.close()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+    for error in rule_errors:
+        print(f'rule {error["index"]}: {error["error"]}', file=sys.stderr)
+    print(f'{totals["facts"]} facts, {totals["triggered"]} triggering '
+          f'{totals["actions"]} actions, {totals["errors"]} errors, '
+          f'{totals["rule_errors"]} invalid rules in {elapsed:.2f}s '
+          f'({totals["facts"] / elapsed if elapsed else 0:.0f} facts/s)',
+          file=sys.stderr)
+    # facts that failed are part of the output, invalid rules are not
+    return 1 if rule_errors else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m business_rules')
+    commands = parser.add_subparsers(dest='command', required=True)
+    evaluate = commands.add_parser(
+        'eval', help='evaluate rules against a JSON Lines file of facts')
+    evaluate.add_argument('--rules', required=True,
+                          help='JSON array or JSON Lines file of rules')
+    evaluate.add_argument('--facts', default='-',
+                          help='JSON Lines file of facts, - for stdin')
+    evaluate.add_argument('--output', default='-',
+                          help='JSON Lines file of the actions triggered, '
+                               '- for stdout')
+    evaluate.add_argument('--workers', type=int, default=1,
+                          help='number of worker processes')
+    evaluate.add_argument('--batch-size', type=int,
+                          default=DEFAULT_BATCH_SIZE,
+                          help='facts sent to a worker at a time')
+    evaluate.add_argument('--schema',
+                          help='JSON file of the variable types: the output '
+                               'of export_rule_data, its variables list or '
+                               'an object of variable name to type')
+    evaluate.add_argument('--first-match', action='store_true',
+                          help='only run the first rule triggered per fact')
+    args = parser.parse_args(argv)
+    if args.batch_size < 1:
+        parser.error('--batch-size must be at least 1')
+    return _eval_command(args)
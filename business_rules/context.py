@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from .cache import VariableCache
+from .profiling import active_profiler
+
+_current_context = ContextVar('business_rules_evaluation_context',
+                              default=None)
+
+
+class EvaluationContext:
+    """
+    State shared by every node of one evaluation. The engine binds a context
+    for the duration of `run` so that nested calls can reach it without
+    threading it through every signature.
+    """
+
+    def __init__(self, deadline=None, variable_timeout=None,
+                 on_timeout=None, concurrent=False, max_concurrency=None):
+        self.variable_cache = VariableCache()
+        self.prefetched = None
+        # absolute event loop time after which variables are not awaited
+        self.deadline = deadline
+        self.variable_timeout = variable_timeout
+        self.on_timeout = on_timeout
+        self.concurrent = concurrent
+        self.semaphore = (asyncio.Semaphore(max_concurrency)
+                          if max_concurrency else None)
+        # profiling.Profiler bound when the evaluation started, and the
+        # profile of the rule being checked
+        self.profiler = active_profiler()
+        self.rule_profile = None
+        # multipattern.PatternIndex of the rule set evaluated, and the
+        # patterns it found per variable and operator
+        self.pattern_index = None
+        self.pattern_matches = {}
+
+
+def get_context():
+    """ The evaluation context bound to the running task or thread """
+    return _current_context.get()
+
+
+@contextmanager
+def evaluation_context(context: EvaluationContext = None):
+    """ Bind `context`, or a new one when no context is bound yet, for the
+    duration of the block """
+    if context is None:
+        context = _current_context.get()
+        if context is not None:
+            yield context
+            return
+        context = EvaluationContext()
+
+    token = _current_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_context.reset(token)
@@ -0,0 +1,281 @@
+"""
+Evaluation of rules over whole pandas DataFrames or Arrow tables, one row
+per entity and one column per variable. Requires pandas.
+"""
+from .engine import get_rule_parts, get_rule_priority
+from .operators import BooleanType, NumericType, StringType
+
+try:
+    import numpy
+    import pandas as pd
+    from pandas.api import types as pd_types
+except ImportError:  # pragma: no cover
+    pd = None
+
+_EPSILON = float(NumericType.EPSILON)
+
+
+def _numeric(column):
+    return pd.to_numeric(column, errors='coerce').astype(float)
+
+
+def _string(column):
+    column = column.where(column.notna(), '')
+    return column.where(column.map(lambda value: isinstance(value, str)))
+
+
+def _boolean(column):
+    if pd_types.is_bool_dtype(column.dtype):
+        return column
+    return column.map(lambda value: value if isinstance(
+        value, (bool, numpy.bool_)) else None)
+
+
+# column-wise forms of the operators: functions of the column and of the
+# comparison value, a scalar or the column of another variable. Missing
+# values and values of another type never match.
+NUMERIC_OPERATORS = {
+    'equal_to': lambda column, other: (column - other).abs() <= _EPSILON,
+    'greater_than': lambda column, other: (column - other) > _EPSILON,
+    'greater_than_or_equal_to':
+        lambda column, other: (column - other) >= -_EPSILON,
+    'less_than': lambda column, other: (other - column) > _EPSILON,
+    'less_than_or_equal_to':
+        lambda column, other: (column - other) <= _EPSILON,
+}
+
+STRING_OPERATORS = {
+    'equal_to': lambda column, other: column == other,
+    'equal_to_case_insensitive':
+        lambda column, other: column.str.lower() == _lower(other),
+    'not_equal_to': lambda column, other: column.notna() & (column != other),
+    'not_equal_to_case_insensitive':
+        lambda column, other: column.notna() & (
+            column.str.lower() != _lower(other)),
+    'non_empty': lambda column, other: column.str.len() > 0,
+}
+
+# operators only vectorized for a constant comparison value
+NUMERIC_SCALAR_OPERATORS = {
+    'in_list': lambda column, other: _in_numbers(column, other),
+    'not_in_list':
+        lambda column, other: column.notna() & ~_in_numbers(column, other),
+}
+
+STRING_SCALAR_OPERATORS = {
+    'starts_with': lambda column, other: column.str.startswith(other),
+    'ends_with': lambda column, other: column.str.endswith(other),
+    'contains': lambda column, other: column.str.contains(other, regex=False),
+    'matches_regex': lambda column, other: column.str.contains(other),
+    'in_list': lambda column, other: column.isin(_strings(other)),
+    'in_list_case_insensitive':
+        lambda column, other: column.str.lower().isin(_strings(other, True)),
+    'not_in_list':
+        lambda column, other: column.notna() & ~column.isin(_strings(other)),
+    'not_in_list_case_insensitive':
+        lambda column, other: column.notna() & ~column.str.lower().isin(
+            _strings(other, True)),
+}
+
+# operators comparing with a list, cast by the operator
+LIST_OPERATORS = ('in_list', 'not_in_list', 'in_list_case_insensitive',
+                  'not_in_list_case_insensitive')
+
+BOOLEAN_OPERATORS = {
+    'is_true': lambda column, other: column == True,  # noqa: E712
+    'is_false': lambda column, other: column == False,  # noqa: E712
+}
+
+VECTOR_OPERATORS = {
+    NumericType: (_numeric, NUMERIC_OPERATORS, NUMERIC_SCALAR_OPERATORS),
+    StringType: (_string, STRING_OPERATORS, STRING_SCALAR_OPERATORS),
+    BooleanType: (_boolean, BOOLEAN_OPERATORS, {}),
+}
+
+
+def _lower(other):
+    return other.str.lower() if isinstance(other, pd.Series) else \
+        other.lower()
+
+
+def _list(other):
+    if not isinstance(other, (list, tuple, set, frozenset)):
+        raise AssertionError(f'{other} is not a valid list')
+    return other
+
+
+def _strings(other, lower=False):
+    strings = {StringType.cast(value) for value in _list(other)}
+    return [string.lower() for string in strings] if lower else list(strings)
+
+
+def _in_numbers(column, other):
+    """ Whether each value is equal to one of the numbers within epsilon:
+    the closest ones are on either side of its sorted position """
+    numbers = numpy.array(sorted(
+        float(NumericType.cast(value)) for value in _list(other)))
+    if not len(numbers):
+        return pd.Series(False, index=column.index)
+    values = column.to_numpy()
+    index = numpy.searchsorted(numbers, values)
+    above = numbers[numpy.minimum(index, len(numbers) - 1)]
+    below = numbers[numpy.maximum(index - 1, 0)]
+    return pd.Series((numpy.abs(values - above) <= _EPSILON)
+                     | (numpy.abs(values - below) <= _EPSILON),
+                     index=column.index)
+
+
+def _require_pandas():
+    if pd is None:
+        raise ImportError('business_rules.dataframe requires pandas')
+
+
+def to_frame(table):
+    """ The DataFrame of a DataFrame or an Arrow table """
+    _require_pandas()
+    if isinstance(table, pd.DataFrame):
+        return table
+    if hasattr(table, 'to_pandas'):
+        return table.to_pandas()
+    raise AssertionError(f'{type(table).__name__} is not a DataFrame or an '
+                         f'Arrow table')
+
+
+def condition_mask(conditions, table, variables=None):
+    """
+    Boolean Series telling for every row whether the condition tree is true,
+    the columns of the table being the variables.
+    :param variables: optional BaseVariables subclass giving the field type
+        of the variables, inferred from the column dtypes otherwise
+        (select types can't be inferred)
+    """
+    frame = to_frame(table)
+    return _mask(conditions, frame, variables)
+
+
+def rule_masks(rules, table, variables=None):
+    """ DataFrame with the condition mask of every rule, the columns being
+    the positions of the rules """
+    frame = to_frame(table)
+    return pd.DataFrame(
+        {position: _mask(rule['conditions'], frame, variables)
+         for position, rule in enumerate(rules)},
+        index=frame.index,
+        columns=range(len(rules)),
+    )
+
+
+def action_payloads(rules, table, variables=None, masks=None,
+                    stop_on_first_trigger=False):
+    """
+    Series with, for every row, the actions of the rules triggered in
+    priority order:
+    [{'action_name': action_name, 'action_params': action_params}]
+    Only the first rule triggered with `stop_on_first_trigger`.
+    :param masks: the rule_masks of the rules, computed when None
+    """
+    if masks is None:
+        masks = rule_masks(rules, table, variables)
+    ordered = sorted(range(len(rules)),
+                     key=lambda position: -get_rule_priority(rules[position]))
+
+    payloads = [[] for _ in range(len(masks))]
+    for position in ordered:
+        _, action = get_rule_parts(rules[position])
+        payload = {'action_name': action['name'],
+                   'action_params': dict(action.get('params') or {})}
+        for row in numpy.flatnonzero(masks[position].to_numpy()):
+            if not (stop_on_first_trigger and payloads[row]):
+                payloads[row].append(payload)
+    return pd.Series(payloads, index=masks.index, dtype=object)
+
+
+def _mask(conditions, frame, variables):
+    if isinstance(conditions, bool):
+        return pd.Series(conditions, index=frame.index, dtype=bool)
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        assert len(conditions[keys[0]]) >= 1
+        masks = [_mask(condition, frame, variables)
+                 for condition in conditions[keys[0]]]
+        result = masks[0]
+        for mask in masks[1:]:
+            result = result & mask if keys == ['all'] else result | mask
+        return result
+
+    assert not ('any' in keys or 'all' in keys)
+    return _condition_mask(conditions, frame, variables)
+
+
+def _field_type(frame, name, variables):
+    method = getattr(variables, name, None)
+    if getattr(method, 'is_rule_variable', False):
+        return method.field_type
+    dtype = frame[name].dtype
+    if pd_types.is_bool_dtype(dtype):
+        return BooleanType
+    if pd_types.is_numeric_dtype(dtype):
+        return NumericType
+    return StringType
+
+
+def _condition_mask(condition, frame, variables):
+    name, operator = condition['name'], condition['operator']
+    other = condition['value']
+    if name not in frame.columns:
+        raise AssertionError(f'Variable {name} is not a column of the table')
+    field_type = _field_type(frame, name, variables)
+    # raises for operators the type doesn't have
+    function = field_type.get_operator_function(operator)
+
+    is_variable = bool(condition.get('value_is_variable'))
+    if is_variable:
+        if other not in frame.columns:
+            raise AssertionError(
+                f'Variable {other} is not a column of the table')
+        other = frame[other]
+
+    convert, operators, scalar_operators = VECTOR_OPERATORS.get(
+        field_type, (None, {}, {}))
+    vector = operators.get(operator)
+    if vector is None and not is_variable:
+        vector = scalar_operators.get(operator)
+    if vector is not None:
+        try:
+            column = convert(frame[name])
+            if is_variable:
+                comparison = convert(other)
+            elif operator in LIST_OPERATORS:
+                comparison = other
+            elif field_type is NumericType:
+                comparison = float(NumericType.cast(other))
+            elif field_type is StringType:
+                comparison = StringType.cast(other)
+            else:
+                comparison = other
+            return vector(column, comparison).fillna(False).astype(bool)
+        except (AssertionError, TypeError, ValueError):
+            pass
+    return _row_wise(function, field_type, frame[name], other)
+
+
+def _row_wise(function, field_type, column, other):
+    """ Fallback evaluating the operator on every row """
+    if isinstance(other, pd.Series):
+        others = other.to_numpy()
+    else:
+        others = [other] * len(column)
+
+    def evaluate(value, comparison):
+        try:
+            value = field_type.cast(value)
+            if isinstance(other, pd.Series):
+                comparison = field_type.cast(comparison)
+            return bool(function(value, comparison))
+        except (AssertionError, TypeError, ValueError):
+            return False
+
+    return pd.Series(
+        [evaluate(value, comparison)
+         for value, comparison in zip(column.to_numpy(), others)],
+        index=column.index, dtype=bool)
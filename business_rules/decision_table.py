@@ -0,0 +1,382 @@
+from bisect import bisect_left
+
+from .context import evaluation_context
+from .engine import (
+    VariableTimeout,
+    _get_variable,
+    check_conditions_recursively,
+    do_action,
+    get_rule_parts
+)
+from .operators import BooleanType, NumericType, StringType
+from .optimizer import (
+    NUMERIC_BOUND_OPERATORS,
+    _bound,
+    _tighter_lower,
+    _tighter_upper
+)
+from .sync_engine import (
+    _get_variable_sync,
+    check_conditions_recursively_sync,
+    do_action_sync
+)
+from .variables import TIMEOUT_FALSE
+
+# the key of the cast variable value each equality operator looks up
+EQUALITY_OPERATORS = {
+    StringType: {
+        'equal_to': lambda value: value,
+        'equal_to_case_insensitive': str.lower,
+    },
+    BooleanType: {
+        'is_true': bool,
+        'is_false': bool,
+    },
+}
+# the key the boolean operators require
+BOOLEAN_KEYS = {'is_true': True, 'is_false': False}
+
+
+class DecisionTable:
+    """
+    A list of rules compiled into one lookup structure per variable, for
+    rule lists whose conditions are a single condition or an `all` of
+    conditions comparing string and boolean variables for equality and
+    numeric variables with bounds.
+
+    Every rule is a bit of the masks, the rule checked first being the
+    lowest bit. Each variable gives the mask of the rules its value
+    satisfies: a hash map for equality, the segment between the sorted
+    bounds for numbers. The first rule triggered is the lowest bit of
+    the intersection of the masks.
+
+    The variables are read as checking the rules one by one reads them:
+    only the columns of the first rule that can still trigger, in the
+    order of its conditions, each read narrowing down the rules that can.
+    """
+
+    def __init__(self, rules, columns, all_rules, rule_columns):
+        self.rules = rules
+        self.columns = columns
+        self.all_rules = all_rules
+        # position of a rule that can trigger -> the columns its conditions
+        # read, in their order
+        self.rule_columns = rule_columns
+
+    @classmethod
+    def compile(cls, rules: list, variables):
+        """
+        Compile the rules, in the order they are checked, or return None
+        when they don't have the shape of a decision table.
+        :param variables: BaseVariables subclass or instance defining the
+            variables the rules read
+        """
+        constraints = {}
+        all_rules = 0
+        rule_names = {}
+        for position, rule in enumerate(rules):
+            try:
+                conditions, _ = get_rule_parts(rule)
+            except Exception:
+                return None
+            rule_constraints = _rule_constraints(conditions, variables)
+            if rule_constraints is _NOT_A_TABLE:
+                return None
+            if rule_constraints is None:
+                # the rule can never trigger
+                continue
+            bit = 1 << position
+            all_rules |= bit
+            rule_names[position] = tuple(rule_constraints)
+            for name, constraint in rule_constraints.items():
+                constraints.setdefault(name, []).append((bit, constraint))
+
+        columns = {}
+        for name, rule_constraints in constraints.items():
+            field_type = getattr(variables, name).field_type
+            if field_type is NumericType:
+                column = _NumericColumn(name, rule_constraints, all_rules)
+            else:
+                column = _EqualityColumn(name, field_type, rule_constraints,
+                                         all_rules)
+            columns[name] = column
+        rule_columns = {
+            position: tuple(columns[name] for name in names)
+            for position, names in rule_names.items()}
+        return cls(tuple(rules), tuple(columns.values()), all_rules,
+                   rule_columns)
+
+    def _first(self, mask):
+        if not mask:
+            return None
+        return (mask & -mask).bit_length() - 1
+
+    def _candidate_mask(self, candidates):
+        if candidates is None:
+            return self.all_rules
+        mask = 0
+        for position in candidates:
+            mask |= 1 << position
+        return mask & self.all_rules
+
+    def _next_column(self, mask, values):
+        """ The first rule of the mask and the first column of its
+        conditions not read yet, None once all are """
+        position = self._first(mask)
+        for column in self.rule_columns[position]:
+            if column.name not in values:
+                return position, column
+        return position, None
+
+    async def lookup(self, defined_variables, candidates=None):
+        """ Position of the first rule triggered, or None. When a variable
+        can't be read or matched, the rules that can still trigger are
+        checked one by one, raising as the engine does """
+        mask = self._candidate_mask(candidates)
+        values = {}
+        while mask:
+            position, column = self._next_column(mask, values)
+            if column is None:
+                return position
+            try:
+                values[column.name] = await _get_variable(defined_variables,
+                                                          column.name)
+                mask &= column.match(values[column.name][1])
+            except VariableTimeout as error:
+                if error.policy != TIMEOUT_FALSE:
+                    raise
+                values[column.name] = _TIMED_OUT
+                mask &= column.unconstrained
+            except Exception:
+                return await self._check_one_by_one(defined_variables, mask,
+                                                    values)
+        return None
+
+    async def _check_one_by_one(self, defined_variables, mask, values):
+        """ Position of the first rule of the mask triggered, checked by
+        the engine with the variable values read so far """
+        with evaluation_context() as context:
+            previous, context.prefetched = context.prefetched, _read(values)
+            try:
+                for position in _positions(mask):
+                    conditions, _ = get_rule_parts(self.rules[position])
+                    if await check_conditions_recursively(conditions,
+                                                          defined_variables):
+                        return position
+                return None
+            finally:
+                context.prefetched = previous
+
+    def lookup_sync(self, defined_variables, candidates=None):
+        """ Synchronous `lookup` """
+        mask = self._candidate_mask(candidates)
+        values = {}
+        while mask:
+            position, column = self._next_column(mask, values)
+            if column is None:
+                return position
+            try:
+                values[column.name] = _get_variable_sync(defined_variables,
+                                                         column.name)
+                mask &= column.match(values[column.name][1])
+            except Exception:
+                return self._check_one_by_one_sync(defined_variables, mask,
+                                                   values)
+        return None
+
+    def _check_one_by_one_sync(self, defined_variables, mask, values):
+        """ Synchronous `_check_one_by_one` """
+        with evaluation_context() as context:
+            previous, context.prefetched = context.prefetched, _read(values)
+            try:
+                for position in _positions(mask):
+                    conditions, _ = get_rule_parts(self.rules[position])
+                    if check_conditions_recursively_sync(conditions,
+                                                         defined_variables):
+                        return position
+                return None
+            finally:
+                context.prefetched = previous
+
+    async def run(self, defined_variables, defined_actions,
+                  candidates=None) -> list:
+        """ Run the action of the first rule triggered, same result as
+        engine.run_all with stop_on_first_trigger """
+        position = await self.lookup(defined_variables, candidates)
+        if position is None:
+            return []
+        _, action = get_rule_parts(self.rules[position])
+        return [await do_action(action, defined_actions)]
+
+    def run_sync(self, defined_variables, defined_actions,
+                 candidates=None) -> list:
+        """ Synchronous `run` """
+        position = self.lookup_sync(defined_variables, candidates)
+        if position is None:
+            return []
+        _, action = get_rule_parts(self.rules[position])
+        return [do_action_sync(action, defined_actions)]
+
+
+_NOT_A_TABLE = object()
+# the value of a variable that timed out with the TIMEOUT_FALSE policy
+_TIMED_OUT = object()
+
+
+def _read(values):
+    """ The variable values read, as EvaluationContext.prefetched """
+    return {name: value for name, value in values.items()
+            if value is not _TIMED_OUT}
+
+
+def _positions(mask):
+    """ The positions of the bits of the mask, lowest first """
+    while mask:
+        bit = mask & -mask
+        yield bit.bit_length() - 1
+        mask ^= bit
+
+
+def _rule_constraints(conditions, variables):
+    """
+    The constraint of the rule on each variable it reads: the numeric
+    bounds, or the key each equality operator must find. None when the
+    constraints contradict each other, _NOT_A_TABLE for other shapes.
+    """
+    if conditions is True:
+        return {}
+    if conditions is False:
+        return None
+    if isinstance(conditions, bool):
+        return _NOT_A_TABLE
+    keys = list(conditions.keys())
+    if keys == ['all']:
+        children = conditions['all']
+    elif keys == ['any']:
+        if len(conditions['any']) != 1:
+            return _NOT_A_TABLE
+        children = conditions['any']
+    else:
+        children = [conditions]
+
+    constraints = {}
+    for condition in children:
+        if isinstance(condition, bool) or list(condition.keys()) in (
+                ['all'], ['any']) or condition.get('value_is_variable'):
+            return _NOT_A_TABLE
+        name, operator = condition['name'], condition['operator']
+        field_type = getattr(getattr(variables, name, None), 'field_type',
+                             None)
+        if field_type is NumericType:
+            if operator not in NUMERIC_BOUND_OPERATORS:
+                return _NOT_A_TABLE
+            bound = _bound(condition)
+            if bound is None:
+                return _NOT_A_TABLE
+            lower, upper = constraints.get(name, (None, None))
+            if bound[0] is not None and (
+                    lower is None or _tighter_lower(bound[0], lower)):
+                lower = bound[0]
+            if bound[1] is not None and (
+                    upper is None or _tighter_upper(bound[1], upper)):
+                upper = bound[1]
+            if (lower is not None and upper is not None
+                    and (lower[0] > upper[0] or (
+                        lower[0] == upper[0]
+                        and not (lower[1] and upper[1])))):
+                return None
+            constraints[name] = lower, upper
+            continue
+
+        key_functions = EQUALITY_OPERATORS.get(field_type, {})
+        if operator not in key_functions:
+            return _NOT_A_TABLE
+        if field_type is BooleanType:
+            key = BOOLEAN_KEYS[operator]
+        else:
+            try:
+                key = key_functions[operator](
+                    StringType.cast(condition['value']))
+            except AssertionError:
+                return _NOT_A_TABLE
+        keys = constraints.setdefault(name, {})
+        if keys.setdefault(operator, key) != key:
+            return None
+        if field_type is BooleanType and len(keys) > 1:
+            # is_true and is_false
+            return None
+    return constraints
+
+
+class _EqualityColumn:
+    """ Hash maps from the key of the value to the rules requiring it """
+
+    def __init__(self, name, field_type, rule_constraints, all_rules):
+        self.name = name
+        self.key_functions = EQUALITY_OPERATORS[field_type]
+        self.constrained = {}
+        self.maps = {}
+        constrained = 0
+        for bit, keys in rule_constraints:
+            constrained |= bit
+            for operator, key in keys.items():
+                self.constrained[operator] = (
+                    self.constrained.get(operator, 0) | bit)
+                values = self.maps.setdefault(operator, {})
+                values[key] = values.get(key, 0) | bit
+        self.unconstrained = all_rules & ~constrained
+
+    def match(self, value):
+        mask = -1
+        for operator, values in self.maps.items():
+            matched = values.get(self.key_functions[operator](value), 0)
+            mask &= ~self.constrained[operator] | matched
+        return mask
+
+
+class _NumericColumn:
+    """
+    The sorted bounds of the rules on a number split the numbers into
+    segments: each bound point and the open interval between two points.
+    Each segment has the mask of the rules it satisfies.
+    """
+
+    def __init__(self, name, rule_constraints, all_rules):
+        self.name = name
+        points = set()
+        for _, (lower, upper) in rule_constraints:
+            for bound in (lower, upper):
+                if bound is not None:
+                    points.add(bound[0])
+        self.points = sorted(points)
+        index = {point: position for position, point in enumerate(self.points)}
+
+        # toggles of the rule bits at the first and after the last segment
+        # of each rule, applied in a single sweep
+        toggles = [0] * (2 * len(self.points) + 2)
+        constrained = 0
+        for bit, (lower, upper) in rule_constraints:
+            constrained |= bit
+            if lower is None:
+                first = 0
+            else:
+                first = 2 * index[lower[0]] + (1 if lower[1] else 2)
+            if upper is None:
+                last = 2 * len(self.points)
+            else:
+                last = 2 * index[upper[0]] + (1 if upper[1] else 0)
+            toggles[first] ^= bit
+            toggles[last + 1] ^= bit
+        self.unconstrained = all_rules & ~constrained
+
+        self.segments = []
+        mask = self.unconstrained
+        for toggle in toggles[:-1]:
+            mask ^= toggle
+            self.segments.append(mask)
+
+    def match(self, value):
+        position = bisect_left(self.points, value)
+        if position < len(self.points) and self.points[position] == value:
+            return self.segments[2 * position + 1]
+        return self.segments[2 * position]
@@ -1,28 +1,74 @@
 import asyncio
+import functools
 import logging
+import time
 from typing import Union
 
 from .actions import BaseActions
+from .cache import GLOBAL_VARIABLE_CACHE, ResultCache, VariableCache
+from .context import EvaluationContext, evaluation_context, get_context
+from .executor import offload
 from .fields import FIELD_NO_INPUT
-from .variables import BaseVariables
+from .multipattern import PATTERN_OPERATORS
+from .operators import StringType
+from .utils import get_condition_variables
+from .variables import (
+    CACHE_EVALUATION,
+    CACHE_GLOBAL,
+    CACHE_INSTANCE,
+    TIMEOUT_DEFAULT,
+    TIMEOUT_FALSE,
+    TIMEOUT_POLICIES,
+    TIMEOUT_RAISE,
+    BaseVariables,
+    MappingVariables
+)
 
 logger = logging.getLogger(__name__)
 
+_DEPENDENCY = 'rule_dependency'
+
 
 class InvalidRuleDefinition(Exception):
     """Invalid rule"""
 
 
+class VariableTimeout(Exception):
+    """Variable was not resolved before its timeout or the deadline"""
+
+    def __init__(self, name, policy=TIMEOUT_RAISE):
+        super().__init__(f'Variable {name} timed out')
+        self.name = name
+        self.policy = policy
+
+
 async def run(
     rule: dict,
     defined_variables: BaseVariables,
     defined_actions: BaseActions,
+    result_cache: ResultCache = None,
+    deadline: float = None,
+    variable_timeout: float = None,
+    on_timeout: str = TIMEOUT_RAISE,
+    concurrent: bool = False,
+    max_concurrency: int = None,
 ) -> Union[dict, None]:
     """
     Check rules and run actions
     :param rule: rule conditions
     :param defined_variables: defined variable
     :param defined_actions: defined actions
+    :param result_cache: optional cache of condition outcomes, actions are
+        always executed
+    :param deadline: seconds the conditions may take to evaluate
+    :param variable_timeout: seconds each variable may take to resolve,
+        unless the variable declares its own timeout
+    :param on_timeout: policy of the variables that don't declare one,
+        see rule_variable
+    :param concurrent: evaluate the children of `any` and `all` nodes
+        concurrently, stopping at the first decisive child
+    :param max_concurrency: maximum number of conditions evaluated at the
+        same time in concurrent mode
     :return:
     {
         'action_name': action_name,
@@ -31,6 +77,118 @@ async def run(
     }
     """
 
+    conditions, action = get_rule_parts(rule)
+    context = _make_context(deadline, variable_timeout, on_timeout,
+                            concurrent, max_concurrency)
+    with evaluation_context(context):
+        rule_triggered = await _check_rule_conditions(
+            conditions, defined_variables, result_cache, rule)
+    if rule_triggered:
+        logger.debug(f'business-rules conditions: {conditions}')
+        logger.debug(f'business-rules actions: {rule["actions"]}')
+
+        return await do_action(action, defined_actions)
+
+
+async def run_all(
+    rule_list: list,
+    defined_variables: BaseVariables,
+    defined_actions: BaseActions,
+    stop_on_first_trigger: bool = False,
+    result_cache: ResultCache = None,
+    deadline: float = None,
+    variable_timeout: float = None,
+    on_timeout: str = TIMEOUT_RAISE,
+    concurrent: bool = False,
+    max_concurrency: int = None,
+) -> list:
+    """
+    Check a list of rules in priority order, higher `priority` first and
+    rules of equal priority in list order, and run the actions of the rules
+    triggered. The rules share one evaluation, see `run` for the options;
+    the deadline applies to the whole list.
+    :param stop_on_first_trigger: stop at the first rule triggered
+    :return: the results of the actions run, see `run`
+    """
+    context = _make_context(deadline, variable_timeout, on_timeout,
+                            concurrent, max_concurrency)
+    with evaluation_context(context):
+        return await run_ordered(sort_rules(rule_list), defined_variables,
+                                 defined_actions, stop_on_first_trigger,
+                                 result_cache)
+
+
+async def run_ordered(rules, defined_variables, defined_actions,
+                      stop_on_first_trigger=False, result_cache=None) -> list:
+    """ Check the rules in the given order within the bound evaluation
+    context and run the actions of the rules triggered """
+    results = []
+    for rule in rules:
+        conditions, action = get_rule_parts(rule)
+        if not await _check_rule_conditions(conditions, defined_variables,
+                                            result_cache, rule):
+            continue
+        logger.debug(f'business-rules conditions: {conditions}')
+        logger.debug(f'business-rules actions: {rule["actions"]}')
+        results.append(await do_action(action, defined_actions))
+        if stop_on_first_trigger:
+            break
+    return results
+
+
+def _make_context(deadline, variable_timeout, on_timeout, concurrent,
+                  max_concurrency) -> EvaluationContext:
+    if on_timeout not in TIMEOUT_POLICIES:
+        raise InvalidRuleDefinition(f'Unknown timeout policy: {on_timeout}')
+
+    if deadline is not None:
+        deadline += asyncio.get_running_loop().time()
+    return EvaluationContext(
+        deadline=deadline,
+        variable_timeout=variable_timeout,
+        on_timeout=on_timeout,
+        concurrent=concurrent,
+        max_concurrency=max_concurrency,
+    )
+
+
+async def _check_rule_conditions(conditions, defined_variables, result_cache,
+                                 rule=None):
+    context = get_context()
+    profiler = context.profiler if context is not None else None
+    if profiler is not None and rule is not None:
+        token = profiler.start_rule(context, rule)
+        triggered = None
+        try:
+            triggered = await _check_rule_conditions(
+                conditions, defined_variables, result_cache)
+        finally:
+            profiler.end_rule(context, token, triggered)
+        return triggered
+
+    if result_cache is None:
+        return await check_conditions_recursively(conditions,
+                                                  defined_variables)
+    return await _check_conditions_cached(conditions, defined_variables,
+                                          result_cache)
+
+
+def get_rule_priority(rule):
+    """ Priority of a rule, rules with a higher priority are checked first """
+    priority = rule.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, (int, float)):
+        raise InvalidRuleDefinition(f'Priority must be a number: {priority!r}')
+    return priority
+
+
+def sort_rules(rules) -> list:
+    """ The rules by descending priority, rules of equal priority keep their
+    order """
+    return sorted(rules, key=lambda rule: -get_rule_priority(rule))
+
+
+def get_rule_parts(rule):
+    """ Validate the rule and return its conditions and its only action """
     conditions, actions = rule['conditions'], rule['actions']
     if actions is None:
         raise InvalidRuleDefinition('Actions are None')
@@ -38,24 +196,61 @@ async def run(
     if len(actions) !=1:
         raise InvalidRuleDefinition(f'You should specify only one action, '
                                     f'but specified: {len(actions)}')
-    action = actions[0]
-
-    rule_triggered = await check_conditions_recursively(
-        conditions,
-        defined_variables,
-    )
-    if rule_triggered:
-        logger.debug(f'business-rules conditions: {conditions}')
-        logger.debug(f'business-rules actions: {actions}')
-
-        return await do_action(action, defined_actions)
+    return conditions, actions[0]
+
+
+async def _check_conditions_cached(conditions, defined_variables, result_cache):
+    """ Check conditions, reusing the outcome of a previous evaluation
+    that read the same variable values """
+    variables = {}
+    try:
+        for name in get_condition_variables(conditions):
+            variables[name] = await _get_variable(defined_variables, name)
+    except VariableTimeout as error:
+        if error.policy != TIMEOUT_FALSE:
+            raise
+        # outcomes with missing facts are not cacheable
+        return bool(await check_conditions_recursively(
+            conditions, defined_variables))
+
+    key = result_cache.make_key(
+        conditions, {name: var[1] for name, var in variables.items()})
+    result = result_cache.get(key)
+    if result is None:
+        with evaluation_context() as context:
+            previous, context.prefetched = context.prefetched, variables
+            try:
+                result = bool(await check_conditions_recursively(
+                    conditions, defined_variables))
+            finally:
+                context.prefetched = previous
+        result_cache.set(key, result)
+    return result
 
 
 async def check_conditions_recursively(conditions, defined_variables):
     """ Check conditions """
+    if isinstance(conditions, bool):
+        # constant outcome, e.g. a tree folded by optimizer.simplify
+        return conditions
+    context = get_context()
+    if context is not None and context.rule_profile is not None:
+        start = time.perf_counter()
+        result = await _check_node(conditions, defined_variables, context)
+        context.rule_profile.record(conditions, result,
+                                    time.perf_counter() - start)
+        return result
+    return await _check_node(conditions, defined_variables, context)
+
+
+async def _check_node(conditions, defined_variables, context):
     keys = list(conditions.keys())
+    concurrent = context is not None and context.concurrent
     if keys == ['all']:
         assert len(conditions['all']) >= 1
+        if concurrent and len(conditions['all']) > 1:
+            return await _check_concurrently(
+                conditions['all'], defined_variables, decisive=False)
         for condition in conditions['all']:
             if not await check_conditions_recursively(condition, defined_variables):
                 return False
@@ -63,6 +258,9 @@ async def check_conditions_recursively(conditions, defined_variables):
 
     if keys == ['any']:
         assert len(conditions['any']) >= 1
+        if concurrent and len(conditions['any']) > 1:
+            return await _check_concurrently(
+                conditions['any'], defined_variables, decisive=True)
         for condition in conditions['any']:
             if await check_conditions_recursively(condition, defined_variables):
                 return True
@@ -71,9 +269,48 @@ async def check_conditions_recursively(conditions, defined_variables):
     # help prevent errors - any and all can only be in the condition dict
     # if they're the only item
     assert not ('any' in keys or 'all' in keys)
+    if concurrent and context.semaphore is not None:
+        async with context.semaphore:
+            return await check_condition(conditions, defined_variables)
     return await check_condition(conditions, defined_variables)
 
 
+async def _check_concurrently(conditions, defined_variables, decisive):
+    """ Evaluate the children of an `any` (decisive=True) or `all`
+    (decisive=False) node concurrently, returning as soon as one child
+    evaluates to `decisive` and cancelling the others. A child raising
+    doesn't stop the others: its exception is raised only when no child
+    decides the node, the one of the first child in order """
+    tasks = [
+        asyncio.ensure_future(
+            check_conditions_recursively(condition, defined_variables))
+        for condition in conditions
+    ]
+    errors = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    result = task.result()
+                except Exception as error:
+                    errors[tasks.index(task)] = error
+                    continue
+                if bool(result) == decisive:
+                    return decisive
+        if errors:
+            raise errors[min(errors)]
+        return not decisive
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
 async def check_condition(condition, defined_variables):
     """
     Checks a single rule condition - the condition will be made up of
@@ -83,12 +320,34 @@ async def check_condition(condition, defined_variables):
     name = condition['name']
     op = condition['operator']
     value = condition['value']
-    operator_type = await _get_variable_value(defined_variables, name)
-    if 'value_is_variable' in condition and condition['value_is_variable']:
-        variable_name = value
-        temp_value = await _get_variable_value(defined_variables, variable_name)
-        value = temp_value.value
-    return _do_operator_comparison(operator_type, op, value)
+    try:
+        field_type, variable_value = await _get_variable(defined_variables,
+                                                         name)
+        if 'value_is_variable' in condition and condition['value_is_variable']:
+            variable_name = value
+            _, value = await _get_variable(defined_variables, variable_name)
+        elif op in PATTERN_OPERATORS:
+            result = _check_indexed(name, op, field_type, variable_value,
+                                    value)
+            if result is not None:
+                return result
+    except VariableTimeout as error:
+        if error.policy == TIMEOUT_FALSE:
+            logger.debug(f'business-rules {error}, condition is false')
+            return False
+        raise
+    return field_type.get_operator_function(op)(variable_value, value)
+
+
+def _check_indexed(name, operator, field_type, variable_value, value):
+    """ The outcome of a substring condition looked up in the pattern index
+    of the rule set evaluated, None when it isn't indexed """
+    context = get_context()
+    if (context is None or context.pattern_index is None
+            or field_type is not StringType):
+        return None
+    return context.pattern_index.check(name, operator, variable_value, value,
+                                       context.pattern_matches)
 
 
 async def _get_variable_value(defined_variables, name):
@@ -98,18 +357,183 @@ async def _get_variable_value(defined_variables, name):
 
     Returns an instance of operators.BaseType
     """
+    field_type, value = await _get_variable(defined_variables, name)
+    return field_type(value)
+
+
+async def _get_variable(defined_variables, name):
+    """ Same as _get_variable_value, but returns the field type and the cast
+    value instead of building an instance of the field type """
+    if isinstance(defined_variables, MappingVariables):
+        # precomputed values, nothing to call or await
+        return defined_variables.get_variable(name)
+    context = get_context()
+    if (context is not None and context.prefetched is not None
+            and name in context.prefetched):
+        variable = context.prefetched[name]
+        if isinstance(variable, VariableTimeout):
+            # timed out earlier in the evaluation
+            raise VariableTimeout(variable.name, variable.policy)
+        return variable
+
+    method = _get_variable_method(defined_variables, name)
+    profiler = context.profiler if context is not None else None
+    if profiler is None:
+        val = await _resolve_variable(defined_variables, name, method, context)
+    else:
+        start = time.perf_counter()
+        try:
+            val = await _resolve_variable(defined_variables, name, method,
+                                          context)
+        finally:
+            profiler.record_variable(name, time.perf_counter() - start)
+    return method.field_type, method.field_type.cast(val)
+
+
+async def _resolve_variable(defined_variables, name, method, context):
+    """ The raw value of the variable, applying its timeout policy """
+    timeout = _variable_timeout(method, context)
+    if timeout is None:
+        val = await _fetch_variable(defined_variables, name, method, context)
+    else:
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            val = await asyncio.wait_for(
+                _fetch_variable(defined_variables, name, method, context),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            policy = getattr(method, 'on_timeout', None)
+            if policy is None:
+                policy = context.on_timeout if context else TIMEOUT_RAISE
+            if policy != TIMEOUT_DEFAULT:
+                raise VariableTimeout(name, policy)
+            logger.debug(f'business-rules variable {name} timed out, '
+                         f'using its default')
+            val = method.timeout_default
+    return val
+
+
+def _get_variable_method(defined_variables, name):
+    """ The variable method, or a function raising if it isn't defined """
 
     def fallback(*args, **kwargs):
         raise AssertionError("Variable {0} is not defined in class {1}".format(
             name, defined_variables.__class__.__name__))
 
-    method = getattr(defined_variables, name, fallback)
-    val = method()
-
+    return getattr(defined_variables, name, fallback)
+
+
+async def _fetch_variable(defined_variables, name, method, context):
+    """ Call the variable method, going through its cache if it has one """
+    cache = None
+    cache_scope = getattr(method, 'cache_scope', None)
+    if cache_scope is not None:
+        cache, key = _variable_cache(defined_variables, name, method,
+                                     cache_scope, context)
+
+    compute = offload(method)
+    dependencies = _dependency_names(defined_variables, name)
+    if dependencies:
+        compute = functools.partial(_call_with_dependencies, defined_variables,
+                                    compute, dependencies, context)
+    if getattr(method, 'batch_loader', None) is not None:
+        compute = functools.partial(_load_batched, compute,
+                                    method.batch_loader)
+    if cache is None:
+        val = compute()
+        if asyncio.iscoroutine(val):
+            val = await val
+        return val
+    return await cache.get_or_compute(key, compute, method.cache_ttl)
+
+
+async def _load_batched(compute, batch_loader):
+    """ Load the value of the key returned by a batched variable """
+    key = compute()
+    if asyncio.iscoroutine(key):
+        key = await key
+    return await batch_loader.load(key)
+
+
+def _dependency_names(defined_variables, name):
+    """ Names of the rule dependencies the variable or dependency takes """
+    return getattr(type(defined_variables), 'rule_dependencies', {}).get(
+        name, ())
+
+
+def _dependency_key(defined_variables, name):
+    """ Key of a dependency in the evaluation variable cache, apart from
+    the keys of the variables """
+    return id(defined_variables), _DEPENDENCY, name
+
+
+async def _call_with_dependencies(defined_variables, method, names, context):
+    """ Call the method with the values of the dependencies it takes """
+    if len(names) == 1:
+        values = [await _get_dependency(defined_variables, names[0], context)]
+    else:
+        values = await asyncio.gather(*(
+            _get_dependency(defined_variables, name, context)
+            for name in names))
+    val = method(**dict(zip(names, values)))
     if asyncio.iscoroutine(val):
         val = await val
-
-    return method.field_type(val)
+    return val
+
+
+async def _get_dependency(defined_variables, name, context):
+    """ The value of a rule dependency, computed at most once per
+    evaluation """
+    compute = offload(getattr(defined_variables, name))
+    dependencies = _dependency_names(defined_variables, name)
+    if dependencies:
+        compute = functools.partial(_call_with_dependencies, defined_variables,
+                                    compute, dependencies, context)
+    if context is None:
+        val = compute()
+        if asyncio.iscoroutine(val):
+            val = await val
+        return val
+    return await context.variable_cache.get_or_compute(
+        _dependency_key(defined_variables, name), compute)
+
+
+def _variable_timeout(method, context):
+    """ Seconds left to resolve the variable, None when unbounded """
+    timeout = getattr(method, 'timeout', None)
+    if context is None:
+        return timeout
+    if timeout is None:
+        timeout = context.variable_timeout
+    if context.deadline is not None:
+        remaining = context.deadline - asyncio.get_running_loop().time()
+        timeout = remaining if timeout is None else min(timeout, remaining)
+    return timeout
+
+
+def _variable_cache(defined_variables, name, method, cache_scope, context):
+    """ Returns the cache and key of a variable declared with a
+    cache_scope, the cache is None when the scope is not available """
+    key = (name,)
+    if method.cache_key is not None:
+        key += (method.cache_key(defined_variables),)
+
+    if cache_scope == CACHE_EVALUATION:
+        if context is None:
+            return None, key
+        return context.variable_cache, (id(defined_variables),) + key
+
+    if cache_scope == CACHE_INSTANCE:
+        cache = defined_variables.__dict__.get('_rule_variable_cache')
+        if cache is None:
+            cache = defined_variables.__dict__.setdefault(
+                '_rule_variable_cache', VariableCache())
+        return cache, key
+
+    assert cache_scope == CACHE_GLOBAL
+    return GLOBAL_VARIABLE_CACHE, (defined_variables.__class__,) + key
 
 
 def _do_operator_comparison(operator_type, operator_name, comparison_value):
@@ -144,15 +568,8 @@ async def do_action(action, defined_actions) -> dict:
     method_name = action['name']
 
     params = action.get('params') or {}
-    if hasattr(defined_actions, method_name):
-        method = getattr(defined_actions, method_name)
-    else:
-        raise AssertionError(
-            'Action {} is not defined in class {}'.format(
-                method_name, defined_actions.__class__.__name__
-            )
-        )
-    action_result = method(**params)
+    method = _get_action_method(defined_actions, method_name)
+    action_result = offload(method)(**params)
     if asyncio.iscoroutine(action_result):
         action_result = await action_result
 
@@ -161,3 +578,14 @@ async def do_action(action, defined_actions) -> dict:
         'action_params': params,
         'action_result': action_result
     }
+
+
+def _get_action_method(defined_actions, method_name):
+    """ The action method, raises if it isn't defined """
+    if hasattr(defined_actions, method_name):
+        return getattr(defined_actions, method_name)
+    raise AssertionError(
+        'Action {} is not defined in class {}'.format(
+            method_name, defined_actions.__class__.__name__
+        )
+    )
@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+class BlockingExecutor:
+    """
+    Bounded thread pool running the blocking variables and actions of async
+    evaluations, so that they don't block the event loop. The pool is
+    created on first use. Calls beyond `max_workers` wait in the queue,
+    see `stats`.
+    """
+
+    def __init__(self, max_workers: int = None,
+                 thread_name_prefix: str = 'business-rules'):
+        if max_workers is not None and max_workers < 1:
+            raise AssertionError('max_workers must be at least 1')
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.thread_name_prefix = thread_name_prefix
+        self.submitted = 0
+        self.completed = 0
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self.queue_time = 0.0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'queued': self.queued,
+                'running': self.running,
+                'max_queued': self.max_queued,
+                'queue_time': self.queue_time,
+            }
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    self.max_workers,
+                    thread_name_prefix=self.thread_name_prefix)
+            return self._pool
+
+    async def run(self, func, *args, **kwargs):
+        """ Call `func` in the pool, with the context of the caller, and
+        return its result """
+        context = contextvars.copy_context()
+        submitted_at = time.monotonic()
+
+        def call():
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                self.queue_time += time.monotonic() - submitted_at
+            try:
+                return context.run(func, *args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+            # calls waiting for a thread, the running ones excluded
+            waiting = self.queued + self.running - self.max_workers
+            self.max_queued = max(self.max_queued, waiting)
+        future = self._get_pool().submit(call)
+        future.add_done_callback(self._cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _cancelled(self, future):
+        if future.cancelled():
+            # cancelled while queued, `call` never ran
+            with self._lock:
+                self.queued -= 1
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+_blocking_default = False
+
+
+def get_default_executor() -> BlockingExecutor:
+    """ The executor of the variables and actions declared blocking=True """
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = BlockingExecutor()
+        return _default_executor
+
+
+def set_default_executor(executor: BlockingExecutor):
+    """ Replace the default executor, the previous one is not shut down """
+    global _default_executor
+    if not isinstance(executor, BlockingExecutor):
+        raise AssertionError(f'{executor!r} is not a BlockingExecutor')
+    with _default_lock:
+        _default_executor = executor
+
+
+def set_blocking_default(blocking: bool):
+    """ Whether the sync variables and actions that don't declare
+    `blocking` run in the executor """
+    global _blocking_default
+    _blocking_default = bool(blocking)
+
+
+def get_blocking_default() -> bool:
+    return _blocking_default
+
+
+def get_executor(method):
+    """ The executor to call a variable or action method in, None when it
+    is called on the event loop """
+    blocking = getattr(method, 'blocking', None)
+    if blocking is None:
+        blocking = _blocking_default
+    if not blocking or inspect.iscoroutinefunction(method):
+        return None
+    if isinstance(blocking, BlockingExecutor):
+        return blocking
+    return get_default_executor()
+
+
+def offload(method):
+    """ `method`, or a coroutine function calling it in its executor """
+    executor = get_executor(method)
+    if executor is None:
+        return method
+    return functools.partial(executor.run, method)
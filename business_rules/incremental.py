@@ -0,0 +1,210 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import List
+
+from .context import EvaluationContext, evaluation_context
+from .engine import check_condition
+from .utils import get_condition_variables
+from .variables import BaseVariables
+
+logger = logging.getLogger(__name__)
+
+
+class BaseStateStore:
+    """
+    Storage for the truth values retained between evaluations of an entity.
+    Stores used with the incremental engine should inherit from this. Every
+    method may also be a coroutine.
+    """
+
+    def get(self, entity_id):
+        """Return the stored state of the entity or None"""
+        raise NotImplementedError()
+
+    def set(self, entity_id, state):
+        """Store the state of the entity"""
+        raise NotImplementedError()
+
+    def delete(self, entity_id):
+        """Forget the state of the entity"""
+        raise NotImplementedError()
+
+
+class InMemoryStateStore(BaseStateStore):
+    """
+    Keeps entity states in process memory, evicting the least recently
+    used entity once more than `max_entities` are stored. The store can be
+    shared by threads.
+    """
+
+    def __init__(self, max_entities=10000):
+        self.max_entities = max_entities
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, entity_id):
+        with self._lock:
+            state = self._states.get(entity_id)
+            if state is not None:
+                self._states.move_to_end(entity_id)
+            return state
+
+    def set(self, entity_id, state):
+        evicted = []
+        with self._lock:
+            self._states[entity_id] = state
+            self._states.move_to_end(entity_id)
+            while len(self._states) > self.max_entities:
+                evicted.append(self._states.popitem(last=False)[0])
+        for entity in evicted:
+            logger.debug(f'business-rules evicted state of {entity}')
+
+    def delete(self, entity_id):
+        with self._lock:
+            self._states.pop(entity_id, None)
+
+
+async def _maybe_await(value):
+    if asyncio.iscoroutine(value):
+        value = await value
+    return value
+
+
+class IncrementalEngine:
+    """
+    Evaluates a list of rules for many entities and keeps the truth value of
+    every evaluated condition node per entity, so that a later update only
+    re-evaluates the sub-trees reading one of the changed variables.
+    """
+
+    def __init__(self, rules: list, store: BaseStateStore = None):
+        self.rules = list(rules)
+        self.store = store if store is not None else InMemoryStateStore()
+        self.dependencies = [
+            self._collect_dependencies(rule['conditions'])
+            for rule in self.rules
+        ]
+
+    @classmethod
+    def _collect_dependencies(cls, conditions, path=(), dependencies=None):
+        """ Map the path of every node of the tree to the variables it reads """
+        if dependencies is None:
+            dependencies = {}
+        dependencies[path] = get_condition_variables(conditions)
+        if isinstance(conditions, bool):
+            return dependencies
+        keys = list(conditions.keys())
+        if keys == ['all'] or keys == ['any']:
+            for index, condition in enumerate(conditions[keys[0]]):
+                cls._collect_dependencies(condition, path + (index,),
+                                          dependencies)
+        return dependencies
+
+    async def update(
+        self,
+        entity_id,
+        defined_variables: BaseVariables,
+        changed_variables=None,
+    ) -> List[dict]:
+        """
+        Re-evaluate the rules for the entity and return the rules whose
+        outcome flipped since the previous evaluation.
+        :param entity_id: key of the retained state
+        :param defined_variables: defined variables of the entity
+        :param changed_variables: names of the variables changed since the
+            previous evaluation, None re-evaluates everything
+        :return:
+        [{
+            'index': rule_index,
+            'rule': rule,
+            'previous': previous outcome or None,
+            'current': current outcome
+        }]
+        An entity without retained state reports the rules that are true.
+        """
+        state = await _maybe_await(self.store.get(entity_id))
+        if state is None or len(state) != len(self.rules):
+            state = [{} for _ in self.rules]
+            changed = None
+        else:
+            changed = (None if changed_variables is None
+                       else frozenset(changed_variables))
+
+        new_state = []
+        flipped = []
+        # variables and dependencies are read once for every rule
+        with evaluation_context(EvaluationContext()):
+            for index, rule in enumerate(self.rules):
+                values = state[index]
+                previous = values.get(())
+                dependencies = self.dependencies[index]
+                if changed is None:
+                    values = {}
+                else:
+                    values = {path: value for path, value in values.items()
+                              if not dependencies[path] & changed}
+                current = await self._evaluate(
+                    rule['conditions'], (), values, defined_variables)
+                new_state.append(values)
+                if previous != current and (previous is not None or current):
+                    flipped.append({
+                        'index': index,
+                        'rule': rule,
+                        'previous': previous,
+                        'current': current,
+                    })
+
+        await _maybe_await(self.store.set(entity_id, new_state))
+        if flipped:
+            logger.debug(f'business-rules flipped for {entity_id}: '
+                         f'{[change["index"] for change in flipped]}')
+        return flipped
+
+    async def outcomes(self, entity_id) -> list:
+        """ Last known outcome of every rule for the entity """
+        state = await _maybe_await(self.store.get(entity_id))
+        if state is None:
+            return [None] * len(self.rules)
+        return [values.get(()) for values in state]
+
+    async def forget(self, entity_id):
+        """ Drop the retained state of the entity """
+        await _maybe_await(self.store.delete(entity_id))
+
+    async def _evaluate(self, conditions, path, values, defined_variables):
+        """ Evaluate a node, reusing the retained values of its sub-trees """
+        if path in values:
+            return values[path]
+
+        if isinstance(conditions, bool):
+            values[path] = conditions
+            return conditions
+
+        keys = list(conditions.keys())
+        if keys == ['all']:
+            assert len(conditions['all']) >= 1
+            result = True
+            for index, condition in enumerate(conditions['all']):
+                if not await self._evaluate(condition, path + (index,),
+                                            values, defined_variables):
+                    result = False
+                    break
+        elif keys == ['any']:
+            assert len(conditions['any']) >= 1
+            result = False
+            for index, condition in enumerate(conditions['any']):
+                if await self._evaluate(condition, path + (index,),
+                                        values, defined_variables):
+                    result = True
+                    break
+        else:
+            assert not ('any' in keys or 'all' in keys)
+            result = bool(await check_condition(conditions, defined_variables))
+
+        values[path] = result
+        return result
@@ -0,0 +1,256 @@
+import json
+import mmap
+import os
+import re
+
+from .engine import InvalidRuleDefinition, get_rule_priority
+from .model import ModelBuilder
+
+CHUNK_SIZE = 1 << 16
+
+# characters changing the nesting outside and inside of a JSON string
+_STRUCTURE = re.compile(rb'["\[\]{},]')
+_STRING = re.compile(rb'["\\]')
+_NON_SPACE = re.compile(rb'\S')
+
+
+class InvalidRuleFile(Exception):
+    """The document is not a JSON array or JSON Lines of rules"""
+
+
+def iter_rules(source, variables=None, actions=None, builder=None,
+               errors=None, jsonl=None, use_mmap=False,
+               chunk_size=CHUNK_SIZE):
+    """
+    Parse, validate and compile the rules of a JSON array or a JSON Lines
+    document one at a time, holding a single rule in memory besides the
+    rules already yielded.
+
+    :param source: path, or binary or text file object
+    :param variables: optional BaseVariables subclass to validate the
+        variable names and operators against
+    :param actions: optional BaseActions subclass to validate the action
+        names against
+    :param builder: model.ModelBuilder sharing constants between loads
+    :param errors: list receiving {'index': index, 'error': message} for
+        every rule that could not be loaded, the load goes on without it
+    :param jsonl: whether the document is JSON Lines, detected from its
+        first character when None
+    :param use_mmap: memory-map the file instead of reading it
+    :return: iterator of model.Rule
+    """
+    if builder is None:
+        builder = ModelBuilder()
+    if errors is None:
+        errors = []
+
+    with _open_chunks(source, use_mmap, chunk_size) as chunks:
+        chunks = iter(chunks)
+        first = b''
+        for first in chunks:
+            if first.strip():
+                break
+        if jsonl is None:
+            jsonl = not first.lstrip().startswith(b'[')
+        chunks = _chain(first, chunks)
+        documents = _split_lines(chunks) if jsonl else _split_array(chunks)
+
+        for index, document in enumerate(documents):
+            try:
+                rule = builder.build_rule(json.loads(document))
+                validate_rule(rule, variables, actions)
+            except (ValueError, InvalidRuleDefinition) as error:
+                errors.append({'index': index, 'error': str(error)})
+                continue
+            yield rule
+
+
+def load_rules(source, variables=None, actions=None, builder=None,
+               errors=None, jsonl=None, use_mmap=False,
+               chunk_size=CHUNK_SIZE) -> list:
+    """ The list of the rules loaded by iter_rules """
+    return list(iter_rules(source, variables, actions, builder, errors,
+                           jsonl, use_mmap, chunk_size))
+
+
+def validate_rule(rule, variables=None, actions=None):
+    """ Check that the rule only reads variables defined by `variables`
+    with operators of their type and only runs actions of `actions` """
+    get_rule_priority(rule)
+    if variables is not None:
+        _validate_conditions(rule['conditions'], variables)
+    if actions is not None:
+        for action in rule['actions'] or ():
+            method = getattr(actions, action['name'], None)
+            if not getattr(method, 'is_rule_action', False):
+                raise InvalidRuleDefinition(
+                    f'Action {action["name"]} is not defined in class '
+                    f'{actions.__name__}')
+
+
+def _validate_conditions(conditions, variables):
+    if isinstance(conditions, bool):
+        return
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        for condition in conditions[keys[0]]:
+            _validate_conditions(condition, variables)
+        return
+
+    field_type = _variable_field_type(variables, conditions['name'])
+    try:
+        field_type.get_operator_function(conditions['operator'])
+    except AssertionError as error:
+        raise InvalidRuleDefinition(str(error)) from error
+    if conditions.get('value_is_variable'):
+        _variable_field_type(variables, conditions['value'])
+
+
+def _variable_field_type(variables, name):
+    method = getattr(variables, name, None) if isinstance(name, str) else None
+    if not getattr(method, 'is_rule_variable', False):
+        raise InvalidRuleDefinition(
+            f'Variable {name} is not defined in class {variables.__name__}')
+    return method.field_type
+
+
+class _open_chunks:
+    """ Context manager giving the bytes of `source` in chunks """
+
+    def __init__(self, source, use_mmap, chunk_size):
+        self.source = source
+        self.use_mmap = use_mmap
+        self.chunk_size = chunk_size
+        self._file = None
+        self._map = None
+
+    def __enter__(self):
+        source = self.source
+        if isinstance(source, (str, bytes, os.PathLike)):
+            source = self._file = open(source, 'rb')
+        if self.use_mmap:
+            if os.fstat(source.fileno()).st_size == 0:
+                return iter(())
+            self._map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._read_map(self._map)
+        return self._read(source)
+
+    def __exit__(self, *exc_info):
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def _read(self, source):
+        while True:
+            chunk = source.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+    def _read_map(self, data):
+        for start in range(0, len(data), self.chunk_size):
+            yield data[start:start + self.chunk_size]
+
+
+def _chain(first, chunks):
+    if first:
+        yield first
+    yield from chunks
+
+
+def _split_lines(chunks):
+    """ The non-blank lines of a JSON Lines document """
+    rest = b''
+    for chunk in chunks:
+        lines = (rest + chunk).split(b'\n')
+        rest = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield line
+    if rest.strip():
+        yield rest
+
+
+def _split_array(chunks):
+    """
+    The source text of every element of a JSON array. Only strings and
+    brackets are tracked to find where an element ends, so an invalid
+    element is given as is and fails to parse on its own.
+    """
+    buffer = b''
+    pos = 0
+    # 0 before the array, 1 between its elements, -1 after it
+    depth = 0
+    in_string = False
+    start = None
+    after_comma = False
+
+    for chunk in chunks:
+        if depth == -1:
+            if chunk.strip():
+                raise InvalidRuleFile('Unexpected data after the rules array')
+            continue
+        keep = pos if start is None else start
+        buffer = buffer[keep:] + chunk
+        pos -= keep
+        if start is not None:
+            start = 0
+
+        while depth != -1:
+            match = (_STRING if in_string else _STRUCTURE).search(buffer, pos)
+            end = len(buffer) if match is None else match.start()
+            if depth == 1 and start is None:
+                element = _NON_SPACE.search(buffer, pos, end)
+                if element is not None:
+                    start = element.start()
+            if match is None:
+                pos = len(buffer)
+                break
+
+            char = match.group()
+            if in_string:
+                if char == b'\\':
+                    if end + 1 >= len(buffer):
+                        # the escaped character is in the next chunk
+                        pos = end
+                        break
+                    pos = end + 2
+                    continue
+                in_string = False
+            elif depth == 0:
+                if char != b'[' or buffer[pos:end].strip():
+                    raise InvalidRuleFile('Rules must be a JSON array')
+                depth = 1
+            elif char == b'"':
+                in_string = True
+                if start is None:
+                    start = end
+            elif char in b'[{':
+                depth += 1
+                if start is None:
+                    start = end
+            elif depth > 1:
+                if char != b',':
+                    depth -= 1
+            else:
+                # a comma or the end of the array at the top level
+                if start is not None:
+                    yield buffer[start:end]
+                elif after_comma:
+                    # empty element, fails to parse
+                    yield b''
+                start = None
+                after_comma = char == b','
+                if char != b',':
+                    depth = -1
+                    if buffer[end + 1:].strip():
+                        raise InvalidRuleFile(
+                            'Unexpected data after the rules array')
+            pos = end + 1
+
+    if depth == 0 and buffer.strip():
+        raise InvalidRuleFile('Rules must be a JSON array')
+    if depth > 0:
+        # truncated document, the partial rule fails to parse
+        yield buffer[start:] if start is not None else b''
@@ -0,0 +1,307 @@
+import copyreg
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from .engine import InvalidRuleDefinition
+from .operators import LIST_LOOKUPS, ListConstant
+
+_EMPTY_PARAMS = MappingProxyType({})
+
+
+def _mapping_proxy(values):
+    return MappingProxyType(values)
+
+
+# params and object constants are read-only proxies, pickled as dicts so
+# that nodes can be sent to other processes
+copyreg.pickle(MappingProxyType,
+               lambda proxy: (_mapping_proxy, (dict(proxy),)))
+
+
+class _Node(Mapping):
+    """
+    Read-only mapping over the slots of a parsed node, so that the engine
+    and the other helpers taking rule dicts accept nodes unchanged.
+    `_keys` is the shared tuple of the keys the source dict had.
+
+    Nodes are immutable once built and can be shared by threads.
+    """
+    __slots__ = ('_keys',)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __reduce__(self):
+        return _restore, (self.__class__, {
+            slot: getattr(self, slot)
+            for cls in self.__class__.__mro__
+            for slot in getattr(cls, '__slots__', ())})
+
+    def __getitem__(self, key):
+        if key in self._keys:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return self.to_dict() == _to_plain(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()!r})'
+
+    def to_dict(self) -> dict:
+        """ The rule dict form of the node, as accepted by the UI """
+        return {key: _to_plain(self[key]) for key in self._keys}
+
+
+class ConditionGroup(_Node):
+    """ An `all` or `any` node with its children """
+    __slots__ = ('kind', 'children')
+
+    def __init__(self, kind, children):
+        _init(self, kind=kind, children=children, _keys=_GROUP_KEYS[kind])
+
+    def __getitem__(self, key):
+        if key == self.kind:
+            return self.children
+        raise KeyError(key)
+
+
+_GROUP_KEYS = {'all': ('all',), 'any': ('any',)}
+
+
+class Condition(_Node):
+    """ A single `name operator value` condition """
+    __slots__ = ('name', 'operator', 'value', 'value_is_variable')
+
+    def __init__(self, name, operator, value, value_is_variable, keys):
+        _init(self, name=name, operator=operator, value=value,
+              value_is_variable=value_is_variable, _keys=keys)
+
+
+class Action(_Node):
+    """ An action name with its read-only params """
+    __slots__ = ('name', 'params')
+
+    def __init__(self, name, params, keys):
+        _init(self, name=name, params=params, _keys=keys)
+
+
+class Rule(_Node):
+    """ The conditions and actions of a rule, plus the other keys of the
+    source dict as a tuple of pairs """
+    __slots__ = ('conditions', 'actions', 'extra')
+
+    def __init__(self, conditions, actions, extra, keys):
+        _init(self, conditions=conditions, actions=actions, extra=extra,
+              _keys=keys)
+
+    def __getitem__(self, key):
+        if key == 'conditions':
+            return self.conditions
+        if key == 'actions':
+            return self.actions
+        for extra_key, value in self.extra:
+            if extra_key == key:
+                return value
+        raise KeyError(key)
+
+
+def _init(node, **values):
+    for name, value in values.items():
+        object.__setattr__(node, name, value)
+
+
+def _restore(cls, values):
+    """ Unpickle a node """
+    node = cls.__new__(cls)
+    _init(node, **values)
+    return node
+
+
+def _to_plain(value):
+    if isinstance(value, _Node):
+        return value.to_dict()
+    if isinstance(value, tuple):
+        return [_to_plain(item) for item in value]
+    if isinstance(value, Mapping):
+        return {key: _to_plain(item) for key, item in value.items()}
+    return value
+
+
+def _constant_key(value):
+    """ Hashable key telling apart equal values of different types, e.g.
+    1, 1.0 and True """
+    if isinstance(value, tuple):
+        return tuple, tuple(_constant_key(item) for item in value)
+    return type(value), value
+
+
+class ModelBuilder:
+    """
+    Parses rule dicts into the compact model. Names and operators are
+    interned, list values become tuples, with their lookups built for the
+    list operators, and equal constants, params, conditions and actions are
+    shared between every rule built by the same builder. A builder can be
+    shared by threads: its pools only grow, with setdefault, so that
+    threads racing on a key share the same node.
+    """
+
+    def __init__(self):
+        self._constants = {}
+        self._key_tuples = {}
+        self._conditions = {}
+        self._actions = {}
+
+    def build_rule(self, rule: dict) -> Rule:
+        """ Parse one rule dict """
+        if isinstance(rule, Rule):
+            return rule
+        if not isinstance(rule, Mapping):
+            raise InvalidRuleDefinition(f'Rule must be an object: {rule!r}')
+        for key in ('conditions', 'actions'):
+            if key not in rule:
+                raise InvalidRuleDefinition(f'Rule has no {key}')
+        actions = rule['actions']
+        if actions is not None:
+            if not isinstance(actions, (list, tuple)):
+                raise InvalidRuleDefinition('Actions must be a list')
+            actions = tuple(self.build_action(action) for action in actions)
+        extra = tuple(
+            (self._intern(key), self._constant(value))
+            for key, value in rule.items()
+            if key not in ('conditions', 'actions'))
+        return Rule(self.build_conditions(rule['conditions']), actions, extra,
+                    self._keys(rule))
+
+    def build_conditions(self, conditions):
+        """ Parse a condition tree """
+        if isinstance(conditions, (bool, _Node)):
+            return conditions
+        if not isinstance(conditions, Mapping):
+            raise InvalidRuleDefinition(
+                f'Conditions must be an object: {conditions!r}')
+
+        keys = list(conditions.keys())
+        if keys == ['all'] or keys == ['any']:
+            children = conditions[keys[0]]
+            if not isinstance(children, (list, tuple)) or not children:
+                raise InvalidRuleDefinition(
+                    f'{keys[0]} must be a non-empty list')
+            return ConditionGroup(keys[0], tuple(
+                self.build_conditions(child) for child in children))
+        if 'any' in keys or 'all' in keys:
+            raise InvalidRuleDefinition(
+                f'Conditions mix a group with other keys: {keys}')
+
+        for key in ('name', 'operator', 'value'):
+            if key not in conditions:
+                raise InvalidRuleDefinition(f'Condition has no {key}')
+        unknown = set(keys) - {'name', 'operator', 'value', 'value_is_variable'}
+        if unknown:
+            raise InvalidRuleDefinition(
+                f'Condition has unknown keys: {sorted(unknown)}')
+
+        name = self._intern(conditions['name'])
+        operator = self._intern(conditions['operator'])
+        value = self._constant(conditions['value'])
+        value_is_variable = conditions.get('value_is_variable')
+        if (operator in LIST_LOOKUPS and not value_is_variable
+                and isinstance(value, tuple)):
+            value = self._list_constant(value, operator)
+        keys = self._keys(conditions)
+        key = name, operator, _constant_key(value), value_is_variable, keys
+        try:
+            condition = self._conditions.get(key)
+        except TypeError:
+            return Condition(name, operator, value, value_is_variable, keys)
+        if condition is None:
+            condition = self._conditions.setdefault(key, Condition(
+                name, operator, value, value_is_variable, keys))
+        return condition
+
+    def build_action(self, action) -> Action:
+        """ Parse one action """
+        if isinstance(action, Action):
+            return action
+        if not isinstance(action, Mapping) or 'name' not in action:
+            raise InvalidRuleDefinition(f'Action has no name: {action!r}')
+        params = action.get('params')
+        if params is not None:
+            if not isinstance(params, Mapping):
+                raise InvalidRuleDefinition('Action params must be an object')
+            params = MappingProxyType({
+                self._intern(key): self._constant(value)
+                for key, value in params.items()}) if params else _EMPTY_PARAMS
+
+        name = self._intern(action['name'])
+        keys = self._keys(action)
+        try:
+            params_key = None if params is None else tuple(
+                (param, _constant_key(value)) for param, value in params.items())
+            cached = self._actions.get((name, params_key, keys))
+        except TypeError:
+            return Action(name, params, keys)
+        if cached is None:
+            cached = self._actions.setdefault((name, params_key, keys),
+                                              Action(name, params, keys))
+        return cached
+
+    def _intern(self, value):
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def _keys(self, source):
+        keys = tuple(self._intern(key) for key in source.keys())
+        return self._key_tuples.setdefault(keys, keys)
+
+    def _constant(self, value):
+        """ A shared, immutable copy of a JSON value """
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, (list, tuple)):
+            value = tuple(self._constant(item) for item in value)
+        elif isinstance(value, Mapping):
+            return MappingProxyType({
+                self._intern(key): self._constant(item)
+                for key, item in value.items()})
+        try:
+            return self._constants.setdefault(_constant_key(value), value)
+        except TypeError:
+            return value
+
+
+    def _list_constant(self, value, operator):
+        """ The shared comparison list of a list operator, with the lookups
+        of the operator built, see operators.ListConstant """
+        builds = LIST_LOOKUPS[operator]
+        key = ListConstant, builds, _constant_key(value)
+        try:
+            constant = self._constants.get(key)
+        except TypeError:
+            return ListConstant(value, builds)
+        if constant is None:
+            constant = self._constants.setdefault(
+                key, ListConstant(value, builds))
+        return constant
+
+
+def build_rules(rules, builder: ModelBuilder = None) -> list:
+    """ Parse a list of rule dicts, sharing constants between the rules """
+    if builder is None:
+        builder = ModelBuilder()
+    return [builder.build_rule(rule) for rule in rules]
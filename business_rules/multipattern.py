@@ -0,0 +1,318 @@
+"""
+Matching of many substrings, prefixes or suffixes against a string in one
+pass, used by ruleset.RuleSet for the `contains`, `starts_with` and
+`ends_with` conditions on the same string variable. Substrings are found
+with an Aho-Corasick automaton, pure Python or pyahocorasick when it is
+installed.
+"""
+from collections import deque
+
+from .utils import get_condition_variables
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover
+    ahocorasick = None
+
+BACKEND_PYTHON = 'python'
+BACKEND_PYAHOCORASICK = 'pyahocorasick'
+
+PATTERN_OPERATORS = frozenset(('contains', 'starts_with', 'ends_with'))
+
+# variables with fewer distinct patterns are checked condition by condition,
+# which is faster than a pass of the pure Python automaton
+MIN_PATTERNS = 8
+
+# key of the patterns ending at a trie node, never a character
+_END = None
+
+
+class AhoCorasick:
+    """ The patterns occurring in a string, found in a single pass """
+
+    def __init__(self, patterns, backend=None):
+        """
+        :param patterns: strings to find
+        :param backend: BACKEND_PYTHON or BACKEND_PYAHOCORASICK, the latter
+            when installed by default
+        """
+        if backend is None:
+            backend = (BACKEND_PYAHOCORASICK if ahocorasick is not None
+                       else BACKEND_PYTHON)
+        if backend not in (BACKEND_PYTHON, BACKEND_PYAHOCORASICK):
+            raise AssertionError(f'Unknown backend: {backend}')
+        if backend == BACKEND_PYAHOCORASICK and ahocorasick is None:
+            raise ImportError('the pyahocorasick backend requires '
+                              'pyahocorasick')
+        self.patterns = frozenset(patterns)
+        self.backend = backend
+        # found in every string
+        self._empty = frozenset(
+            pattern for pattern in self.patterns if not pattern)
+        patterns = sorted(self.patterns - self._empty)
+        if backend == BACKEND_PYAHOCORASICK:
+            self._automaton = None
+            if patterns:
+                self._automaton = ahocorasick.Automaton()
+                for pattern in patterns:
+                    self._automaton.add_word(pattern, pattern)
+                self._automaton.make_automaton()
+        else:
+            self._build(patterns)
+
+    def _build(self, patterns):
+        # node -> character -> next node, the longest proper suffix of a
+        # node that is a node too, and the patterns ending at a node
+        goto, fail, output = [{}], [0], [[]]
+        for pattern in patterns:
+            node = 0
+            for char in pattern:
+                next_node = goto[node].get(char)
+                if next_node is None:
+                    next_node = len(goto)
+                    goto[node][char] = next_node
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                node = next_node
+            output[node].append(pattern)
+
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                # shallower nodes are done: their outputs are complete
+                output[child].extend(output[fail[child]])
+        self._goto = goto
+        self._fail = fail
+        self._output = [tuple(patterns) for patterns in output]
+
+    def find(self, text) -> set:
+        """ The patterns occurring in `text` """
+        if self.backend == BACKEND_PYAHOCORASICK:
+            return self._find_pyahocorasick(text)
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set(self._empty)
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+    def _find_pyahocorasick(self, text) -> set:
+        found = set(self._empty)
+        if self._automaton is not None:
+            found.update(pattern for _, pattern in self._automaton.iter(text))
+        return found
+
+
+class PrefixTrie:
+    """ The patterns a string starts with, found in a single pass """
+
+    def __init__(self, patterns):
+        self.patterns = frozenset(patterns)
+        self._root = {}
+        for pattern in self.patterns:
+            node = self._root
+            for char in self._key(pattern):
+                node = node.setdefault(char, {})
+            node[_END] = pattern
+
+    @staticmethod
+    def _key(string):
+        return string
+
+    def find(self, text) -> set:
+        """ The patterns `text` starts with """
+        found = set()
+        node = self._root
+        if _END in node:
+            found.add(node[_END])
+        for char in self._key(text):
+            node = node.get(char)
+            if node is None:
+                break
+            if _END in node:
+                found.add(node[_END])
+        return found
+
+
+class SuffixTrie(PrefixTrie):
+    """ The patterns a string ends with, found in a single pass """
+
+    @staticmethod
+    def _key(string):
+        return reversed(string)
+
+
+_MATCHERS = {
+    'contains': AhoCorasick,
+    'starts_with': PrefixTrie,
+    'ends_with': SuffixTrie,
+}
+
+
+class PatternIndex:
+    """
+    The `contains`, `starts_with` and `ends_with` conditions of a list of
+    rules with a constant string value, grouped by variable and operator
+    into one matcher each. The first condition checked on a variable value
+    matches all the patterns of its operator at once; the other conditions
+    on the same value are looked up in the result.
+
+    The guard of a rule is the part of its conditions checked first that
+    only has indexed conditions: the whole tree, or the first child of its
+    `all`. A rule whose guard doesn't hold can't trigger and `candidates`
+    leaves it out without checking anything else.
+
+    Only variables with at least `min_patterns` distinct patterns are
+    indexed. The index is read-only once built.
+    """
+
+    def __init__(self, rules, min_patterns=MIN_PATTERNS):
+        patterns = {}
+        for rule in rules:
+            _collect_patterns(rule['conditions'], patterns)
+        self.matchers = {}
+        for name, operators in patterns.items():
+            if sum(map(len, operators.values())) < min_patterns:
+                continue
+            self.matchers[name] = {
+                operator: _MATCHERS[operator](operator_patterns)
+                for operator, operator_patterns in operators.items()}
+
+        # position of a rule -> its guard; the positions of the rules
+        # guarded by a single condition, by variable, operator and pattern,
+        # the other guards and the positions of the rules without a guard
+        self.guards = {}
+        self._leaf_guards = {}
+        self._tree_guards = {}
+        unguarded = []
+        guard_variables = set()
+        for position, rule in enumerate(rules):
+            guard = self._guard(rule['conditions'])
+            if guard is None:
+                unguarded.append(position)
+                continue
+            self.guards[position] = guard
+            guard_variables |= get_condition_variables(guard)
+            if 'name' in guard:
+                self._leaf_guards.setdefault(
+                    (guard['name'], guard['operator']), {}).setdefault(
+                    guard['value'], []).append(position)
+            else:
+                self._tree_guards[position] = guard
+        self._unguarded = frozenset(unguarded)
+        self.guard_variables = frozenset(guard_variables)
+
+    def __len__(self):
+        """ Number of variables indexed """
+        return len(self.matchers)
+
+    def _guard(self, conditions):
+        if isinstance(conditions, bool):
+            return None
+        if self._is_indexed(conditions):
+            return conditions
+        if list(conditions.keys()) == ['all'] and conditions['all']:
+            return self._guard(conditions['all'][0])
+        return None
+
+    def _is_indexed(self, conditions):
+        """ Whether the tree is evaluated by the index alone """
+        if isinstance(conditions, bool):
+            return True
+        keys = list(conditions.keys())
+        if keys == ['all'] or keys == ['any']:
+            return all(map(self._is_indexed, conditions[keys[0]]))
+        matcher = self.matchers.get(conditions['name'], {}).get(
+            conditions['operator'])
+        return (matcher is not None
+                and not conditions.get('value_is_variable')
+                and conditions['value'].__class__ is str
+                and conditions['value'] in matcher.patterns)
+
+    def candidates(self, positions, values, matches) -> list:
+        """
+        The positions among `positions` of the rules that can trigger
+        :param values: cast value of each of `guard_variables`, all string
+            variables; the conditions on a variable missing are false, e.g.
+            when it timed out
+        :param matches: see `check`
+        """
+        possible = set(self._unguarded)
+        for (name, operator), rules in self._leaf_guards.items():
+            if name not in values:
+                continue
+            for pattern in self._found(name, operator, values[name],
+                                       matches):
+                possible.update(rules.get(pattern, ()))
+        for position, guard in self._tree_guards.items():
+            if self._holds(guard, values, matches):
+                possible.add(position)
+        return [position for position in positions if position in possible]
+
+    def _holds(self, conditions, values, matches):
+        if isinstance(conditions, bool):
+            return conditions
+        keys = list(conditions.keys())
+        if keys == ['all']:
+            return all(self._holds(condition, values, matches)
+                       for condition in conditions['all'])
+        if keys == ['any']:
+            return any(self._holds(condition, values, matches)
+                       for condition in conditions['any'])
+        name = conditions['name']
+        if name not in values:
+            return False
+        return self.check(name, conditions['operator'], values[name],
+                          conditions['value'], matches)
+
+    def check(self, name, operator, value, pattern, matches):
+        """
+        The outcome of `operator` on the cast value of a string variable
+        and a pattern, None when the condition isn't indexed.
+        :param matches: dict holding the patterns found per variable value,
+            for the duration of an evaluation
+        """
+        matcher = self.matchers.get(name, {}).get(operator)
+        if matcher is None or pattern.__class__ is not str or (
+                pattern not in matcher.patterns):
+            return None
+        return pattern in self._found(name, operator, value, matches)
+
+    def _found(self, name, operator, value, matches):
+        """ The patterns of the operator found in the value, matched once
+        per value """
+        found = matches.get((name, operator))
+        if found is None or found[0] is not value and found[0] != value:
+            found = matches[name, operator] = (
+                value, self.matchers[name][operator].find(value))
+        return found[1]
+
+
+def _collect_patterns(conditions, patterns):
+    """ Add the constant string patterns of a condition tree to
+    `patterns`, by variable and operator """
+    if isinstance(conditions, bool):
+        return
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        for condition in conditions[keys[0]]:
+            _collect_patterns(condition, patterns)
+        return
+    operator = conditions['operator']
+    if (operator not in PATTERN_OPERATORS
+            or conditions.get('value_is_variable')
+            or conditions['value'].__class__ is not str):
+        return
+    patterns.setdefault(conditions['name'], {}).setdefault(
+        operator, set()).add(conditions['value'])
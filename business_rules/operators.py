@@ -1,8 +1,9 @@
 import inspect
 import re
 
+from bisect import bisect_left
 from decimal import Decimal
-from functools import wraps
+from functools import partial, wraps
 
 from .fields import (
     FIELD_NO_INPUT,
@@ -14,18 +15,39 @@ from .fields import (
 )
 from .utils import float_to_decimal, fn_name_to_pretty_label
 
+# (type, operator name) -> function of the cast value and comparison value
+_operator_functions = {}
+
 
 class BaseType:
     """Base type"""
+    __slots__ = ('value',)
+
+    # set per subclass: the cast function when _assert_valid_value_and_cast
+    # is a staticmethod, so values can be cast without an instance
+    _cast_function = None
 
     def __init__(self, value):
         """ Ctor """
         self.value = self._assert_valid_value_and_cast(value)
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        caster = inspect.getattr_static(cls, '_assert_valid_value_and_cast')
+        cls._cast_function = (caster.__func__
+                              if isinstance(caster, staticmethod) else None)
+
     def _assert_valid_value_and_cast(self, value):
         """Check value and cast to type"""
         raise NotImplementedError()
 
+    @classmethod
+    def cast(cls, value):
+        """Check value and cast to type without building an instance"""
+        if cls._cast_function is not None:
+            return cls._cast_function(value)
+        return cls(value).value
+
     @classmethod
     def get_all_operators(cls) -> list:
         """Get operators list"""
@@ -35,6 +57,46 @@ class BaseType:
                  'input_type': m[1].input_type}
                 for m in methods if getattr(m[1], 'is_operator', False)]
 
+    @classmethod
+    def get_operator_function(cls, operator_name):
+        """ Functional form of an operator: a function of the value already
+        cast with `cast` and of the raw comparison value. Operators defined
+        as staticmethods run without building an instance of the type. """
+        key = (cls, operator_name)
+        function = _operator_functions.get(key)
+        if function is None:
+            method = getattr(cls, operator_name, None)
+            if not getattr(method, 'is_operator', False):
+                raise AssertionError("Operator {0} does not exist for type {1}".format(
+                    operator_name, cls.__name__))
+            function = _operator_function(cls, method)
+            _operator_functions[key] = function
+        return function
+
+
+def _operator_function(cls, method):
+    no_input = method.input_type == FIELD_NO_INPUT
+    function = method.function
+    if function is None or cls._cast_function is None:
+        # operator of a custom type that needs an instance
+        def call_method(value, comparison_value=None):
+            instance = cls.__new__(cls)
+            instance.value = value
+            if no_input:
+                return method(instance)
+            return method(instance, comparison_value)
+        return call_method
+
+    if method.takes_class:
+        function = partial(function, cls)
+    if no_input:
+        return lambda value, comparison_value=None: function(value)
+    if method.assert_type_for_arguments:
+        cast = cls._cast_function
+        return lambda value, comparison_value: function(
+            value, cast(comparison_value))
+    return function
+
 
 def export_type(cls):
     """ Decorator to expose the given class to business_rules.export_rule_data. """
@@ -49,12 +111,23 @@ def type_operator(input_type, label=None,
     - assert_type_for_arguments - if True this patches the operator function
       so that arguments passed to it will have _assert_valid_value_and_cast
       called on them to make type errors explicit.
+
+    The operator can be a method, or a staticmethod taking the value of the
+    type instead of the instance, or a classmethod taking the type and the
+    value, e.g. to read class attributes subclasses may override. The
+    latter two are available without an instance through
+    BaseType.get_operator_function.
     """
 
     def wrapper(func):
+        function = None
+        takes_class = isinstance(func, classmethod)
+        if takes_class or isinstance(func, staticmethod):
+            func = function = func.__func__
         func.is_operator = True
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.input_type = input_type
+        func.assert_type_for_arguments = assert_type_for_arguments
 
         @wraps(func)
         def inner(self, *args, **kwargs):
@@ -62,19 +135,90 @@ def type_operator(input_type, label=None,
                 args = [self._assert_valid_value_and_cast(arg) for arg in args]
                 kwargs = dict((k, self._assert_valid_value_and_cast(v))
                               for k, v in kwargs.items())
+            if takes_class:
+                return function(type(self), self.value, *args, **kwargs)
+            if function is not None:
+                return function(self.value, *args, **kwargs)
             return func(self, *args, **kwargs)
 
+        inner.function = function
+        inner.takes_class = takes_class
         return inner
 
     return wrapper
 
 
+def _list_lookup(values, build):
+    """ The lookup `build` makes of the comparison list of a list operator:
+    the one a ListConstant holds, built with the rule, or a new one """
+    if isinstance(values, ListConstant):
+        lookup = values.lookups.get(build)
+        if lookup is not None:
+            return lookup
+    elif not isinstance(values, (list, tuple, set, frozenset)):
+        raise AssertionError("{0} is not a valid list".format(values))
+    return build(values)
+
+
+def _string_set(values):
+    return frozenset(StringType.cast(value) for value in values)
+
+
+def _lower_string_set(values):
+    return frozenset(StringType.cast(value).lower() for value in values)
+
+
+def _sorted_numbers(values):
+    return sorted(NumericType.cast(value) for value in values)
+
+
+# list operator -> the lookups its types make of the comparison list
+LIST_LOOKUPS = {
+    'in_list': (_string_set, _sorted_numbers),
+    'not_in_list': (_string_set, _sorted_numbers),
+    'in_list_case_insensitive': (_lower_string_set,),
+    'not_in_list_case_insensitive': (_lower_string_set,),
+}
+
+
+class ListConstant(tuple):
+    """
+    The comparison list of a list operator in a rule, a tuple holding the
+    lookups the operators search: a set of strings or a sorted list of
+    numbers, by the function building them. model.ModelBuilder builds them
+    once with the rule, so that a list of thousands of values costs about
+    as much as a single `equal_to`.
+    """
+
+    def __new__(cls, values, builds=()):
+        constant = super().__new__(cls, values)
+        constant.lookups = {}
+        for build in builds:
+            try:
+                constant.lookups[build] = build(constant)
+            except (AssertionError, TypeError):
+                # values of another type, left for the operator to raise
+                pass
+        return constant
+
+
+def _in_sorted_numbers(numbers, value, epsilon):
+    """ Whether a number of the sorted list is equal to value within
+    epsilon: the closest ones are on either side of its position """
+    index = bisect_left(numbers, value)
+    if index < len(numbers) and abs(value - numbers[index]) <= epsilon:
+        return True
+    return index > 0 and abs(value - numbers[index - 1]) <= epsilon
+
+
 @export_type
 class StringType(BaseType):
     """String type"""
+    __slots__ = ()
     name = "string"
 
-    def _assert_valid_value_and_cast(self, value):
+    @staticmethod
+    def _assert_valid_value_and_cast(value):
         """ """
         value = value or ""
         if not isinstance(value, str):
@@ -83,54 +227,92 @@ class StringType(BaseType):
         return value
 
     @type_operator(FIELD_TEXT)
-    def equal_to(self, other_string):
+    @staticmethod
+    def equal_to(value, other_string):
         """Equal to"""
-        return self.value == other_string
+        return value == other_string
 
     @type_operator(FIELD_TEXT, label="Equal To (case insensitive)")
-    def equal_to_case_insensitive(self, other_string):
+    @staticmethod
+    def equal_to_case_insensitive(value, other_string):
         """Equal to CI"""
-        return self.value.lower() == other_string.lower()
+        return value.lower() == other_string.lower()
 
     @type_operator(FIELD_TEXT)
-    def not_equal_to(self, other_string):
+    @staticmethod
+    def not_equal_to(value, other_string):
         """Not equal to"""
-        return self.value != other_string
+        return value != other_string
 
     @type_operator(FIELD_TEXT, label="Not Equal To (case insensitive)")
-    def not_equal_to_case_insensitive(self, other_string):
+    @staticmethod
+    def not_equal_to_case_insensitive(value, other_string):
         """Not equal to CI"""
-        return self.value.lower() != other_string.lower()
+        return value.lower() != other_string.lower()
 
     @type_operator(FIELD_TEXT)
-    def starts_with(self, other_string):
+    @staticmethod
+    def starts_with(value, other_string):
         """Starts with"""
-        return self.value.startswith(other_string)
+        return value.startswith(other_string)
 
     @type_operator(FIELD_TEXT)
-    def ends_with(self, other_string):
+    @staticmethod
+    def ends_with(value, other_string):
         """Ends with"""
-        return self.value.endswith(other_string)
+        return value.endswith(other_string)
 
     @type_operator(FIELD_TEXT)
-    def contains(self, other_string):
+    @staticmethod
+    def contains(value, other_string):
         """Contains"""
-        return other_string in self.value
+        return other_string in value
 
     @type_operator(FIELD_TEXT)
-    def matches_regex(self, regex):
+    @staticmethod
+    def matches_regex(value, regex):
         """RE matches"""
-        return re.search(regex, self.value)
+        return re.search(regex, value)
 
     @type_operator(FIELD_NO_INPUT)
-    def non_empty(self):
+    @staticmethod
+    def non_empty(value):
         """Non empty """
-        return bool(self.value)
+        return bool(value)
+
+    @type_operator(FIELD_MULTIPLE, assert_type_for_arguments=False)
+    @staticmethod
+    def in_list(value, other_strings):
+        """Equal to one of the strings"""
+        return value in _list_lookup(other_strings, _string_set)
+
+    @type_operator(FIELD_MULTIPLE, label="In List (case insensitive)",
+                   assert_type_for_arguments=False)
+    @staticmethod
+    def in_list_case_insensitive(value, other_strings):
+        """Equal to one of the strings CI"""
+        return value.lower() in _list_lookup(other_strings,
+                                             _lower_string_set)
+
+    @type_operator(FIELD_MULTIPLE, assert_type_for_arguments=False)
+    @staticmethod
+    def not_in_list(value, other_strings):
+        """Equal to none of the strings"""
+        return value not in _list_lookup(other_strings, _string_set)
+
+    @type_operator(FIELD_MULTIPLE, label="Not In List (case insensitive)",
+                   assert_type_for_arguments=False)
+    @staticmethod
+    def not_in_list_case_insensitive(value, other_strings):
+        """Equal to none of the strings CI"""
+        return value.lower() not in _list_lookup(other_strings,
+                                                 _lower_string_set)
 
 
 @export_type
 class NumericType(BaseType):
     """Numeric type"""
+    __slots__ = ()
     EPSILON = Decimal('0.000001')
 
     name = "numeric"
@@ -149,37 +331,58 @@ class NumericType(BaseType):
                              format(value))
 
     @type_operator(FIELD_NUMERIC)
-    def equal_to(self, other_numeric):
+    @classmethod
+    def equal_to(cls, value, other_numeric):
         """Equal to"""
-        return abs(self.value - other_numeric) <= self.EPSILON
+        return abs(value - other_numeric) <= cls.EPSILON
 
     @type_operator(FIELD_NUMERIC)
-    def greater_than(self, other_numeric):
+    @classmethod
+    def greater_than(cls, value, other_numeric):
         """Greate than"""
-        return (self.value - other_numeric) > self.EPSILON
+        return (value - other_numeric) > cls.EPSILON
 
     @type_operator(FIELD_NUMERIC)
-    def greater_than_or_equal_to(self, other_numeric):
-        """Greater or equal """
-        return self.greater_than(other_numeric) or self.equal_to(other_numeric)
+    @classmethod
+    def greater_than_or_equal_to(cls, value, other_numeric):
+        """Greater or equal: greater than or equal to within epsilon"""
+        return (value - other_numeric) >= -cls.EPSILON
 
     @type_operator(FIELD_NUMERIC)
-    def less_than(self, other_numeric):
+    @classmethod
+    def less_than(cls, value, other_numeric):
         """Less then"""
-        return (other_numeric - self.value) > self.EPSILON
+        return (other_numeric - value) > cls.EPSILON
 
     @type_operator(FIELD_NUMERIC)
-    def less_than_or_equal_to(self, other_numeric):
-        """Less or equal"""
-        return self.less_than(other_numeric) or self.equal_to(other_numeric)
+    @classmethod
+    def less_than_or_equal_to(cls, value, other_numeric):
+        """Less or equal: less than or equal to within epsilon"""
+        return (value - other_numeric) <= cls.EPSILON
+
+    @type_operator(FIELD_MULTIPLE, assert_type_for_arguments=False)
+    @classmethod
+    def in_list(cls, value, other_numerics):
+        """Equal to one of the numbers within epsilon"""
+        return _in_sorted_numbers(
+            _list_lookup(other_numerics, _sorted_numbers), value, cls.EPSILON)
+
+    @type_operator(FIELD_MULTIPLE, assert_type_for_arguments=False)
+    @classmethod
+    def not_in_list(cls, value, other_numerics):
+        """Equal to none of the numbers within epsilon"""
+        return not _in_sorted_numbers(
+            _list_lookup(other_numerics, _sorted_numbers), value, cls.EPSILON)
 
 
 @export_type
 class BooleanType(BaseType):
     """Boolean type"""
+    __slots__ = ()
     name = "boolean"
 
-    def _assert_valid_value_and_cast(self, value):
+    @staticmethod
+    def _assert_valid_value_and_cast(value):
         """Check value and cast to type"""
         if not isinstance(value, bool):
             raise AssertionError("{0} is not a valid boolean type".
@@ -187,60 +390,88 @@ class BooleanType(BaseType):
         return value
 
     @type_operator(FIELD_NO_INPUT)
-    def is_true(self):
+    @staticmethod
+    def is_true(value):
         """is true"""
-        return self.value
+        return value
 
     @type_operator(FIELD_NO_INPUT)
-    def is_false(self):
+    @staticmethod
+    def is_false(value):
         """is false"""
-        return not self.value
+        return not value
+
+
+def _case_insensitive_equal_to(value_from_list, other_value):
+    """Equal to CI"""
+    if (isinstance(value_from_list, str) and
+            isinstance(other_value, str)):
+        return value_from_list.lower() == other_value.lower()
+
+    return value_from_list == other_value
+
+
+def _select_contains(values, other_value):
+    """Whether values contain other_value, case insensitive"""
+    for val in values:
+        if _case_insensitive_equal_to(val, other_value):
+            return True
+    return False
 
 
 @export_type
 class SelectType(BaseType):
     """Select type"""
+    __slots__ = ()
     name = "select"
 
-    def _assert_valid_value_and_cast(self, value):
+    @staticmethod
+    def _assert_valid_value_and_cast(value):
         """Check value and cast to type"""
         if not hasattr(value, '__iter__'):
             raise AssertionError("{0} is not a valid select type".
                                  format(value))
         return value
 
-    @staticmethod
-    def _case_insensitive_equal_to(value_from_list, other_value):
-        """Equal to CI"""
-        if (isinstance(value_from_list, str) and
-                isinstance(other_value, str)):
-            return value_from_list.lower() == other_value.lower()
-
-        return value_from_list == other_value
+    _case_insensitive_equal_to = staticmethod(_case_insensitive_equal_to)
 
     @type_operator(FIELD_SELECT, assert_type_for_arguments=False)
-    def contains(self, other_value):
+    @staticmethod
+    def contains(value, other_value):
         """Contains"""
-        for val in self.value:
-            if self._case_insensitive_equal_to(val, other_value):
-                return True
-        return False
+        return _select_contains(value, other_value)
 
     @type_operator(FIELD_SELECT, assert_type_for_arguments=False)
-    def does_not_contain(self, other_value):
+    @staticmethod
+    def does_not_contain(value, other_value):
         """Doesn't contain"""
-        for val in self.value:
-            if self._case_insensitive_equal_to(val, other_value):
-                return False
-        return True
+        return not _select_contains(value, other_value)
+
+
+def _select_contains_all(values, other_values):
+    """Whether values contain every one of other_values"""
+    for other_val in other_values:
+        if not _select_contains(values, other_val):
+            return False
+    return True
+
+
+def _select_shares_at_least_one(values, other_values):
+    """Whether values contain one of other_values"""
+    for other_val in other_values:
+        if _select_contains(values, other_val):
+            return True
+    return False
 
 
 @export_type
 class SelectMultipleType(BaseType):
     """Select multiple type"""
+    __slots__ = ()
     name = "select_multiple"
 
-    def _assert_valid_value_and_cast(self, value):
+    @staticmethod
+    def _assert_valid_value_and_cast(value):
         """Check value and cast"""
         if not hasattr(value, '__iter__'):
             raise AssertionError("{0} is not a valid select multiple type".
@@ -248,100 +479,101 @@ class SelectMultipleType(BaseType):
         return value
 
     @type_operator(FIELD_SELECT_MULTIPLE)
-    def contains_all(self, other_value):
+    @staticmethod
+    def contains_all(value, other_value):
         """Contains all"""
-        select = SelectType(self.value)
-        for other_val in other_value:
-            if not select.contains(other_val):
-                return False
-        return True
+        return _select_contains_all(value, other_value)
 
     @type_operator(FIELD_SELECT_MULTIPLE)
-    def is_contained_by(self, other_value):
+    @staticmethod
+    def is_contained_by(value, other_value):
         """Is contained by"""
-        other_select_multiple = SelectMultipleType(other_value)
-        return other_select_multiple.contains_all(self.value)
+        return _select_contains_all(other_value, value)
 
     @type_operator(FIELD_SELECT_MULTIPLE)
-    def shares_at_least_one_element_with(self, other_value):
+    @staticmethod
+    def shares_at_least_one_element_with(value, other_value):
         """Shares at least uno elemento"""
-        select = SelectType(self.value)
-        for other_val in other_value:
-            if select.contains(other_val):
-                return True
-        return False
+        return _select_shares_at_least_one(value, other_value)
 
     @type_operator(FIELD_SELECT_MULTIPLE)
-    def shares_exactly_one_element_with(self, other_value):
+    @staticmethod
+    def shares_exactly_one_element_with(value, other_value):
         """Shares only one"""
         found_one = False
-        select = SelectType(self.value)
         for other_val in other_value:
-            if select.contains(other_val):
+            if _select_contains(value, other_val):
                 if found_one:
                     return False
                 found_one = True
         return found_one
 
     @type_operator(FIELD_SELECT_MULTIPLE)
-    def shares_no_elements_with(self, other_value):
+    @staticmethod
+    def shares_no_elements_with(value, other_value):
         """No shares"""
-        return not self.shares_at_least_one_element_with(other_value)
+        return not _select_shares_at_least_one(value, other_value)
+
+
+def _to_frozenset(other_value) -> frozenset:
+    """Split string by separators to set"""
+    if isinstance(other_value, (set, list, tuple)):
+        return frozenset(other_value)
+
+    if isinstance(other_value, str):
+        max_count = 1
+        best_sep = ','
+        for sep in (',', ';'):
+            count = other_value.count(sep)
+            if max_count < count:
+                max_count = count
+                best_sep = sep
+        return frozenset(other_value.split(best_sep))
+
+    raise AssertionError(f'{other_value} unexpected type')
 
 
 @export_type
 class MultipleType(BaseType):
     """Select multiple type"""
+    __slots__ = ()
     name = 'multiple'
 
-    def _assert_valid_value_and_cast(self, value):
+    @staticmethod
+    def _assert_valid_value_and_cast(value):
         """Check value and cast"""
         if not hasattr(value, '__iter__'):
             raise AssertionError(f"{value} is not a valid iterable type")
         return value
 
-    @staticmethod
-    def _to_frozenset(other_value) -> frozenset:
-        """Split string by separators to set"""
-        if isinstance(other_value, (set, list, tuple)):
-            return frozenset(other_value)
-
-        if isinstance(other_value, str):
-            max_count = 1
-            best_sep = ','
-            for sep in (',', ';'):
-                count = other_value.count(sep)
-                if max_count < count:
-                    max_count = count
-                    best_sep = sep
-            return frozenset(other_value.split(best_sep))
-
-        raise AssertionError(f'{other_value} unexpected type')
+    _to_frozenset = staticmethod(_to_frozenset)
 
     @type_operator(FIELD_MULTIPLE)
-    def contains_all(self, other_value):
+    @staticmethod
+    def contains_all(value, other_value):
         """Contains all"""
-        value = self._to_frozenset(self.value)
-        other_value: frozenset = self._to_frozenset(other_value)
+        value = _to_frozenset(value)
+        other_value: frozenset = _to_frozenset(other_value)
         return len(value & other_value) == len(value)
 
     @type_operator(FIELD_MULTIPLE)
-    def shares_at_least_one_element_with(self, other_value):
+    @staticmethod
+    def shares_at_least_one_element_with(value, other_value):
         """Shares at least one element"""
-        value = self._to_frozenset(self.value)
-        other_value: frozenset = self._to_frozenset(other_value)
-        if value & other_value:
+        if _to_frozenset(value) & _to_frozenset(other_value):
             return True
         return False
 
     @type_operator(FIELD_MULTIPLE)
-    def shares_exactly_one_element_with(self, other_value):
+    @staticmethod
+    def shares_exactly_one_element_with(value, other_value):
         """Shares only one"""
-        value = self._to_frozenset(self.value)
-        other_value: frozenset = self._to_frozenset(other_value)
+        value = _to_frozenset(value)
+        other_value: frozenset = _to_frozenset(other_value)
         return len(value & other_value) == 1
 
     @type_operator(FIELD_MULTIPLE)
-    def shares_no_elements_with(self, other_value):
+    @staticmethod
+    def shares_no_elements_with(value, other_value):
         """No shares"""
-        return not self.shares_at_least_one_element_with(other_value)
+        return not (_to_frozenset(value) & _to_frozenset(other_value))
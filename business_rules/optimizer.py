@@ -0,0 +1,225 @@
+from collections.abc import Mapping
+from decimal import Decimal
+
+from .operators import NumericType
+
+LOWER_BOUND_OPERATORS = ('greater_than', 'greater_than_or_equal_to')
+UPPER_BOUND_OPERATORS = ('less_than', 'less_than_or_equal_to')
+NUMERIC_BOUND_OPERATORS = (
+    LOWER_BOUND_OPERATORS + UPPER_BOUND_OPERATORS + ('equal_to',))
+
+
+def simplify(conditions) -> tuple:
+    """
+    Simplify a condition tree without changing its outcome:
+    - nested groups of the same type are flattened
+    - groups with a single child are replaced by the child
+    - duplicate children are removed
+    - numeric bounds on the same variable are folded, e.g.
+      `> 5 AND > 10` into `> 10` and `> 5 OR > 10` into `> 5`
+
+    A tree that always has the same outcome, e.g. contradictory bounds, is
+    replaced by the boolean constant, which the engine evaluates as is.
+
+    Returns the simplified tree and the list of changes made.
+    """
+    changes = []
+    return _simplify(conditions, changes), changes
+
+
+def count_nodes(conditions) -> int:
+    """ Number of nodes of a condition tree """
+    if isinstance(conditions, bool):
+        return 1
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        return 1 + sum(count_nodes(condition)
+                       for condition in conditions[keys[0]])
+    return 1
+
+
+def _simplify(conditions, changes):
+    if isinstance(conditions, bool):
+        return conditions
+    keys = list(conditions.keys())
+    if keys != ['all'] and keys != ['any']:
+        return conditions
+
+    kind = keys[0]
+    assert len(conditions[kind]) >= 1
+    # the constant that decides the group, e.g. any false child of an all
+    decisive = kind == 'any'
+
+    children = []
+    for condition in conditions[kind]:
+        condition = _simplify(condition, changes)
+        if isinstance(condition, bool):
+            if condition == decisive:
+                changes.append(f'{kind} is always {decisive}: constant child')
+                return decisive
+            changes.append(f'removed constant {condition} child of {kind}')
+            continue
+        if list(condition.keys()) == [kind]:
+            changes.append(f'flattened nested {kind}')
+            children.extend(condition[kind])
+        else:
+            children.append(condition)
+
+    unique, seen = [], set()
+    for condition in children:
+        key = _condition_key(condition)
+        if key in seen:
+            changes.append(f'removed duplicate condition {_describe(condition)}')
+            continue
+        if key is not None:
+            seen.add(key)
+        unique.append(condition)
+
+    folded = _fold_numeric_bounds(kind, unique, changes)
+    if isinstance(folded, bool):
+        return folded
+
+    if not folded:
+        changes.append(f'{kind} without conditions is always {not decisive}')
+        return not decisive
+    if len(folded) == 1:
+        changes.append(f'unwrapped single condition {kind}')
+        return folded[0]
+    return {kind: folded}
+
+
+def _condition_key(condition):
+    """ Hashable form of a condition, equal for equal conditions, None when
+    a value can't be hashed """
+    try:
+        key = _freeze(condition)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _freeze(value):
+    if isinstance(value, Mapping):
+        return frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    return value
+
+
+def _describe(condition):
+    if list(condition.keys()) in (['all'], ['any']):
+        return list(condition.keys())[0]
+    return f'{condition["name"]} {condition["operator"]} {condition["value"]}'
+
+
+def _bound(condition):
+    """ The lower and upper bound (value, closed) of the numbers satisfying
+    the condition, None for an unbounded side and for other conditions """
+    if (list(condition.keys()) in (['all'], ['any'])
+            or condition.get('value_is_variable')
+            or condition['operator'] not in NUMERIC_BOUND_OPERATORS):
+        return None
+    value = condition['value']
+    if isinstance(value, bool) or not isinstance(value, (int, float, Decimal)):
+        return None
+
+    value = NumericType._assert_valid_value_and_cast(value)
+    epsilon = NumericType.EPSILON
+    operator = condition['operator']
+    if operator == 'greater_than':
+        return (value + epsilon, False), None
+    if operator == 'greater_than_or_equal_to':
+        return (value - epsilon, True), None
+    if operator == 'less_than':
+        return None, (value - epsilon, False)
+    if operator == 'less_than_or_equal_to':
+        return None, (value + epsilon, True)
+    return (value - epsilon, True), (value + epsilon, True)
+
+
+def _tighter_lower(bound, other):
+    return bound[0] > other[0] or (bound[0] == other[0] and not bound[1])
+
+
+def _tighter_upper(bound, other):
+    return bound[0] < other[0] or (bound[0] == other[0] and not bound[1])
+
+
+def _fold_numeric_bounds(kind, conditions, changes):
+    """ Keep the tightest bounds per variable in an `all` and the loosest
+    one-sided bounds in an `any`, or return the constant outcome """
+    bounds = {}
+    for index, condition in enumerate(conditions):
+        bound = _bound(condition)
+        if bound is not None:
+            bounds.setdefault(condition['name'], []).append((index, bound))
+
+    dropped = set()
+    for name, variable_bounds in bounds.items():
+        if len(variable_bounds) < 2:
+            continue
+        if kind == 'all':
+            kept = _fold_intersection(variable_bounds)
+            if kept is None:
+                changes.append(f'all is always False: contradictory bounds '
+                               f'on {name}')
+                return False
+        else:
+            kept = _fold_union(variable_bounds)
+            if kept is None:
+                changes.append(f'any is always True: bounds on {name} '
+                               f'cover every number')
+                return True
+        removed = {index for index, _ in variable_bounds} - kept
+        if removed:
+            changes.append(f'folded {len(variable_bounds)} bounds on {name} '
+                           f'into {len(variable_bounds) - len(removed)}')
+            dropped |= removed
+
+    return [condition for index, condition in enumerate(conditions)
+            if index not in dropped]
+
+
+def _fold_intersection(variable_bounds):
+    """ Indexes of the conditions giving the tightest bounds, None when no
+    number satisfies every condition """
+    lower = upper = None
+    for index, (lower_bound, upper_bound) in variable_bounds:
+        if lower_bound is not None and (
+                lower is None or _tighter_lower(lower_bound, lower[1])):
+            lower = (index, lower_bound)
+        if upper_bound is not None and (
+                upper is None or _tighter_upper(upper_bound, upper[1])):
+            upper = (index, upper_bound)
+
+    if lower is not None and upper is not None:
+        low, high = lower[1], upper[1]
+        if low[0] > high[0] or (low[0] == high[0]
+                                and not (low[1] and high[1])):
+            return None
+    return {bound[0] for bound in (lower, upper) if bound is not None}
+
+
+def _fold_union(variable_bounds):
+    """ Indexes of the conditions to keep in an `any`: the loosest lower and
+    upper one-sided bounds and every two-sided condition, None when the
+    one-sided bounds cover every number """
+    lower = upper = None
+    kept = set()
+    for index, (lower_bound, upper_bound) in variable_bounds:
+        if lower_bound is not None and upper_bound is not None:
+            kept.add(index)
+        elif lower_bound is not None:
+            if lower is None or _tighter_lower(lower[1], lower_bound):
+                lower = (index, lower_bound)
+        elif upper is None or _tighter_upper(upper[1], upper_bound):
+            upper = (index, upper_bound)
+
+    if lower is not None and upper is not None:
+        low, high = lower[1], upper[1]
+        if low[0] < high[0] or (low[0] == high[0] and (low[1] or high[1])):
+            return None
+    return kept | {bound[0] for bound in (lower, upper) if bound is not None}
@@ -0,0 +1,287 @@
+"""
+Coverage and cost of rules over a workload: how often each rule and each
+condition node is reached and true, how often groups short-circuit, the
+time spent in them and the latency of every variable.
+"""
+import json
+import threading
+import time
+from contextvars import ContextVar
+
+_active_profiler = ContextVar('business_rules_profiler', default=None)
+
+
+def active_profiler():
+    """ The profiler bound with `with profiler:`, None when not profiling """
+    return _active_profiler.get()
+
+
+class _Stats:
+    __slots__ = ('evaluations', 'hits', 'time')
+
+    def __init__(self):
+        self.evaluations = 0
+        self.hits = 0
+        self.time = 0.0
+
+    def add(self, hit, elapsed):
+        self.evaluations += 1
+        self.hits += bool(hit)
+        self.time += elapsed
+
+
+class _VariableStats:
+    __slots__ = ('calls', 'time', 'max_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.max_time = 0.0
+
+
+class RuleProfile:
+    """ Statistics of one rule and of its condition nodes, by node object """
+
+    def __init__(self, rule, lock):
+        self.rule = rule
+        self.stats = _Stats()
+        self.nodes = {}
+        self._lock = lock
+
+    def record(self, node, result, elapsed):
+        with self._lock:
+            entry = self.nodes.get(id(node))
+            if entry is None:
+                entry = self.nodes[id(node)] = (node, _Stats())
+            entry[1].add(result, elapsed)
+
+    def node_stats(self, node):
+        entry = self.nodes.get(id(node))
+        return entry[1] if entry is not None else _Stats()
+
+
+class Profiler:
+    """
+    Collects the statistics of the evaluations started while it is bound:
+
+        profiler = Profiler()
+        with profiler:
+            for facts in workload:
+                await run_all(rules, ProductVariables(facts), actions)
+        print(profiler.to_table())
+
+    The tasks created in the block, e.g. by asyncio.gather, are profiled
+    too. Rules are told apart by object, so the same rule dicts or model
+    should be evaluated throughout the workload. Profiling adds a timer
+    per condition node and per variable read; decision tables are not used
+    while profiling, so that every node is measured.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.variables = {}
+        self._lock = threading.Lock()
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens.append(_active_profiler.set(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        _active_profiler.reset(self._tokens.pop())
+
+    def rule_profile(self, rule) -> RuleProfile:
+        with self._lock:
+            profile = self.rules.get(id(rule))
+            if profile is None:
+                profile = self.rules[id(rule)] = RuleProfile(rule, self._lock)
+            return profile
+
+    def start_rule(self, context, rule):
+        """ Bind the profile of `rule` to the evaluation context, returns
+        the token to pass to `end_rule` """
+        previous = context.rule_profile
+        context.rule_profile = self.rule_profile(rule)
+        return previous, time.perf_counter()
+
+    def end_rule(self, context, token, triggered):
+        previous, start = token
+        profile = context.rule_profile
+        context.rule_profile = previous
+        if triggered is not None:
+            with self._lock:
+                profile.stats.add(triggered, time.perf_counter() - start)
+
+    def record_variable(self, name, elapsed):
+        with self._lock:
+            stats = self.variables.get(name)
+            if stats is None:
+                stats = self.variables[name] = _VariableStats()
+            stats.calls += 1
+            stats.time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+
+    def reset(self):
+        with self._lock:
+            self.rules.clear()
+            self.variables.clear()
+
+    def report(self) -> dict:
+        """
+        {'rules': [{'rule': position, 'id': rule id, 'evaluations',
+                    'triggered', 'hit_rate', 'time', 'nodes': [...]}],
+         'variables': [{'name', 'calls', 'time', 'mean_time', 'max_time'}]}
+
+        Rules are listed in the order they were first evaluated, nodes in
+        depth-first order with the path of child positions from the root.
+        A node's `reached_rate` is the share of the evaluations of its parent
+        that reached it, a group's `short_circuit_rate` the share of its
+        evaluations that stopped before the last child. Times are in
+        seconds and include the children.
+        """
+        with self._lock:
+            profiles = list(self.rules.values())
+            variables = dict(self.variables)
+        rules = []
+        for position, profile in enumerate(profiles):
+            stats = profile.stats
+            nodes = []
+            conditions = profile.rule.get('conditions')
+            if not isinstance(conditions, bool):
+                self._report_nodes(profile, conditions, (), stats.evaluations,
+                                   nodes)
+            rules.append({
+                'rule': position,
+                'id': profile.rule.get('id'),
+                'evaluations': stats.evaluations,
+                'triggered': stats.hits,
+                'hit_rate': _rate(stats.hits, stats.evaluations),
+                'time': stats.time,
+                'nodes': nodes,
+            })
+        return {
+            'rules': rules,
+            'variables': [{
+                'name': name,
+                'calls': stats.calls,
+                'time': stats.time,
+                'mean_time': stats.time / stats.calls,
+                'max_time': stats.max_time,
+            } for name, stats in sorted(variables.items(),
+                                        key=lambda item: -item[1].time)],
+        }
+
+    def _report_nodes(self, profile, node, path, parent_evaluations, nodes):
+        stats = profile.node_stats(node)
+        kind, children = _node_kind(node)
+        entry = {
+            'path': list(path),
+            'kind': kind,
+            'evaluations': stats.evaluations,
+            'reached_rate': _rate(stats.evaluations, parent_evaluations),
+            'hit_rate': _rate(stats.hits, stats.evaluations),
+            'time': stats.time,
+        }
+        if children is None:
+            entry['name'] = node['name']
+            entry['operator'] = node['operator']
+        else:
+            last = children[-1]
+            last_evaluations = (profile.node_stats(last).evaluations
+                                if not isinstance(last, bool)
+                                else stats.evaluations)
+            entry['short_circuit_rate'] = _rate(
+                stats.evaluations - last_evaluations, stats.evaluations)
+        nodes.append(entry)
+        for index, child in enumerate(children or ()):
+            if not isinstance(child, bool):
+                self._report_nodes(profile, child, path + (index,),
+                                   stats.evaluations, nodes)
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.report(), **kwargs)
+
+    def to_table(self) -> str:
+        """ The report as aligned text, one line per rule, node and
+        variable """
+        report = self.report()
+        lines = [f'{"node":<48} {"evals":>8} {"reached":>8} {"hit":>7} '
+                 f'{"short":>7} {"time ms":>10}']
+        for rule in report['rules']:
+            label = f'rule {rule["rule"]}'
+            if rule['id'] is not None:
+                label += f' ({rule["id"]})'
+            lines.append(f'{label:<48.48} {rule["evaluations"]:>8} '
+                         f'{"":>8} {_percent(rule["hit_rate"])} {"":>7} '
+                         f'{rule["time"] * 1000:>10.3f}')
+            for node in rule['nodes']:
+                indent = '  ' * (len(node['path']) + 1)
+                if node['kind'] == 'condition':
+                    label = f'{node["name"]} {node["operator"]}'
+                else:
+                    label = node['kind']
+                short = (_percent(node['short_circuit_rate'])
+                         if 'short_circuit_rate' in node else f'{"":>7}')
+                lines.append(
+                    f'{indent + label:<48.48} {node["evaluations"]:>8} '
+                    f'{_percent(node["reached_rate"]):>8} '
+                    f'{_percent(node["hit_rate"])} {short} '
+                    f'{node["time"] * 1000:>10.3f}')
+        lines.append('')
+        lines.append(f'{"variable":<48} {"calls":>8} {"mean ms":>10} '
+                     f'{"max ms":>10} {"time ms":>10}')
+        for variable in report['variables']:
+            lines.append(f'{variable["name"]:<48.48} {variable["calls"]:>8} '
+                         f'{variable["mean_time"] * 1000:>10.3f} '
+                         f'{variable["max_time"] * 1000:>10.3f} '
+                         f'{variable["time"] * 1000:>10.3f}')
+        return '\n'.join(lines)
+
+    def suggest_order(self, rule):
+        """
+        The conditions of a profiled rule with the children of every group
+        reordered by expected cost: in an `all`, children with the lowest
+        mean time per chance of being false come first, in an `any` per
+        chance of being true. Children never reached keep their order after
+        the measured ones. Returns a new condition tree.
+        """
+        profile = self.rules.get(id(rule))
+        if profile is None:
+            raise AssertionError('Rule was not evaluated by this profiler')
+        return self._reorder(profile, rule['conditions'])
+
+    def _reorder(self, profile, node):
+        kind, children = _node_kind(node)
+        if children is None:
+            return node
+
+        def cost(position):
+            stats = profile.node_stats(children[position])
+            if not stats.evaluations:
+                return 1, 0, position
+            hit_rate = stats.hits / stats.evaluations
+            deciding = 1 - hit_rate if kind == 'all' else hit_rate
+            if not deciding:
+                return 0, float('inf'), position
+            return 0, stats.time / stats.evaluations / deciding, position
+
+        order = sorted(range(len(children)), key=cost)
+        return {kind: [self._reorder(profile, children[position])
+                       for position in order]}
+
+
+def _node_kind(node):
+    if isinstance(node, bool):
+        return 'constant', None
+    keys = list(node.keys())
+    if keys == ['all'] or keys == ['any']:
+        return keys[0], list(node[keys[0]])
+    return 'condition', None
+
+
+def _rate(count, total):
+    return count / total if total else None
+
+
+def _percent(rate):
+    return f'{"-":>7}' if rate is None else f'{rate:>7.1%}'
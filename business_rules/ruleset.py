@@ -0,0 +1,220 @@
+from .actions import BaseActions
+from .context import EvaluationContext, evaluation_context
+from .decision_table import DecisionTable
+from .engine import (
+    VariableTimeout,
+    _get_variable,
+    _make_context,
+    get_rule_priority,
+    run_ordered
+)
+from .multipattern import PatternIndex
+from .operators import StringType
+from .profiling import active_profiler
+from .sync_engine import (
+    _assert_supports_sync,
+    _get_variable_sync,
+    run_ordered_sync
+)
+from .variables import (
+    TIMEOUT_FALSE,
+    TIMEOUT_RAISE,
+    BaseVariables,
+    MappingVariables
+)
+
+
+class RuleSet:
+    """
+    A list of rules checked in priority order: rules with a higher
+    `priority` first, rules of equal priority in list order. By default
+    the first rule triggered wins and the remaining rules are not checked.
+
+    Indexes narrowing down the rules that can trigger pass the positions
+    of their candidates in `rules`, which are checked in the same order.
+
+    When only the first rule triggered is wanted and the rules have the
+    shape of a decision table, they are compiled once per variables class
+    into a decision_table.DecisionTable and looked up instead, reading the
+    variables checking the rules one by one would read.
+
+    The `contains`, `starts_with` and `ends_with` conditions of the rules
+    on a string variable with many different values are indexed into a
+    multipattern.PatternIndex, which matches all of them in one pass over
+    the value of the variable. Rules whose first conditions are indexed
+    and don't hold are not checked; the variables they read are read once,
+    before the rules are checked.
+
+    The rules and their order are fixed once the set is built, so that a
+    rule set can be shared by threads.
+    """
+
+    def __init__(self, rules: list, use_decision_table: bool = True,
+                 use_pattern_index: bool = True):
+        self.rules = tuple(rules)
+        self.order = tuple(sorted(range(len(self.rules)),
+                                  key=lambda index: -get_rule_priority(
+                                      self.rules[index])))
+        self._rank = {index: rank for rank, index in enumerate(self.order)}
+        self.use_decision_table = use_decision_table
+        self._decision_tables = {}
+        self.pattern_index = None
+        if use_pattern_index:
+            self.pattern_index = PatternIndex(self.rules) or None
+
+    def __len__(self):
+        return len(self.rules)
+
+    def ordered(self, candidates=None) -> list:
+        """ The rules, or the rules at the positions `candidates`, in the
+        order they are checked """
+        if candidates is None:
+            indexes = self.order
+        else:
+            indexes = sorted(set(candidates), key=self._rank.__getitem__)
+        return [self.rules[index] for index in indexes]
+
+    def decision_table(self, defined_variables):
+        """ The rules compiled for the class of `defined_variables`, or its
+        schema for MappingVariables, None when they aren't a decision
+        table """
+        if isinstance(defined_variables, MappingVariables):
+            variables_class = defined_variables.schema
+        else:
+            variables_class = type(defined_variables)
+        try:
+            return self._decision_tables[variables_class]
+        except KeyError:
+            # threads compiling at the same time all use the first table
+            return self._decision_tables.setdefault(
+                variables_class,
+                DecisionTable.compile(self.ordered(), variables_class))
+
+    def _table(self, defined_variables, stop_on_first_trigger, candidates):
+        """ The decision table to look the rules up in and the ranks of the
+        candidates, or None for normal evaluation """
+        if not (self.use_decision_table and stop_on_first_trigger):
+            return None
+        if active_profiler() is not None:
+            # profiling measures the condition nodes
+            return None
+        table = self.decision_table(defined_variables)
+        if table is None:
+            return None
+        if candidates is not None:
+            candidates = [self._rank[index] for index in candidates]
+        return table, candidates
+
+    def _pattern_candidates(self, candidates, values, context):
+        positions = range(len(self.rules)) if candidates is None \
+            else candidates
+        return self.pattern_index.candidates(positions, values,
+                                             context.pattern_matches)
+
+    def _uses_guards(self, result_cache, context):
+        """ Whether the guards of the pattern index narrow down the
+        candidates: not with a result cache, which reads every variable of
+        a rule first, nor while profiling """
+        return (self.pattern_index is not None and self.pattern_index.guards
+                and result_cache is None and context.profiler is None)
+
+    async def _guarded(self, defined_variables, candidates, context):
+        """ The candidates whose guard holds, see PatternIndex. The rules
+        read the guard variables from `context.prefetched`; one timed out
+        reads as timed out, its conditions being false with the
+        TIMEOUT_FALSE policy """
+        context.prefetched = {}
+        values = {}
+        for name in self.pattern_index.guard_variables:
+            try:
+                variable = await _get_variable(defined_variables, name)
+            except VariableTimeout as error:
+                context.prefetched[name] = error
+                if error.policy != TIMEOUT_FALSE:
+                    # left for the rules reading the variable to raise
+                    return candidates
+                continue
+            except Exception:
+                return candidates
+            context.prefetched[name] = variable
+            if variable[0] is not StringType:
+                return candidates
+            values[name] = variable[1]
+        return self._pattern_candidates(candidates, values, context)
+
+    def _guarded_sync(self, defined_variables, candidates, context):
+        """ Synchronous `_guarded` """
+        context.prefetched = {}
+        values = {}
+        for name in self.pattern_index.guard_variables:
+            try:
+                variable = _get_variable_sync(defined_variables, name)
+            except Exception:
+                # left for the rules reading the variable to raise
+                return candidates
+            context.prefetched[name] = variable
+            if variable[0] is not StringType:
+                return candidates
+            values[name] = variable[1]
+        return self._pattern_candidates(candidates, values, context)
+
+    async def run(
+        self,
+        defined_variables: BaseVariables,
+        defined_actions: BaseActions,
+        stop_on_first_trigger: bool = True,
+        candidates=None,
+        result_cache=None,
+        deadline: float = None,
+        variable_timeout: float = None,
+        on_timeout: str = TIMEOUT_RAISE,
+        concurrent: bool = False,
+        max_concurrency: int = None,
+    ) -> list:
+        """
+        Check the rules and run the actions of the rules triggered, see
+        engine.run_all
+        :param candidates: positions of the only rules that can trigger,
+            every rule when None
+        :return: the results of the actions run
+        """
+        context = _make_context(deadline, variable_timeout, on_timeout,
+                                concurrent, max_concurrency)
+        context.pattern_index = self.pattern_index
+        table = self._table(defined_variables, stop_on_first_trigger,
+                            candidates)
+        with evaluation_context(context):
+            if table is not None:
+                return await table[0].run(defined_variables, defined_actions,
+                                          table[1])
+            if self._uses_guards(result_cache, context):
+                candidates = await self._guarded(defined_variables,
+                                                 candidates, context)
+            return await run_ordered(self.ordered(candidates),
+                                     defined_variables, defined_actions,
+                                     stop_on_first_trigger, result_cache)
+
+    def run_sync(
+        self,
+        defined_variables: BaseVariables,
+        defined_actions: BaseActions,
+        stop_on_first_trigger: bool = True,
+        candidates=None,
+        result_cache=None,
+    ) -> list:
+        """ Synchronous `run`, see sync_engine.run_sync """
+        _assert_supports_sync(defined_variables, defined_actions)
+        table = self._table(defined_variables, stop_on_first_trigger,
+                            candidates)
+        context = EvaluationContext()
+        context.pattern_index = self.pattern_index
+        with evaluation_context(context):
+            if table is not None:
+                return table[0].run_sync(defined_variables, defined_actions,
+                                         table[1])
+            if self._uses_guards(result_cache, context):
+                candidates = self._guarded_sync(defined_variables,
+                                                candidates, context)
+            return run_ordered_sync(self.ordered(candidates),
+                                    defined_variables, defined_actions,
+                                    stop_on_first_trigger, result_cache)
@@ -0,0 +1,76 @@
+from .optimizer import simplify
+from .variables import infer_field_type
+
+
+def specialize(rules: list, known: dict, variables=None) -> list:
+    """
+    Partially evaluate rules against variables whose value is known for a
+    whole run, e.g. the current month or the country of a deployment. The
+    conditions on known variables are replaced by their outcome, the trees
+    are simplified with optimizer.simplify, and the rules that can no
+    longer trigger are dropped.
+
+    Evaluating the specialized rules with the remaining variables gives
+    the same actions as evaluating the original rules, in the same order.
+    Conditions whose evaluation would raise, e.g. a value of the wrong
+    type, are kept so that they still raise.
+
+    :param rules: list of rule dicts
+    :param known: value of each known variable, by name
+    :param variables: optional BaseVariables subclass or MappingSchema giving
+        the field types, inferred from the known values otherwise
+    :return: the rules that can still trigger, as dicts with their
+        specialized conditions
+    """
+    specialized = []
+    for rule in rules:
+        conditions = specialize_conditions(rule['conditions'], known,
+                                           variables)
+        if conditions is False:
+            continue
+        specialized.append({**rule, 'conditions': conditions})
+    return specialized
+
+
+def specialize_conditions(conditions, known: dict, variables=None):
+    """ The simplified condition tree with the conditions on known
+    variables replaced by their outcome, see `specialize` """
+    conditions, _ = simplify(_substitute(conditions, known, variables))
+    return conditions
+
+
+def _substitute(conditions, known, variables):
+    if isinstance(conditions, bool):
+        return conditions
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        return {keys[0]: [_substitute(condition, known, variables)
+                          for condition in conditions[keys[0]]]}
+
+    name = conditions['name']
+    if name not in known:
+        return conditions
+    value = conditions['value']
+    is_variable = conditions.get('value_is_variable')
+    if is_variable and value not in known:
+        return conditions
+    try:
+        field_type, variable_value = _cast(name, known, variables)
+        if is_variable:
+            _, value = _cast(value, known, variables)
+        function = field_type.get_operator_function(conditions['operator'])
+        return bool(function(variable_value, value))
+    except Exception:
+        # left for the engine to raise
+        return conditions
+
+
+def _cast(name, known, variables):
+    """ The field type and the cast known value of a variable, like
+    engine._get_variable """
+    field_type = getattr(getattr(variables, name, None), 'field_type', None)
+    if field_type is None:
+        if variables is not None:
+            raise AssertionError(f'Variable {name} is not defined')
+        field_type = infer_field_type(known[name])
+    return field_type, field_type.cast(known[name])
@@ -0,0 +1,303 @@
+from .operators import (
+    BooleanType,
+    NumericType,
+    SelectMultipleType,
+    SelectType,
+    StringType
+)
+
+PARAMSTYLES = {'qmark': '?', 'format': '%s'}
+
+_TRUE = None
+_FALSE = '1 = 0'
+_LIKE_ESCAPE = '\\'
+
+
+def to_sql(conditions, columns: dict, variables, paramstyle='qmark',
+           case_sensitive_like=True) -> tuple:
+    """
+    Translate a condition tree into a parameterized SQL predicate selecting
+    the rows that can satisfy it, and the residual condition tree to check
+    on the selected rows with the engine. Leaves that can't be translated,
+    e.g. regular expressions or variables without a column, go to the
+    residual; an `any` with such a leaf goes to the residual as a whole.
+
+    :param conditions: condition tree
+    :param columns: SQL expression of each variable, e.g.
+        {'current_inventory': 'products.stock'}; trusted, not escaped
+    :param variables: BaseVariables subclass giving the field types
+    :param paramstyle: 'qmark' (?) or 'format' (%s) placeholders
+    :param case_sensitive_like: whether LIKE is case sensitive in the
+        database. When it isn't, e.g. SQLite without
+        `PRAGMA case_sensitive_like`, starts_with, ends_with and contains
+        only pre-filter and stay in the residual.
+    :return: (where, params, residual), `where` being '1 = 1' when no leaf
+        could be translated and `residual` None when nothing is left
+    """
+    if paramstyle not in PARAMSTYLES:
+        raise AssertionError(f'{paramstyle} is not a supported paramstyle, '
+                             f'expected one of {tuple(PARAMSTYLES)}')
+    translator = _Translator(columns, variables, PARAMSTYLES[paramstyle],
+                             case_sensitive_like)
+    where, params, residual = translator.translate(conditions)
+    return ('1 = 1' if where is _TRUE else where), params, residual
+
+
+class _Translator:
+
+    def __init__(self, columns, variables, placeholder, case_sensitive_like):
+        self.columns = columns
+        self.variables = variables
+        self.placeholder = placeholder
+        self.case_sensitive_like = case_sensitive_like
+
+    def translate(self, conditions):
+        """ (sql, params, residual) of a node: the rows satisfying the node
+        are the rows satisfying both the sql and the residual """
+        if conditions is True:
+            return _TRUE, [], None
+        if conditions is False:
+            return _FALSE, [], None
+
+        keys = list(conditions.keys())
+        if keys == ['all']:
+            parts, params, residuals = [], [], []
+            for condition in conditions['all']:
+                sql, sql_params, residual = self.translate(condition)
+                if sql is not _TRUE:
+                    parts.append(sql)
+                    params.extend(sql_params)
+                if residual is not None:
+                    residuals.append(residual)
+            if not residuals:
+                residual = None
+            elif len(residuals) == 1:
+                residual = residuals[0]
+            else:
+                residual = {'all': residuals}
+            return _join(parts, 'AND'), params, residual
+
+        if keys == ['any']:
+            parts, params, exact = [], [], True
+            for condition in conditions['any']:
+                sql, sql_params, residual = self.translate(condition)
+                exact = exact and residual is None
+                if sql is _TRUE:
+                    parts = None
+                elif parts is not None:
+                    parts.append(sql)
+                    params.extend(sql_params)
+            if parts is None:
+                return _TRUE, [], None if exact else conditions
+            return _join(parts, 'OR'), params, None if exact else conditions
+
+        return self.translate_condition(conditions)
+
+    def translate_condition(self, condition):
+        name, operator = condition['name'], condition['operator']
+        method = getattr(self.variables, name, None)
+        field_type = getattr(method, 'field_type', None)
+        column = self.columns.get(name)
+        if column is None or field_type is None:
+            return _TRUE, [], condition
+
+        value = condition['value']
+        if condition.get('value_is_variable'):
+            other_column = self.columns.get(value)
+            translated = None
+            if other_column is not None:
+                translated = self.compare_columns(field_type, operator,
+                                                  column, other_column)
+        else:
+            translated = self.compare_value(field_type, operator, column,
+                                            value)
+        if translated is None:
+            return _TRUE, [], condition
+        sql, params, exact = translated
+        return sql, params, None if exact else condition
+
+    def compare_columns(self, field_type, operator, column, other):
+        if field_type is NumericType:
+            sql = _NUMERIC_COLUMN_SQL.get(operator)
+            if sql is None:
+                return None
+            return (sql.format(column=column, other=other, p=self.placeholder),
+                    [float(NumericType.EPSILON)], True)
+        if field_type is StringType and operator in ('equal_to',
+                                                     'not_equal_to'):
+            sign = '=' if operator == 'equal_to' else '<>'
+            return (f"COALESCE({column}, '') {sign} COALESCE({other}, '')",
+                    [], True)
+        return None
+
+    def compare_value(self, field_type, operator, column, value):
+        p = self.placeholder
+        try:
+            if (field_type in (NumericType, StringType)
+                    and operator in _LIST_OPERATORS):
+                return self.compare_list(field_type, operator, column, value)
+            if field_type is NumericType:
+                return self.compare_number(operator, column, value)
+            if field_type is StringType:
+                return self.compare_string(operator, column, value)
+        except AssertionError:
+            # a value the operator would reject, left to the engine
+            return None
+
+        if field_type is BooleanType and operator in ('is_true', 'is_false'):
+            return f'{column} = {p}', [operator == 'is_true'], True
+
+        if field_type is SelectType and operator in ('contains',
+                                                     'does_not_contain'):
+            values = [value]
+        elif field_type is SelectMultipleType and operator in (
+                'is_contained_by', 'shares_at_least_one_element_with',
+                'shares_exactly_one_element_with',
+                'shares_no_elements_with'):
+            if not isinstance(value, (list, tuple)) or not value:
+                return None
+            values = list(value)
+        else:
+            return None
+        # a select column holds a single value, compared case insensitively
+        return self.compare_membership(
+            operator in ('does_not_contain', 'shares_no_elements_with'),
+            operator == 'shares_exactly_one_element_with', column, values)
+
+    def compare_number(self, operator, column, value):
+        if operator not in _NUMERIC_BOUNDS:
+            return None
+        if isinstance(value, bool):
+            return None
+        value = NumericType.cast(value)
+        epsilon = NumericType.EPSILON
+        p = self.placeholder
+        if operator == 'equal_to':
+            return (f'{column} BETWEEN {p} AND {p}',
+                    [float(value - epsilon), float(value + epsilon)], True)
+        sign, offset = _NUMERIC_BOUNDS[operator]
+        return (f'{column} {sign} {p}', [float(value + offset * epsilon)],
+                True)
+
+    def compare_string(self, operator, column, value):
+        p = self.placeholder
+        if operator == 'non_empty':
+            return f"{column} <> ''", [], True
+        if operator not in _STRING_OPERATORS:
+            return None
+        value = StringType.cast(value)
+        # the engine compares missing values as ''
+        coalesced = f"COALESCE({column}, '')"
+        if operator == 'equal_to':
+            return f'{coalesced if not value else column} = {p}', [value], True
+        if operator == 'not_equal_to':
+            return f'{coalesced} <> {p}', [value], True
+        if operator == 'equal_to_case_insensitive':
+            return (f'LOWER({coalesced if not value else column}) = {p}',
+                    [value.lower()], _is_ascii(value))
+        if operator == 'not_equal_to_case_insensitive':
+            return (f'LOWER({coalesced}) <> {p}', [value.lower()],
+                    _is_ascii(value))
+
+        escaped = _escape_like(value)
+        pattern = {'starts_with': '{0}%', 'ends_with': '%{0}',
+                   'contains': '%{0}%'}[operator].format(escaped)
+        return (f"{coalesced if not value else column} LIKE {p} "
+                f"ESCAPE '{_LIKE_ESCAPE}'", [pattern],
+                self.case_sensitive_like)
+
+    def compare_list(self, field_type, operator, column, values):
+        if not isinstance(values, (list, tuple, set, frozenset)):
+            return None
+        negate = operator.startswith('not_')
+        if not values:
+            return _TRUE if negate else _FALSE, [], True
+        p = self.placeholder
+        if field_type is NumericType:
+            if any(isinstance(value, bool) for value in values):
+                return None
+            epsilon = NumericType.EPSILON
+            params = []
+            for value in sorted(set(map(NumericType.cast, values))):
+                params.extend((float(value - epsilon),
+                               float(value + epsilon)))
+            sql = ' OR '.join([f'{column} BETWEEN {p} AND {p}']
+                              * (len(params) // 2))
+            return (f'NOT ({sql})' if negate else sql), params, True
+
+        values = sorted(set(map(StringType.cast, values)))
+        exact = True
+        # the engine compares missing values as ''
+        column = f"COALESCE({column}, '')" if negate or '' in values \
+            else column
+        if operator.endswith('_case_insensitive'):
+            values = sorted({value.lower() for value in values})
+            column = f'LOWER({column})'
+            exact = all(_is_ascii(value) for value in values)
+        placeholders = ', '.join([p] * len(values))
+        sql = f'{column} {"NOT IN" if negate else "IN"} ({placeholders})'
+        return sql, values, exact
+
+    def compare_membership(self, negate, exactly_one, column, values):
+        p = self.placeholder
+        if all(isinstance(value, str) for value in values):
+            values = [value.lower() for value in values]
+            column = f'LOWER({column})'
+            exact = all(_is_ascii(value) for value in values)
+        elif any(isinstance(value, (str, bool)) for value in values):
+            return None
+        else:
+            exact = True
+        if exactly_one and len(set(values)) != len(values):
+            return None
+        placeholders = ', '.join([p] * len(values))
+        sql = f'{column} {"NOT IN" if negate else "IN"} ({placeholders})'
+        return sql, list(values), exact
+
+
+# operator: (comparison, multiple of the epsilon added to the value)
+_NUMERIC_BOUNDS = {
+    'equal_to': None,
+    'greater_than': ('>', 1),
+    'greater_than_or_equal_to': ('>=', -1),
+    'less_than': ('<', -1),
+    'less_than_or_equal_to': ('<=', 1),
+}
+
+_NUMERIC_COLUMN_SQL = {
+    'equal_to': 'ABS({column} - {other}) <= {p}',
+    'greater_than': '{column} - {other} > {p}',
+    'greater_than_or_equal_to': '{column} - {other} >= -{p}',
+    'less_than': '{other} - {column} > {p}',
+    'less_than_or_equal_to': '{column} - {other} <= {p}',
+}
+
+_STRING_OPERATORS = (
+    'equal_to', 'not_equal_to', 'equal_to_case_insensitive',
+    'not_equal_to_case_insensitive', 'starts_with', 'ends_with', 'contains',
+)
+
+
+_LIST_OPERATORS = (
+    'in_list', 'not_in_list', 'in_list_case_insensitive',
+    'not_in_list_case_insensitive',
+)
+
+
+def _join(parts, operator):
+    if not parts:
+        return _TRUE
+    if len(parts) == 1:
+        return parts[0]
+    return f' {operator} '.join(f'({part})' for part in parts)
+
+
+def _escape_like(value):
+    for char in (_LIKE_ESCAPE, '%', '_'):
+        value = value.replace(char, _LIKE_ESCAPE + char)
+    return value
+
+
+def _is_ascii(value):
+    """ SQL LOWER only folds ASCII letters in some databases """
+    return value.isascii()
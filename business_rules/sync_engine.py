@@ -0,0 +1,281 @@
+import asyncio
+import functools
+import logging
+import time
+from typing import Union
+
+from .actions import BaseActions
+from .cache import ResultCache
+from .context import EvaluationContext, evaluation_context, get_context
+from .engine import (
+    _check_indexed,
+    _dependency_key,
+    _dependency_names,
+    _get_action_method,
+    _get_variable_method,
+    _variable_cache,
+    get_rule_parts,
+    sort_rules
+)
+from .multipattern import PATTERN_OPERATORS
+from .utils import get_condition_variables
+from .variables import BaseVariables, MappingVariables
+
+logger = logging.getLogger(__name__)
+
+
+def supports_sync(defined_variables, defined_actions=None) -> bool:
+    """ Whether the variables and actions can be evaluated without an event
+    loop, as detected when their classes were defined """
+    if getattr(defined_variables, 'has_coroutine_variables', False):
+        return False
+    return not getattr(defined_actions, 'has_coroutine_actions', False)
+
+
+def run_sync(
+    rule: dict,
+    defined_variables: BaseVariables,
+    defined_actions: BaseActions,
+    result_cache: ResultCache = None,
+) -> Union[dict, None]:
+    """
+    Check rules and run actions without an event loop, for variables and
+    actions that are plain functions. Same result as engine.run.
+    """
+    conditions, action = get_rule_parts(rule)
+    _assert_supports_sync(defined_variables, defined_actions)
+
+    with evaluation_context(EvaluationContext()):
+        rule_triggered = _check_rule_conditions_sync(
+            conditions, defined_variables, result_cache, rule)
+    if rule_triggered:
+        logger.debug(f'business-rules conditions: {conditions}')
+        logger.debug(f'business-rules actions: {rule["actions"]}')
+
+        return do_action_sync(action, defined_actions)
+
+
+def run_all_sync(
+    rule_list: list,
+    defined_variables: BaseVariables,
+    defined_actions: BaseActions,
+    stop_on_first_trigger: bool = False,
+    result_cache: ResultCache = None,
+) -> list:
+    """ Synchronous engine.run_all """
+    _assert_supports_sync(defined_variables, defined_actions)
+    with evaluation_context(EvaluationContext()):
+        return run_ordered_sync(sort_rules(rule_list), defined_variables,
+                                defined_actions, stop_on_first_trigger,
+                                result_cache)
+
+
+def run_ordered_sync(rules, defined_variables, defined_actions,
+                     stop_on_first_trigger=False, result_cache=None) -> list:
+    """ Synchronous engine.run_ordered """
+    results = []
+    for rule in rules:
+        conditions, action = get_rule_parts(rule)
+        if not _check_rule_conditions_sync(conditions, defined_variables,
+                                           result_cache, rule):
+            continue
+        logger.debug(f'business-rules conditions: {conditions}')
+        logger.debug(f'business-rules actions: {rule["actions"]}')
+        results.append(do_action_sync(action, defined_actions))
+        if stop_on_first_trigger:
+            break
+    return results
+
+
+def _assert_supports_sync(defined_variables, defined_actions):
+    if not supports_sync(defined_variables, defined_actions):
+        raise AssertionError(
+            'Classes {0} and {1} define coroutines, use engine.run'.format(
+                defined_variables.__class__.__name__,
+                defined_actions.__class__.__name__))
+
+
+def _check_rule_conditions_sync(conditions, defined_variables, result_cache,
+                                rule=None):
+    context = get_context()
+    profiler = context.profiler if context is not None else None
+    if profiler is not None and rule is not None:
+        token = profiler.start_rule(context, rule)
+        triggered = None
+        try:
+            triggered = _check_rule_conditions_sync(
+                conditions, defined_variables, result_cache)
+        finally:
+            profiler.end_rule(context, token, triggered)
+        return triggered
+
+    if result_cache is None:
+        return check_conditions_recursively_sync(conditions,
+                                                 defined_variables)
+    return _check_conditions_cached_sync(conditions, defined_variables,
+                                         result_cache)
+
+
+def _check_conditions_cached_sync(conditions, defined_variables,
+                                  result_cache):
+    """ Synchronous engine._check_conditions_cached """
+    variables = {
+        name: _get_variable_sync(defined_variables, name)
+        for name in get_condition_variables(conditions)
+    }
+    key = result_cache.make_key(
+        conditions, {name: var[1] for name, var in variables.items()})
+    result = result_cache.get(key)
+    if result is None:
+        with evaluation_context() as context:
+            previous, context.prefetched = context.prefetched, variables
+            try:
+                result = bool(check_conditions_recursively_sync(
+                    conditions, defined_variables))
+            finally:
+                context.prefetched = previous
+        result_cache.set(key, result)
+    return result
+
+
+def check_conditions_recursively_sync(conditions, defined_variables):
+    """ Check conditions """
+    if isinstance(conditions, bool):
+        return conditions
+    context = get_context()
+    if context is not None and context.rule_profile is not None:
+        start = time.perf_counter()
+        result = _check_node_sync(conditions, defined_variables)
+        context.rule_profile.record(conditions, result,
+                                    time.perf_counter() - start)
+        return result
+    return _check_node_sync(conditions, defined_variables)
+
+
+def _check_node_sync(conditions, defined_variables):
+    keys = list(conditions.keys())
+    if keys == ['all']:
+        assert len(conditions['all']) >= 1
+        for condition in conditions['all']:
+            if not check_conditions_recursively_sync(condition,
+                                                     defined_variables):
+                return False
+        return True
+
+    if keys == ['any']:
+        assert len(conditions['any']) >= 1
+        for condition in conditions['any']:
+            if check_conditions_recursively_sync(condition, defined_variables):
+                return True
+        return False
+
+    assert not ('any' in keys or 'all' in keys)
+    return check_condition_sync(conditions, defined_variables)
+
+
+def check_condition_sync(condition, defined_variables):
+    """ Checks a single rule condition, see engine.check_condition """
+    name = condition['name']
+    op = condition['operator']
+    value = condition['value']
+    field_type, variable_value = _get_variable_sync(defined_variables, name)
+    if 'value_is_variable' in condition and condition['value_is_variable']:
+        _, value = _get_variable_sync(defined_variables, value)
+    elif op in PATTERN_OPERATORS:
+        result = _check_indexed(name, op, field_type, variable_value, value)
+        if result is not None:
+            return result
+    return field_type.get_operator_function(op)(variable_value, value)
+
+
+def _get_variable_sync(defined_variables, name):
+    """ Synchronous engine._get_variable, without timeouts """
+    if isinstance(defined_variables, MappingVariables):
+        return defined_variables.get_variable(name)
+    context = get_context()
+    if (context is not None and context.prefetched is not None
+            and name in context.prefetched):
+        return context.prefetched[name]
+
+    method = _get_variable_method(defined_variables, name)
+
+    def call():
+        val = method(**_get_dependencies_sync(defined_variables, name,
+                                              context))
+        if asyncio.iscoroutine(val):
+            val.close()
+            raise AssertionError(
+                'Variable {0} returned a coroutine, use engine.run'.format(
+                    name))
+        batch_loader = getattr(method, 'batch_loader', None)
+        if batch_loader is not None:
+            val = batch_loader.load_sync(val)
+        return val
+
+    cache = None
+    cache_scope = getattr(method, 'cache_scope', None)
+    if cache_scope is not None:
+        cache, key = _variable_cache(defined_variables, name, method,
+                                     cache_scope, context)
+    if cache is not None:
+        call = functools.partial(cache.get_or_compute_sync, key, call,
+                                 method.cache_ttl)
+    profiler = context.profiler if context is not None else None
+    if profiler is None:
+        val = call()
+    else:
+        start = time.perf_counter()
+        try:
+            val = call()
+        finally:
+            profiler.record_variable(name, time.perf_counter() - start)
+
+    return method.field_type, method.field_type.cast(val)
+
+
+def _get_dependencies_sync(defined_variables, name, context):
+    """ Values of the rule dependencies the variable or dependency takes """
+    return {
+        dependency: _get_dependency_sync(defined_variables, dependency,
+                                         context)
+        for dependency in _dependency_names(defined_variables, name)
+    }
+
+
+def _get_dependency_sync(defined_variables, name, context):
+    """ Synchronous engine._get_dependency """
+    method = getattr(defined_variables, name)
+
+    def compute():
+        val = method(**_get_dependencies_sync(defined_variables, name,
+                                              context))
+        if asyncio.iscoroutine(val):
+            val.close()
+            raise AssertionError(
+                'Dependency {0} returned a coroutine, use engine.run'.format(
+                    name))
+        return val
+
+    if context is None:
+        return compute()
+    return context.variable_cache.get_or_compute_sync(
+        _dependency_key(defined_variables, name), compute)
+
+
+def do_action_sync(action, defined_actions) -> dict:
+    """ Run action, see engine.do_action """
+    method_name = action['name']
+    params = action.get('params') or {}
+    method = _get_action_method(defined_actions, method_name)
+    action_result = method(**params)
+    if asyncio.iscoroutine(action_result):
+        action_result.close()
+        raise AssertionError(
+            'Action {0} returned a coroutine, use engine.run'.format(
+                method_name))
+
+    return {
+        'action_name': method_name,
+        'action_params': params,
+        'action_result': action_result
+    }
@@ -1,4 +1,5 @@
 import inspect
+from collections.abc import Mapping
 
 from decimal import Context, Decimal, Inexact
 
@@ -50,3 +51,30 @@ def float_to_decimal(f) -> Decimal:
         ctx.prec *= 2
         result = ctx.divide(numerator, denominator)
     return result
+
+
+def get_condition_variables(conditions) -> frozenset:
+    """ Returns the names of all variables read by a condition tree,
+    including variables referenced through `value_is_variable`.
+    """
+    if isinstance(conditions, bool):
+        return frozenset()
+    keys = list(conditions.keys())
+    if keys == ['all'] or keys == ['any']:
+        names = set()
+        for condition in conditions[keys[0]]:
+            names |= get_condition_variables(condition)
+        return frozenset(names)
+
+    names = {conditions['name']}
+    if conditions.get('value_is_variable'):
+        names.add(conditions['value'])
+    return frozenset(names)
+
+
+def json_default(value):
+    """ json.dumps fallback: read-only mappings, e.g. parsed rule nodes, are
+    serialized as objects and any other value as its string """
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
@@ -1,4 +1,6 @@
 import inspect
+from decimal import Decimal
+from .batching import BatchLoader
 from .utils import fn_name_to_pretty_label
 from .operators import (
     BaseType,
@@ -10,6 +12,16 @@ from .operators import (
     SelectMultipleType
 )
 
+CACHE_EVALUATION = 'evaluation'
+CACHE_INSTANCE = 'instance'
+CACHE_GLOBAL = 'global'
+CACHE_SCOPES = (CACHE_EVALUATION, CACHE_INSTANCE, CACHE_GLOBAL)
+
+TIMEOUT_FALSE = 'false'
+TIMEOUT_DEFAULT = 'default'
+TIMEOUT_RAISE = 'raise'
+TIMEOUT_POLICIES = (TIMEOUT_FALSE, TIMEOUT_DEFAULT, TIMEOUT_RAISE)
+
 
 class BaseVariables:
     """
@@ -17,6 +29,25 @@ class BaseVariables:
     engine should inherit from this.
     """
 
+    # Set when the class is defined, classes without coroutine variables
+    # can be evaluated with sync_engine.run_sync
+    has_coroutine_variables = False
+    # Set when the class is defined, the names of the rule dependencies
+    # each variable and dependency takes
+    rule_dependencies = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.rule_dependencies = _dependency_graph(cls)
+        cls.has_coroutine_variables = any(
+            inspect.iscoroutinefunction(m[1])
+            or getattr(getattr(m[1], 'batch_loader', None), 'is_coroutine',
+                       False)
+            for m in inspect.getmembers(cls)
+            if getattr(m[1], 'is_rule_variable', False)
+            or getattr(m[1], 'is_rule_dependency', False)
+        )
+
     @classmethod
     def get_all_variables(cls):
         methods = inspect.getmembers(cls)
@@ -31,10 +62,222 @@ class BaseVariables:
         ]
 
 
-def rule_variable(field_type, label=None, options=None, rule_type=None):
+FIELD_TYPES = {
+    field_type.name: field_type
+    for field_type in (NumericType, StringType, BooleanType, SelectType,
+                       SelectMultipleType, MultipleType)
+}
+
+
+def infer_field_type(value):
+    """ The field type of a value without a declared type: booleans,
+    numbers, lists and strings """
+    if isinstance(value, bool):
+        return BooleanType
+    if isinstance(value, (int, float, Decimal)):
+        return NumericType
+    if isinstance(value, (list, tuple)):
+        return SelectMultipleType
+    return StringType
+
+
+class SchemaField:
+    """ The declaration of a mapping variable, with the attributes the
+    helpers reading variables classes look for """
+    __slots__ = ('name', 'field_type', 'label', 'options')
+    is_rule_variable = True
+
+    def __init__(self, name, field_type, label=None, options=None):
+        self.name = name
+        self.field_type = field_type
+        self.label = label or fn_name_to_pretty_label(name)
+        self.options = options or []
+
+
+class MappingSchema:
+    """
+    Field types of the variables of MappingVariables, built once and
+    shared by every mapping. Takes the `variables` list of
+    export_rule_data, or a dict of variable name to field type or field
+    type name, e.g. {'current_inventory': 'numeric'}.
+
+    Fields are attributes of the schema, so that it can stand for a
+    variables class, e.g. with loader.validate_rule or
+    decision_table.DecisionTable.compile.
+    """
+
+    def __init__(self, fields, name='MappingSchema'):
+        if isinstance(fields, dict):
+            fields = [{'name': field_name, 'field_type': field_type}
+                      for field_name, field_type in fields.items()]
+        self.__name__ = name
+        self.fields = {}
+        for field in fields:
+            field_type = field['field_type']
+            if isinstance(field_type, str):
+                if field_type not in FIELD_TYPES:
+                    raise AssertionError(
+                        "{0} is not a valid field type, expected one of "
+                        "{1}".format(field_type, tuple(FIELD_TYPES)))
+                field_type = FIELD_TYPES[field_type]
+            elif not (isinstance(field_type, type)
+                      and issubclass(field_type, BaseType)):
+                raise AssertionError("{0} is not a BaseType subclass in "
+                                     "the schema".format(field_type))
+            self.fields[field['name']] = SchemaField(
+                field['name'], field_type, field.get('label'),
+                field.get('options'))
+        self.field_types = {field_name: field.field_type
+                            for field_name, field in self.fields.items()}
+
+    def __getattr__(self, name):
+        fields = self.__dict__.get('fields', {})
+        if name in fields:
+            return fields[name]
+        raise AttributeError(name)
+
+    def get_all_variables(self):
+        """ Same as BaseVariables.get_all_variables """
+        return [{
+            'name': field.name,
+            'label': field.label,
+            'field_type': field.field_type.name,
+            'options': field.options,
+            'rule_type': None,
+        } for field in self.fields.values()]
+
+
+class MappingVariables:
+    """
+    Variables read by key from a mapping of precomputed values, typed by a
+    MappingSchema. The engines read them with a lookup and a cast, without
+    calling a method per variable; a key the mapping lacks reads as None.
+    """
+
+    has_coroutine_variables = False
+
+    def __init__(self, values, schema: MappingSchema):
+        self.values = values
+        self.schema = schema
+
+    def get_variable(self, name):
+        """ The field type and the cast value of a variable """
+        field_type = self.schema.field_types.get(name)
+        if field_type is None:
+            raise AssertionError("Variable {0} is not defined in "
+                                 "{1}".format(name, self.schema.__name__))
+        return field_type, field_type.cast(self.values.get(name))
+
+
+def _dependency_graph(cls):
+    """ The names of the dependencies taken by every variable and
+    dependency of the class, checking they exist and have no cycle """
+    members = dict(inspect.getmembers(cls))
+    graph = {}
+    for name, member in members.items():
+        if not (getattr(member, 'is_rule_variable', False)
+                or getattr(member, 'is_rule_dependency', False)):
+            continue
+        if not inspect.isfunction(member):
+            continue
+        names = []
+        for parameter in list(
+                inspect.signature(member).parameters.values())[1:]:
+            if getattr(members.get(parameter.name), 'is_rule_dependency',
+                       False):
+                names.append(parameter.name)
+            elif (parameter.default is parameter.empty
+                  and parameter.kind not in (parameter.VAR_POSITIONAL,
+                                             parameter.VAR_KEYWORD)):
+                raise AssertionError(
+                    "{0}.{1} takes {2}, which is not a rule dependency".format(
+                        cls.__name__, name, parameter.name))
+        if names:
+            graph[name] = tuple(names)
+
+    checked = set()
+
+    def visit(name, path):
+        for dependency in graph.get(name, ()):
+            if dependency in path:
+                raise AssertionError("Rule dependencies of {0} form a cycle: "
+                                     "{1}".format(cls.__name__, ' -> '.join(
+                                         path + (dependency,))))
+            if dependency not in checked:
+                visit(dependency, path + (dependency,))
+        checked.add(name)
+
+    for name in graph:
+        visit(name, (name,))
+    return graph
+
+
+def rule_dependency(func=None, blocking=None):
+    """ Decorator to make a method into a value shared by variables
+
+    Variables and dependencies taking a parameter named after the
+    dependency receive its value. The engine computes a dependency at most
+    once per evaluation, only when a variable taking it is read, and the
+    dependencies a variable takes concurrently.
+
+    - blocking - see rule_variable
+    """
+
+    def wrapper(func):
+        func.is_rule_dependency = True
+        func.blocking = blocking
+        return func
+
+    if func is not None:
+        return wrapper(func)
+    return wrapper
+
+
+def rule_variable(field_type, label=None, options=None, rule_type=None,
+                  cache_scope=None, cache_ttl=None, cache_key=None,
+                  timeout=None, on_timeout=None, timeout_default=None,
+                  batch_loader=None, max_batch_size=None,
+                  batch_cache_ttl=None, blocking=None):
     """ Decorator to make a function into a rule variable
+
+    - cache_scope - reuse the value within one evaluation (CACHE_EVALUATION),
+      for the variables instance (CACHE_INSTANCE) or for every instance of
+      the class (CACHE_GLOBAL). Defaults to CACHE_GLOBAL when a cache_ttl or
+      cache_key is given.
+    - cache_ttl - seconds the value stays cached, forever when None
+    - cache_key - function of the variables instance returning the hashable
+      part of the cache key, e.g. to cache a global value per region
+    - timeout - seconds the value may take to resolve
+    - on_timeout - what a condition reading the variable does once the
+      timeout or the evaluation deadline expires: evaluate to false
+      (TIMEOUT_FALSE), compare timeout_default instead (TIMEOUT_DEFAULT) or
+      raise engine.VariableTimeout (TIMEOUT_RAISE). Defaults to the policy
+      passed to engine.run.
+    - batch_loader - function or coroutine function loading the values of a
+      list of keys, or a batching.BatchLoader. The decorated function then
+      returns the key of the value, and the keys requested by concurrent
+      evaluations in the same event loop iteration are loaded together.
+    - max_batch_size - maximum number of keys loaded by one call
+    - batch_cache_ttl - seconds the loaded values stay cached by key
+    - blocking - whether the async engine calls the function in a thread
+      pool instead of on the event loop: True for the default
+      executor.BlockingExecutor, or the executor to use. Defaults to
+      executor.get_blocking_default(). Coroutine functions are never
+      offloaded.
     """
     options = options or []
+    if cache_scope is None and (cache_ttl is not None or cache_key is not None):
+        cache_scope = CACHE_GLOBAL
+    if cache_scope is not None and cache_scope not in CACHE_SCOPES:
+        raise AssertionError("{0} is not a valid cache scope, expected one "
+                             "of {1}".format(cache_scope, CACHE_SCOPES))
+    if on_timeout is not None and on_timeout not in TIMEOUT_POLICIES:
+        raise AssertionError("{0} is not a valid timeout policy, expected "
+                             "one of {1}".format(on_timeout, TIMEOUT_POLICIES))
+
+    if batch_loader is not None and not isinstance(batch_loader, BatchLoader):
+        batch_loader = BatchLoader(batch_loader, max_batch_size=max_batch_size,
+                                   cache_ttl=batch_cache_ttl)
 
     def wrapper(func):
         if not (type(field_type) == type and issubclass(field_type, BaseType)):
@@ -45,56 +288,69 @@ def rule_variable(field_type, label=None, options=None, rule_type=None):
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.options = options
         func.rule_type = rule_type
+        func.cache_scope = cache_scope
+        func.cache_ttl = cache_ttl
+        func.cache_key = cache_key
+        func.timeout = timeout
+        func.on_timeout = on_timeout
+        func.timeout_default = timeout_default
+        func.batch_loader = batch_loader
+        func.blocking = blocking
         return func
 
     return wrapper
 
 
-def _rule_variable_wrapper(field_type, label, rule_type):
+def _rule_variable_wrapper(field_type, label, rule_type, **kwargs):
     if callable(label):
         # Decorator is being called with no args, label is actually the decorated func
         return rule_variable(field_type)(label)
     return rule_variable(
         field_type,
         label=label,
-        rule_type=rule_type
+        rule_type=rule_type,
+        **kwargs
     )
 
 
-def numeric_rule_variable(label=None, rule_type=None):
-    return _rule_variable_wrapper(NumericType, label, rule_type)
+def numeric_rule_variable(label=None, rule_type=None, **kwargs):
+    return _rule_variable_wrapper(NumericType, label, rule_type, **kwargs)
 
 
-def string_rule_variable(label=None, rule_type=None):
-    return _rule_variable_wrapper(StringType, label, rule_type)
+def string_rule_variable(label=None, rule_type=None, **kwargs):
+    return _rule_variable_wrapper(StringType, label, rule_type, **kwargs)
 
 
-def boolean_rule_variable(label=None, rule_type=None):
-    return _rule_variable_wrapper(BooleanType, label, rule_type)
+def boolean_rule_variable(label=None, rule_type=None, **kwargs):
+    return _rule_variable_wrapper(BooleanType, label, rule_type, **kwargs)
 
 
-def select_rule_variable(label=None, options=None, rule_type=None):
+def select_rule_variable(label=None, options=None, rule_type=None, **kwargs):
     return rule_variable(
         SelectType,
         label=label,
         options=options,
-        rule_type=rule_type
+        rule_type=rule_type,
+        **kwargs
     )
 
 
-def select_multiple_rule_variable(label=None, options=None, rule_type=None):
+def select_multiple_rule_variable(label=None, options=None, rule_type=None,
+                                  **kwargs):
     return rule_variable(
         SelectMultipleType,
         label=label,
         options=options,
-        rule_type=rule_type
+        rule_type=rule_type,
+        **kwargs
     )
 
 
-def multiple_rule_variable(label=None, options=None, rule_type=None):
+def multiple_rule_variable(label=None, options=None, rule_type=None, **kwargs):
     return rule_variable(
         MultipleType,
         label=label,
         options=options,
-        rule_type=rule_type
+        rule_type=rule_type,
+        **kwargs
     )
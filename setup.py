@@ -17,5 +17,7 @@ setuptools.setup(
         author_email='open-source@venmo.com',
         url='https://github.com/venmo/business-rules',
         packages=['business_rules'],
+        extras_require={'dataframe': ['pandas'],
+                        'patterns': ['pyahocorasick']},
         license='MIT'
 )
@@ -0,0 +1,138 @@
+from business_rules.actions import ReturnTextActions
+from business_rules.analysis import analyze_rules, implies, prune_rules
+from business_rules.sync_engine import run_all_sync
+from business_rules.variables import (
+    BaseVariables,
+    MappingSchema,
+    MappingVariables,
+    numeric_rule_variable,
+    select_multiple_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ProductVariables(BaseVariables):
+
+    @numeric_rule_variable
+    def price(self):
+        return 0
+
+    @string_rule_variable
+    def sku(self):
+        return ''
+
+    @select_multiple_rule_variable
+    def tags(self):
+        return []
+
+
+def leaf(name, operator, value):
+    return {'name': name, 'operator': operator, 'value': value}
+
+
+def rule(conditions, action='discount'):
+    return {'conditions': conditions, 'actions': [{'name': action}]}
+
+
+class ImplicationTests(TestCase):
+
+    def test_numeric_bounds(self):
+        self.assertTrue(implies(leaf('price', 'greater_than', 10),
+                                leaf('price', 'greater_than', 5)))
+        self.assertTrue(implies(leaf('price', 'equal_to', 7),
+                                leaf('price', 'greater_than_or_equal_to', 7)))
+        self.assertFalse(implies(leaf('price', 'greater_than', 5),
+                                 leaf('price', 'greater_than', 10)))
+        self.assertFalse(implies(leaf('price', 'greater_than', 5),
+                                 leaf('cost', 'greater_than', 1)))
+
+    def test_groups(self):
+        narrow = {'all': [leaf('price', 'greater_than', 10),
+                          leaf('sku', 'equal_to', 'A-1')]}
+        self.assertTrue(implies(narrow, leaf('price', 'greater_than', 5)))
+        self.assertTrue(implies(narrow, {'any': [
+            leaf('price', 'less_than', 0), leaf('price', 'greater_than', 1)]}))
+        self.assertFalse(implies(leaf('price', 'greater_than', 10), narrow))
+
+    def test_string_and_select_semantics_need_field_types(self):
+        field_types = {'sku': 'string', 'tags': 'select_multiple'}
+        equal = leaf('sku', 'equal_to', 'shoe-red')
+        for other in (leaf('sku', 'starts_with', 'shoe'),
+                      leaf('sku', 'contains', 'e-r'),
+                      leaf('sku', 'equal_to_case_insensitive', 'SHOE-RED'),
+                      leaf('sku', 'non_empty', None)):
+            self.assertTrue(implies(equal, other, field_types))
+            self.assertFalse(implies(equal, other))
+        self.assertFalse(implies(equal, leaf('sku', 'ends_with', 'blue'),
+                                 field_types))
+        self.assertTrue(implies(leaf('tags', 'contains_all', ['a', 'B']),
+                                leaf('tags', 'contains_all', ['b']),
+                                field_types))
+
+
+class AnalyzeRulesTests(TestCase):
+
+    def test_report_and_prune(self):
+        rules = [
+            rule(leaf('price', 'greater_than', 5)),
+            rule(leaf('price', 'greater_than', 10)),
+            rule(leaf('price', 'greater_than', 5)),
+            rule(leaf('price', 'greater_than', 10), action='other'),
+            rule({'all': [leaf('price', 'greater_than', 10),
+                          leaf('price', 'less_than', 5)]}, action='other'),
+            rule({'all': [leaf('sku', 'equal_to', 'x1'),
+                          leaf('price', 'less_than', 1)]}, action='other'),
+            rule(leaf('sku', 'starts_with', 'x'), action='other'),
+        ]
+        report = analyze_rules(rules, ProductVariables)
+        self.assertEqual(report['never_fire'], [4])
+        self.assertEqual(report['duplicates'],
+                         [{'index': 2, 'duplicate_of': 0}])
+        self.assertEqual(report['subsumed'], [
+            {'index': 1, 'subsumed_by': 0},
+            {'index': 5, 'subsumed_by': 6},
+        ])
+        self.assertEqual(prune_rules(rules, ProductVariables),
+                         [rules[0], rules[3], rules[6]])
+
+    def test_equivalent_rules_keep_the_first(self):
+        rules = [
+            rule({'all': [leaf('price', 'greater_than', 5),
+                          leaf('price', 'greater_than', 10)]}),
+            rule(leaf('price', 'greater_than', 10)),
+        ]
+        self.assertEqual(analyze_rules(rules)['subsumed'],
+                         [{'index': 1, 'subsumed_by': 0}])
+
+    def test_priorities(self):
+        def ranked(conditions, text, priority):
+            return {'conditions': conditions, 'priority': priority,
+                    'actions': [{'name': 'return_text',
+                                 'params': {'return_value': text}}]}
+
+        rules = [
+            ranked(leaf('price', 'greater_than', 10), 'a', 10),
+            ranked(leaf('price', 'greater_than', 5), 'a', 1),
+            ranked(leaf('price', 'greater_than', 8), 'c', 5),
+            ranked(leaf('price', 'greater_than', 20), 'a', 0),
+            ranked(leaf('price', 'greater_than', 10), 'a', 2),
+        ]
+        report = analyze_rules(rules)
+        # 0 is checked before 2, which has other actions and is checked
+        # before 1; 3 and 4 are checked after 0 and 2
+        self.assertEqual(report['duplicates'],
+                         [{'index': 4, 'duplicate_of': 0}])
+        self.assertEqual(report['subsumed'],
+                         [{'index': 3, 'subsumed_by': 0}])
+
+        pruned = prune_rules(rules, report=report)
+        schema = MappingSchema({'price': 'numeric'})
+        for price in (0, 6, 9, 11, 30):
+            variables = MappingVariables({'price': price}, schema)
+            self.assertEqual(
+                run_all_sync(pruned, variables, ReturnTextActions(),
+                             stop_on_first_trigger=True),
+                run_all_sync(rules, variables, ReturnTextActions(),
+                             stop_on_first_trigger=True))
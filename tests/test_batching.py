@@ -0,0 +1,157 @@
+import asyncio
+
+from business_rules import run, run_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.batching import BatchLoader
+from business_rules.operators import NumericType
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    rule_variable
+)
+
+from . import TestCase
+
+LOADED = []
+
+
+async def load_expiration_days(product_ids):
+    LOADED.append(list(product_ids))
+    await asyncio.sleep(0)
+    return [product_id * 10 for product_id in product_ids]
+
+
+def load_stock(product_ids):
+    LOADED.append(list(product_ids))
+    return {product_id: product_id for product_id in product_ids
+            if product_id != 13}
+
+
+class BatchedVariables(BaseVariables):
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+
+    @numeric_rule_variable(batch_loader=load_expiration_days,
+                           max_batch_size=40)
+    def expiration_days(self):
+        return self.product_id
+
+    @rule_variable(NumericType, batch_loader=load_stock, batch_cache_ttl=60)
+    def stock(self):
+        return self.product_id
+
+
+class SyncBatchedVariables(BaseVariables):
+
+    def __init__(self, product_id):
+        self.product_id = product_id
+
+    @numeric_rule_variable(batch_loader=load_stock)
+    def stock(self):
+        return self.product_id
+
+
+def rule(name, value):
+    return {
+        'conditions': {'name': name, 'operator': 'greater_than',
+                       'value': value},
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}],
+    }
+
+
+async def run_many(rule_dict, product_ids):
+    return await asyncio.gather(*[
+        run(rule_dict, BatchedVariables(product_id), ReturnNumericActions())
+        for product_id in product_ids], return_exceptions=True)
+
+
+class BatchLoaderTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        LOADED.clear()
+
+    def test_concurrent_evaluations_share_batches(self):
+        results = asyncio.run(run_many(rule('expiration_days', 500),
+                                       range(100)))
+        self.assertEqual([result is not None for result in results],
+                         [product_id > 50 for product_id in range(100)])
+        self.assertEqual([len(keys) for keys in LOADED], [40, 40, 20])
+        self.assertEqual(sorted(sum(LOADED, [])), list(range(100)))
+        self.assertTrue(BatchedVariables.has_coroutine_variables)
+
+    def test_duplicate_keys_are_loaded_once(self):
+        asyncio.run(run_many(rule('expiration_days', 0), [1, 2, 1, 1]))
+        self.assertEqual(LOADED, [[1, 2]])
+
+    def test_cache_and_missing_keys(self):
+        results = asyncio.run(run_many(rule('stock', 5), [3, 13, 20]))
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], KeyError)
+        self.assertEqual(results[2]['action_result'], 1)
+
+        asyncio.run(run_many(rule('stock', 5), [3, 13, 20, 21]))
+        # only the uncached keys are loaded again
+        self.assertEqual(LOADED, [[3, 13, 20], [13, 21]])
+        self.assertEqual(BatchedVariables.stock.batch_loader.stats[
+                             'cache_size'], 3)
+
+    def test_loader_errors_reach_every_caller(self):
+        def failing(keys):
+            raise ValueError('database is down')
+
+        loader = BatchLoader(failing)
+
+        async def load():
+            return await asyncio.gather(loader.load(1), loader.load(2),
+                                        return_exceptions=True)
+
+        errors = asyncio.run(load())
+        self.assertEqual([str(error) for error in errors],
+                         ['database is down'] * 2)
+        self.assertEqual(loader.stats['batches'], 1)
+
+    def test_cancelled_batch_reaches_every_caller(self):
+        tasks = []
+
+        async def hanging(keys):
+            tasks.append(asyncio.current_task())
+            await asyncio.get_running_loop().create_future()
+
+        loader = BatchLoader(hanging)
+
+        async def load():
+            callers = asyncio.gather(loader.load(1), loader.load(2),
+                                     return_exceptions=True)
+            while not tasks:
+                await asyncio.sleep(0)
+            tasks[0].cancel()
+            return await asyncio.wait_for(callers, timeout=1)
+
+        for error in asyncio.run(load()):
+            self.assertIsInstance(error, asyncio.CancelledError)
+
+    def test_wrong_number_of_values(self):
+        loader = BatchLoader(lambda keys: [1])
+
+        async def load():
+            return await asyncio.gather(loader.load(1), loader.load(2),
+                                        return_exceptions=True)
+
+        for error in asyncio.run(load()):
+            self.assertIsInstance(error, AssertionError)
+
+    def test_sync_engine_loads_single_keys(self):
+        self.assertFalse(SyncBatchedVariables.has_coroutine_variables)
+        result = run_sync(rule('stock', 5), SyncBatchedVariables(8),
+                          ReturnNumericActions())
+        self.assertEqual(result['action_result'], 1)
+        self.assertEqual(LOADED, [[8]])
+        with self.assertRaisesRegex(AssertionError, 'coroutine'):
+            BatchLoader(load_expiration_days).load_sync(1)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(AssertionError):
+            BatchLoader(load_stock, max_batch_size=0)
@@ -0,0 +1,75 @@
+import asyncio
+from mock import patch
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.cache import ResultCache
+from business_rules.engine import run
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+class PriceVariables(BaseVariables):
+
+    def __init__(self, price):
+        self._price = price
+
+    @numeric_rule_variable
+    def price(self):
+        return self._price
+
+
+RULE = {
+    'conditions': {'all': [
+        {'name': 'price', 'operator': 'greater_than', 'value': 10},
+        {'name': 'price', 'operator': 'less_than', 'value': 100},
+    ]},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 1}}],
+}
+
+
+class ResultCacheTests(TestCase):
+
+    def test_identical_facts_skip_condition_evaluation(self):
+        cache = ResultCache()
+        actions = ReturnNumericActions()
+        result = asyncio.run(run(RULE, PriceVariables(50), actions,
+                                 result_cache=cache))
+        self.assertEqual(result['action_result'], 1)
+
+        with patch('business_rules.engine.check_conditions_recursively') \
+                as check:
+            result = asyncio.run(run(RULE, PriceVariables(50), actions,
+                                     result_cache=cache))
+            self.assertEqual(check.call_count, 0)
+        self.assertEqual(result['action_result'], 1)
+        self.assertIsNone(asyncio.run(run(RULE, PriceVariables(5), actions,
+                                          result_cache=cache)))
+        self.assertEqual(cache.stats['hits'], 1)
+        self.assertEqual(cache.stats['misses'], 2)
+
+    def test_lru_eviction(self):
+        cache = ResultCache(max_size=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, True)
+        self.assertIsNone(cache.get('a'))
+        self.assertTrue(cache.get('c'))
+        self.assertEqual(cache.stats['evictions'], 1)
+
+    def test_ttl_expiration(self):
+        cache = ResultCache(ttl=10)
+        with patch('business_rules.cache.time.monotonic', return_value=0):
+            cache.set('a', False)
+        with patch('business_rules.cache.time.monotonic', return_value=5):
+            self.assertIs(cache.get('a'), False)
+        with patch('business_rules.cache.time.monotonic', return_value=11):
+            self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats['expirations'], 1)
+
+    def test_bump_version_invalidates_entries(self):
+        cache = ResultCache()
+        key = cache.make_key(RULE['conditions'], {'price': [1, 2]})
+        cache.set(key, True)
+        cache.bump_version()
+        self.assertIsNone(cache.get(
+            cache.make_key(RULE['conditions'], {'price': [1, 2]})))
@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import sys
+import tempfile
+
+from mock import patch
+
+from business_rules.cli import FactVariables, evaluate_facts, main
+from business_rules.operators import (
+    BooleanType,
+    NumericType,
+    SelectMultipleType,
+    StringType
+)
+
+from . import TestCase
+
+RULES = [{
+    'conditions': {'all': [
+        {'name': 'price', 'operator': 'less_than', 'value': 10},
+        {'name': 'region', 'operator': 'equal_to', 'value': 'north'},
+    ]},
+    'actions': [{'name': 'put_on_sale', 'params': {'percent': 10}}],
+}, {
+    'priority': 1,
+    'conditions': {'name': 'vip', 'operator': 'is_true', 'value': None},
+    'actions': [{'name': 'notify', 'params': {}}],
+}]
+
+FACTS = [
+    {'price': 5, 'region': 'north', 'vip': True},
+    {'price': 5, 'region': 'south', 'vip': False},
+    {'price': 50, 'region': 'north', 'vip': True},
+    {'price': 5, 'region': 'north', 'vip': False},
+]
+
+
+class CommandLineTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.rules_path = os.path.join(self.directory.name, 'rules.json')
+        with open(self.rules_path, 'w') as rules_file:
+            json.dump(RULES, rules_file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+        super().tearDown()
+
+    def evaluate(self, lines, **kwargs):
+        output = io.StringIO()
+        totals = evaluate_facts(self.rules_path, lines, output, **kwargs)
+        return [json.loads(line) for line in
+                output.getvalue().splitlines()], totals
+
+    def test_actions_triggered_per_fact(self):
+        lines = [json.dumps(facts) + '\n' for facts in FACTS]
+        results, totals = self.evaluate(lines, batch_size=3)
+        self.assertEqual(results, [
+            {'fact': 0, 'actions': [
+                {'name': 'notify', 'params': {}},
+                {'name': 'put_on_sale', 'params': {'percent': 10}}]},
+            {'fact': 2, 'actions': [{'name': 'notify', 'params': {}}]},
+            {'fact': 3, 'actions': [
+                {'name': 'put_on_sale', 'params': {'percent': 10}}]},
+        ])
+        self.assertEqual((totals['facts'], totals['triggered'],
+                          totals['actions'], totals['errors']),
+                         (4, 3, 4, 0))
+
+        first, _ = self.evaluate(lines, first_match=True)
+        self.assertEqual(first[0]['actions'],
+                         [{'name': 'notify', 'params': {}}])
+
+    def test_invalid_facts(self):
+        results, totals = self.evaluate(
+            ['[1]\n', '\n', '{"price": 5}\n', 'nope\n'])
+        self.assertEqual([result['fact'] for result in results], [0, 2, 3])
+        self.assertTrue(all('error' in result for result in results))
+        self.assertEqual((totals['facts'], totals['errors']), (3, 3))
+
+    def test_workers_keep_the_order(self):
+        lines = [json.dumps(FACTS[index % 4]) for index in range(200)]
+        single, _ = self.evaluate(lines, batch_size=7)
+        multiple, totals = self.evaluate(lines, workers=2, batch_size=7)
+        self.assertEqual(multiple, single)
+        self.assertEqual(totals['facts'], 200)
+
+    def test_main(self):
+        facts_path = os.path.join(self.directory.name, 'facts.jsonl')
+        output_path = os.path.join(self.directory.name, 'output.jsonl')
+        with open(facts_path, 'w') as facts_file:
+            facts_file.write('\n'.join(json.dumps(facts) for facts in FACTS))
+        stderr = io.StringIO()
+        with patch.object(sys, 'stderr', stderr):
+            status = main(['eval', '--rules', self.rules_path, '--facts',
+                           facts_path, '--output', output_path])
+        self.assertEqual(status, 0)
+        with open(output_path) as output_file:
+            self.assertEqual(len(output_file.readlines()), 3)
+        self.assertIn('4 facts, 3 triggering 4 actions', stderr.getvalue())
+
+    def test_fact_types(self):
+        variables = FactVariables({'price': 1.5, 'vip': False, 'name': 'a',
+                                   'tags': ['x']})
+        self.assertIs(variables.get_variable('price')[0], NumericType)
+        self.assertIs(variables.get_variable('vip')[0], BooleanType)
+        self.assertIs(variables.get_variable('name')[0], StringType)
+        self.assertIs(variables.get_variable('tags')[0], SelectMultipleType)
+        with self.assertRaises(AssertionError):
+            variables.get_variable('missing')
+
+    def test_schema(self):
+        schema_path = os.path.join(self.directory.name, 'schema.json')
+        with open(schema_path, 'w') as schema_file:
+            json.dump({'variables': [
+                {'name': 'price', 'field_type': 'numeric'},
+                {'name': 'region', 'field_type': 'string'},
+                {'name': 'vip', 'field_type': 'boolean'},
+            ]}, schema_file)
+        lines = [json.dumps(facts) for facts in FACTS]
+        with_schema, totals = self.evaluate(lines, schema_path=schema_path)
+        self.assertEqual(with_schema, self.evaluate(lines)[0])
+
+        # missing values read as None, cast by the type of the schema
+        results, _ = self.evaluate(['{"price": 5, "vip": true}'],
+                                   schema_path=schema_path)
+        self.assertEqual(results, [{'fact': 0, 'actions': [
+            {'name': 'notify', 'params': {}}]}])
+        results, _ = self.evaluate(['{"price": 5, "vip": true}'])
+        self.assertIn('error', results[0])
@@ -0,0 +1,126 @@
+import asyncio
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.engine import run
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+class DelayedVariables(BaseVariables):
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.cancelled = []
+
+    async def _delayed(self, name, delay, value):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        finally:
+            self.running -= 1
+        return value
+
+    @numeric_rule_variable
+    def slow(self):
+        return self._delayed('slow', 1, 0)
+
+    @numeric_rule_variable
+    def quick(self):
+        return self._delayed('quick', 0.01, 10)
+
+    @numeric_rule_variable
+    def other(self):
+        return self._delayed('other', 0.01, 10)
+
+    @numeric_rule_variable
+    def positive_later(self):
+        return self._delayed('positive_later', 0.05, 10)
+
+    @numeric_rule_variable
+    async def broken(self):
+        raise RuntimeError('backend down')
+
+
+def rule(conditions):
+    return {
+        'conditions': conditions,
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}],
+    }
+
+
+def positive(name):
+    return {'name': name, 'operator': 'greater_than', 'value': 0}
+
+
+async def timed(coroutine):
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await coroutine
+    return result, loop.time() - start
+
+
+class ConcurrentEvaluationTests(TestCase):
+
+    def test_any_returns_on_first_true_branch(self):
+        variables = DelayedVariables()
+        result, elapsed = asyncio.run(timed(run(
+            rule({'any': [positive('slow'), positive('quick')]}),
+            variables, ReturnNumericActions(), concurrent=True)))
+        self.assertEqual(result['action_result'], 1)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(variables.cancelled, ['slow'])
+
+    def test_all_returns_on_first_false_branch(self):
+        variables = DelayedVariables()
+        result, elapsed = asyncio.run(timed(run(
+            rule({'all': [positive('slow'),
+                          {'name': 'quick', 'operator': 'less_than',
+                           'value': 0}]}),
+            variables, ReturnNumericActions(), concurrent=True)))
+        self.assertIsNone(result)
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual(variables.cancelled, ['slow'])
+
+    def test_max_concurrency(self):
+        variables = DelayedVariables()
+        result = asyncio.run(run(
+            rule({'all': [positive('quick'), positive('other'),
+                          {'any': [positive('quick'), positive('other')]}]}),
+            variables, ReturnNumericActions(),
+            concurrent=True, max_concurrency=1))
+        self.assertEqual(result['action_result'], 1)
+        self.assertEqual(variables.max_running, 1)
+
+    def test_exception_of_undecisive_branch(self):
+        variables = DelayedVariables()
+        conditions = {'any': [positive('positive_later'), positive('broken')]}
+        serial = asyncio.run(run(rule(conditions), variables,
+                                 ReturnNumericActions()))
+        result = asyncio.run(run(rule(conditions), variables,
+                                 ReturnNumericActions(), concurrent=True))
+        self.assertEqual(serial['action_result'], 1)
+        self.assertEqual(result['action_result'], 1)
+
+        conditions = {'all': [positive('positive_later'), positive('broken')]}
+        with self.assertRaisesRegex(RuntimeError, 'backend down'):
+            asyncio.run(run(rule(conditions), variables,
+                            ReturnNumericActions(), concurrent=True))
+
+    def test_exception_of_first_branch_raised(self):
+        class Variables(DelayedVariables):
+            @numeric_rule_variable
+            async def late_broken(self):
+                await asyncio.sleep(0.05)
+                raise ValueError('late')
+
+        conditions = {'any': [positive('late_broken'), positive('broken')]}
+        with self.assertRaisesRegex(ValueError, 'late'):
+            asyncio.run(run(rule(conditions), Variables(),
+                            ReturnNumericActions(), concurrent=True))
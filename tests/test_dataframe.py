@@ -0,0 +1,179 @@
+from unittest import skipIf
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.sync_engine import check_conditions_recursively_sync
+from business_rules.variables import (
+    BaseVariables,
+    boolean_rule_variable,
+    numeric_rule_variable,
+    select_multiple_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+try:
+    import pandas as pd
+    from business_rules.dataframe import (
+        action_payloads,
+        condition_mask,
+        rule_masks
+    )
+except ImportError:
+    pd = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class RowVariables(BaseVariables):
+
+    def __init__(self, row):
+        self.row = row
+
+    @numeric_rule_variable
+    def price(self):
+        return self.row['price']
+
+    @numeric_rule_variable
+    def cost(self):
+        return self.row['cost']
+
+    @string_rule_variable
+    def name(self):
+        return self.row['name']
+
+    @boolean_rule_variable
+    def in_stock(self):
+        return self.row['in_stock']
+
+    @select_multiple_rule_variable()
+    def tags(self):
+        return self.row['tags']
+
+
+ROWS = {
+    'price': [1, 10, 10.5, 99.9, 100, 250],
+    'cost': [2, 5, 10.5, 50, 120, 100],
+    'name': ['Apple', 'banana', 'apple pie', '', 'Cherry', 'pineapple'],
+    'in_stock': [True, False, True, True, False, True],
+    'tags': [['fruit'], ['fruit', 'yellow'], [], ['red'], ['fruit', 'red'],
+             ['FRUIT']],
+}
+
+CONDITIONS = [
+    {'name': 'price', 'operator': 'greater_than', 'value': 10},
+    {'name': 'price', 'operator': 'greater_than_or_equal_to', 'value': 10},
+    {'name': 'price', 'operator': 'less_than', 'value': 100},
+    {'name': 'price', 'operator': 'less_than_or_equal_to', 'value': 100},
+    {'name': 'price', 'operator': 'equal_to', 'value': 10.5},
+    {'name': 'price', 'operator': 'greater_than', 'value': 'cost',
+     'value_is_variable': True},
+    {'name': 'name', 'operator': 'equal_to', 'value': 'Apple'},
+    {'name': 'name', 'operator': 'equal_to_case_insensitive',
+     'value': 'APPLE'},
+    {'name': 'name', 'operator': 'not_equal_to', 'value': 'Apple'},
+    {'name': 'name', 'operator': 'not_equal_to_case_insensitive',
+     'value': 'apple'},
+    {'name': 'name', 'operator': 'starts_with', 'value': 'app'},
+    {'name': 'name', 'operator': 'ends_with', 'value': 'apple'},
+    {'name': 'name', 'operator': 'contains', 'value': 'an'},
+    {'name': 'name', 'operator': 'matches_regex', 'value': '^[A-Z]'},
+    {'name': 'name', 'operator': 'non_empty', 'value': None},
+    {'name': 'in_stock', 'operator': 'is_true', 'value': None},
+    {'name': 'in_stock', 'operator': 'is_false', 'value': None},
+    {'name': 'tags', 'operator': 'contains_all', 'value': ['fruit']},
+    {'name': 'tags', 'operator': 'shares_no_elements_with',
+     'value': ['red']},
+    True,
+    {'any': [{'name': 'price', 'operator': 'less_than', 'value': 5},
+             {'all': [{'name': 'in_stock', 'operator': 'is_true',
+                       'value': None},
+                      {'name': 'name', 'operator': 'contains',
+                       'value': 'apple'}]}]},
+    {'name': 'price', 'operator': 'in_list', 'value': [10.5000001, 250, 7]},
+    {'name': 'price', 'operator': 'not_in_list', 'value': [1, 100]},
+    {'name': 'price', 'operator': 'in_list', 'value': []},
+    {'name': 'name', 'operator': 'in_list', 'value': ['Apple', '']},
+    {'name': 'name', 'operator': 'not_in_list', 'value': ['Apple']},
+    {'name': 'name', 'operator': 'in_list_case_insensitive',
+     'value': ['APPLE', 'cherry']},
+    {'name': 'name', 'operator': 'not_in_list_case_insensitive',
+     'value': ['APPLE', 'cherry']},
+]
+
+
+def expected_mask(conditions):
+    rows = [dict(zip(ROWS, values)) for values in zip(*ROWS.values())]
+    return [bool(check_conditions_recursively_sync(conditions,
+                                                   RowVariables(row)))
+            for row in rows]
+
+
+@skipIf(pd is None, 'pandas is not installed')
+class DataFrameTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.frame = pd.DataFrame(ROWS)
+
+    def test_masks_match_the_engine(self):
+        for conditions in CONDITIONS:
+            mask = condition_mask(conditions, self.frame, RowVariables)
+            self.assertEqual(mask.dtype, bool)
+            self.assertEqual([bool(value) for value in mask],
+                             expected_mask(conditions), conditions)
+
+    def test_infers_field_types_from_dtypes(self):
+        for conditions in CONDITIONS[:17]:
+            self.assertEqual(
+                list(condition_mask(conditions, self.frame)),
+                expected_mask(conditions), conditions)
+
+    def test_missing_values_never_match(self):
+        frame = pd.DataFrame({'price': [None, 20], 'name': [None, 'a']})
+        self.assertEqual(list(condition_mask(CONDITIONS[0], frame)),
+                         [False, True])
+        self.assertEqual(list(condition_mask(CONDITIONS[8], frame)),
+                         [True, True])
+        with self.assertRaisesRegex(AssertionError, 'not a column'):
+            condition_mask({'name': 'other', 'operator': 'equal_to',
+                            'value': 1}, frame)
+
+    @skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_arrow_table(self):
+        table = pyarrow.table({key: ROWS[key]
+                               for key in ('price', 'name', 'in_stock')})
+        for conditions in CONDITIONS[:17]:
+            if conditions.get('value_is_variable'):
+                continue
+            self.assertEqual(
+                list(condition_mask(conditions, table, RowVariables)),
+                expected_mask(conditions), conditions)
+
+    def test_rule_masks_and_action_payloads(self):
+        rules = [
+            {'conditions': CONDITIONS[0], 'actions': [
+                {'name': 'return_numeric', 'params': {'return_value': 1}}]},
+            {'conditions': CONDITIONS[15], 'priority': 1, 'actions': [
+                {'name': 'return_numeric', 'params': {'return_value': 2}}]},
+        ]
+        masks = rule_masks(rules, self.frame, RowVariables)
+        self.assertEqual(list(masks.columns), [0, 1])
+        self.assertEqual(list(masks[0]), expected_mask(CONDITIONS[0]))
+
+        payloads = action_payloads(rules, self.frame, RowVariables,
+                                   masks=masks)
+        self.assertEqual(payloads[0], [{'action_name': 'return_numeric',
+                                        'action_params': {'return_value': 2}}])
+        self.assertEqual(payloads[1], [])
+        self.assertEqual([len(actions) for actions in payloads],
+                         [1, 0, 2, 2, 1, 2])
+        first = action_payloads(rules, self.frame, RowVariables,
+                                stop_on_first_trigger=True)
+        self.assertEqual(first[5][0]['action_params'], {'return_value': 2})
+        self.assertEqual([len(actions) for actions in first],
+                         [1, 0, 1, 1, 1, 1])
+        ReturnNumericActions().return_numeric(**first[5][0]['action_params'])
@@ -0,0 +1,224 @@
+import asyncio
+import random
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.decision_table import DecisionTable
+from business_rules.engine import run_ordered
+from business_rules.ruleset import RuleSet
+from business_rules.sync_engine import run_all_sync, run_ordered_sync
+from business_rules.variables import (
+    BaseVariables,
+    MappingSchema,
+    MappingVariables,
+    boolean_rule_variable,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class TableVariables(BaseVariables):
+
+    def __init__(self, amount, country, member):
+        self.amount = amount
+        self.country_code = country
+        self.member = member
+
+    @numeric_rule_variable
+    def amount_spent(self):
+        return self.amount
+
+    @string_rule_variable
+    def country(self):
+        return self.country_code
+
+    @boolean_rule_variable
+    def is_member(self):
+        return self.member
+
+    @string_rule_variable
+    def name(self):
+        return 'apple'
+
+
+NUMERIC_OPERATORS = ['greater_than', 'greater_than_or_equal_to', 'less_than',
+                     'less_than_or_equal_to', 'equal_to']
+COUNTRIES = ['DE', 'de', 'AT', 'NL']
+
+
+def random_rule(rng, position):
+    conditions = []
+    for _ in range(rng.randint(0, 2)):
+        conditions.append({'name': 'amount_spent',
+                           'operator': rng.choice(NUMERIC_OPERATORS),
+                           'value': rng.choice([0, 10, 10.5, 100, 50])})
+    if rng.random() < 0.6:
+        conditions.append({'name': 'country',
+                           'operator': rng.choice(
+                               ['equal_to', 'equal_to_case_insensitive']),
+                           'value': rng.choice(COUNTRIES)})
+    if rng.random() < 0.3:
+        conditions.append({'name': 'is_member',
+                           'operator': rng.choice(['is_true', 'is_false']),
+                           'value': None})
+    if not conditions:
+        conditions = True
+    elif len(conditions) == 1 and rng.random() < 0.5:
+        conditions = conditions[0]
+    else:
+        conditions = {'all': conditions}
+    return {'conditions': conditions,
+            'actions': [{'name': 'return_numeric',
+                         'params': {'return_value': position}}]}
+
+
+class SparseVariables(BaseVariables):
+
+    def __init__(self, tier):
+        self.tier_name = tier
+        self.read = []
+
+    @string_rule_variable
+    def tier(self):
+        self.read.append('tier')
+        return self.tier_name
+
+    @numeric_rule_variable
+    def weight(self):
+        self.read.append('weight')
+        return None
+
+
+SPARSE_RULES = [
+    {'conditions': {'name': 'tier', 'operator': 'equal_to', 'value': 'gold'},
+     'actions': [{'name': 'return_numeric', 'params': {'return_value': 0}}]},
+    {'conditions': {'all': [
+        {'name': 'tier', 'operator': 'equal_to', 'value': 'silver'},
+        {'name': 'weight', 'operator': 'greater_than', 'value': 10},
+    ]}, 'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}]},
+    {'conditions': {'name': 'weight', 'operator': 'less_than', 'value': 5},
+     'actions': [{'name': 'return_numeric', 'params': {'return_value': 2}}]},
+]
+
+
+class DecisionTableTests(TestCase):
+
+    def test_same_result_as_rule_by_rule_evaluation(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            rules = [random_rule(rng, position)
+                     for position in range(rng.randint(1, 30))]
+            table = DecisionTable.compile(rules, TableVariables)
+            self.assertIsNotNone(table)
+            for amount in (-1, 0, 5, 10, 10.5, 10.50000001, 50, 99.999, 100,
+                           1000):
+                for country in COUNTRIES + ['']:
+                    for member in (True, False):
+                        variables = TableVariables(amount, country, member)
+                        expected = run_ordered_sync(
+                            rules, variables, ReturnNumericActions(),
+                            stop_on_first_trigger=True)
+                        self.assertEqual(
+                            table.run_sync(variables, ReturnNumericActions()),
+                            expected, (rules, amount, country, member))
+
+    def test_async_lookup_and_candidates(self):
+        rules = [random_rule(random.Random(position), position)
+                 for position in range(20)]
+        table = DecisionTable.compile(rules, TableVariables)
+        variables = TableVariables(10, 'DE', True)
+        candidates = [3, 7, 12, 19]
+
+        async def evaluate():
+            return (
+                await table.run(variables, ReturnNumericActions(), candidates),
+                await run_ordered([rules[index] for index in candidates],
+                                  variables, ReturnNumericActions(), True),
+            )
+
+        result, expected = asyncio.run(evaluate())
+        self.assertEqual(result, expected)
+
+    def test_contradicting_rules_never_trigger(self):
+        rules = [
+            {'conditions': {'all': [
+                {'name': 'amount_spent', 'operator': 'greater_than',
+                 'value': 10},
+                {'name': 'amount_spent', 'operator': 'less_than', 'value': 5},
+            ]}, 'actions': [{'name': 'return_numeric',
+                             'params': {'return_value': 1}}]},
+            {'conditions': {'all': [
+                {'name': 'country', 'operator': 'equal_to', 'value': 'DE'},
+                {'name': 'country', 'operator': 'equal_to', 'value': 'AT'},
+            ]}, 'actions': [{'name': 'return_numeric',
+                             'params': {'return_value': 2}}]},
+            {'conditions': False,
+             'actions': [{'name': 'return_numeric',
+                          'params': {'return_value': 3}}]},
+        ]
+        table = DecisionTable.compile(rules, TableVariables)
+        self.assertEqual(table.all_rules, 0)
+        self.assertEqual(table.run_sync(TableVariables(7, 'DE', True),
+                                        ReturnNumericActions()), [])
+
+    def test_other_shapes_are_not_compiled(self):
+        action = [{'name': 'return_numeric', 'params': {'return_value': 1}}]
+        for conditions in (
+                {'any': [
+                    {'name': 'country', 'operator': 'equal_to', 'value': 'DE'},
+                    {'name': 'country', 'operator': 'equal_to', 'value': 'AT'},
+                ]},
+                {'name': 'country', 'operator': 'starts_with', 'value': 'D'},
+                {'name': 'amount_spent', 'operator': 'equal_to',
+                 'value': 'amount_spent', 'value_is_variable': True},
+                {'name': 'unknown', 'operator': 'equal_to', 'value': 1},
+                {'all': [{'all': [{'name': 'name', 'operator': 'equal_to',
+                                   'value': 'apple'}]}]},
+        ):
+            self.assertIsNone(DecisionTable.compile(
+                [{'conditions': conditions, 'actions': action}],
+                TableVariables))
+        self.assertIsNone(DecisionTable.compile(
+            [{'conditions': True, 'actions': action * 2}], TableVariables))
+
+    def test_variables_read_as_rule_by_rule(self):
+        rules = RuleSet(SPARSE_RULES)
+        self.assertIsNotNone(rules.decision_table(SparseVariables('gold')))
+        variables = SparseVariables('gold')
+        self.assertEqual(
+            rules.run_sync(variables, ReturnNumericActions()),
+            [{'action_name': 'return_numeric',
+              'action_params': {'return_value': 0},
+              'action_result': 0}])
+        self.assertEqual(variables.read, ['tier'])
+        self.assertEqual(
+            asyncio.run(rules.run(variables, ReturnNumericActions())),
+            run_all_sync(SPARSE_RULES, variables, ReturnNumericActions(),
+                         stop_on_first_trigger=True))
+
+        # weight can't be cast: the rules left are checked one by one and
+        # raise as they do without the table
+        for tier in ('silver', 'bronze'):
+            variables = SparseVariables(tier)
+            with self.assertRaisesRegex(AssertionError,
+                                        'not a valid numeric type'):
+                rules.run_sync(variables, ReturnNumericActions())
+            self.assertEqual(variables.read, ['tier', 'weight', 'weight'])
+            with self.assertRaisesRegex(AssertionError,
+                                        'not a valid numeric type'):
+                asyncio.run(rules.run(variables, ReturnNumericActions()))
+
+    def test_sparse_mappings(self):
+        schema = MappingSchema({'tier': 'string', 'weight': 'numeric'})
+        rules = RuleSet(SPARSE_RULES)
+        self.assertIsNotNone(rules.decision_table(
+            MappingVariables({}, schema)))
+        result = rules.run_sync(MappingVariables({'tier': 'gold'}, schema),
+                                ReturnNumericActions())
+        self.assertEqual(result[0]['action_result'], 0)
+        result = rules.run_sync(
+            MappingVariables({'tier': 'silver', 'weight': 3}, schema),
+            ReturnNumericActions())
+        self.assertEqual(result[0]['action_result'], 2)
@@ -0,0 +1,195 @@
+import asyncio
+
+from business_rules import run, run_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.incremental import IncrementalEngine
+from business_rules.variables import (
+    BaseVariables,
+    boolean_rule_variable,
+    numeric_rule_variable,
+    rule_dependency,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class OrderVariables(BaseVariables):
+
+    def __init__(self):
+        self.loaded = []
+        self.running = 0
+        self.max_running = 0
+
+    async def _load(self, name, value):
+        self.loaded.append(name)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return value
+
+    @rule_dependency
+    async def customer(self):
+        return await self._load('customer', {'name': 'Jane', 'vip': True})
+
+    @rule_dependency
+    async def orders(self):
+        return await self._load('orders', [120, 80, 40])
+
+    @rule_dependency
+    def order_total(self, orders):
+        self.loaded.append('order_total')
+        return sum(orders)
+
+    @numeric_rule_variable()
+    def order_count(self, orders):
+        return len(orders)
+
+    @numeric_rule_variable()
+    def vip_total(self, customer, order_total):
+        return order_total if customer['vip'] else 0
+
+    @string_rule_variable()
+    def customer_name(self, customer):
+        return customer['name']
+
+    @boolean_rule_variable()
+    def has_orders(self, orders=None):
+        return bool(orders)
+
+
+class SyncOrderVariables(BaseVariables):
+
+    def __init__(self):
+        self.loaded = []
+
+    @rule_dependency
+    def orders(self):
+        self.loaded.append('orders')
+        return [120, 80, 40]
+
+    @numeric_rule_variable()
+    def order_count(self, orders):
+        return len(orders)
+
+    @numeric_rule_variable()
+    def largest_order(self, orders):
+        return max(orders)
+
+    @numeric_rule_variable()
+    def tax_rate(self):
+        return 20
+
+
+def rule(conditions):
+    return {
+        'conditions': conditions,
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}],
+    }
+
+
+class RuleDependencyTests(TestCase):
+
+    def test_dependency_graph(self):
+        self.assertEqual(OrderVariables.rule_dependencies, {
+            'order_total': ('orders',),
+            'order_count': ('orders',),
+            'vip_total': ('customer', 'order_total'),
+            'customer_name': ('customer',),
+            'has_orders': ('orders',),
+        })
+        self.assertTrue(OrderVariables.has_coroutine_variables)
+        self.assertFalse(SyncOrderVariables.has_coroutine_variables)
+        names = [variable['name']
+                 for variable in OrderVariables.get_all_variables()]
+        self.assertNotIn('orders', names)
+
+    def test_computed_once_per_evaluation(self):
+        variables = OrderVariables()
+        result = asyncio.run(run(rule({'all': [
+            {'name': 'order_count', 'operator': 'equal_to', 'value': 3},
+            {'name': 'vip_total', 'operator': 'greater_than', 'value': 200},
+            {'name': 'has_orders', 'operator': 'is_true', 'value': None},
+        ]}), variables, ReturnNumericActions()))
+        self.assertEqual(result['action_result'], 1)
+        self.assertEqual(sorted(variables.loaded),
+                         ['customer', 'order_total', 'orders'])
+
+        asyncio.run(run(rule({'name': 'order_count', 'operator': 'equal_to',
+                              'value': 3}), variables,
+                        ReturnNumericActions()))
+        # a new evaluation computes the dependency again
+        self.assertEqual(variables.loaded.count('orders'), 2)
+
+    def test_dependencies_are_computed_concurrently(self):
+        variables = OrderVariables()
+        asyncio.run(run(rule({'name': 'vip_total', 'operator': 'greater_than',
+                              'value': 0}), variables,
+                        ReturnNumericActions()))
+        self.assertEqual(variables.max_running, 2)
+
+    def test_unused_dependencies_are_not_computed(self):
+        variables = OrderVariables()
+        result = asyncio.run(run(rule({'all': [
+            {'name': 'order_count', 'operator': 'greater_than', 'value': 5},
+            {'name': 'customer_name', 'operator': 'equal_to',
+             'value': 'Jane'},
+        ]}), variables, ReturnNumericActions()))
+        self.assertIsNone(result)
+        self.assertEqual(variables.loaded, ['orders'])
+
+    def test_concurrent_conditions_share_dependencies(self):
+        variables = OrderVariables()
+        asyncio.run(run(rule({'all': [
+            {'name': 'order_count', 'operator': 'equal_to', 'value': 3},
+            {'name': 'has_orders', 'operator': 'is_true', 'value': None},
+        ]}), variables, ReturnNumericActions(), concurrent=True))
+        self.assertEqual(variables.loaded, ['orders'])
+
+    def test_sync_engine(self):
+        variables = SyncOrderVariables()
+        result = run_sync(rule({'all': [
+            {'name': 'order_count', 'operator': 'equal_to', 'value': 3},
+            {'name': 'largest_order', 'operator': 'equal_to', 'value': 120},
+        ]}), variables, ReturnNumericActions())
+        self.assertEqual(result['action_result'], 1)
+        self.assertEqual(variables.loaded, ['orders'])
+
+        variables = SyncOrderVariables()
+        run_sync(rule({'name': 'tax_rate', 'operator': 'equal_to',
+                       'value': 20}), variables, ReturnNumericActions())
+        self.assertEqual(variables.loaded, [])
+
+    def test_incremental_engine(self):
+        variables = SyncOrderVariables()
+        engine = IncrementalEngine([{
+            'conditions': {'all': [
+                {'name': 'order_count', 'operator': 'equal_to', 'value': 3},
+                {'name': 'largest_order', 'operator': 'greater_than',
+                 'value': 100},
+            ]},
+            'actions': [],
+        }])
+        flipped = asyncio.run(engine.update(1, variables))
+        self.assertEqual([change['current'] for change in flipped], [True])
+        self.assertEqual(variables.loaded, ['orders'])
+
+    def test_unknown_dependency(self):
+        with self.assertRaisesRegex(AssertionError, 'not a rule dependency'):
+            class Variables(BaseVariables):
+                @numeric_rule_variable()
+                def order_count(self, orderz):
+                    return len(orderz)
+
+    def test_cycle(self):
+        with self.assertRaisesRegex(AssertionError, 'cycle'):
+            class Variables(BaseVariables):
+                @rule_dependency
+                def orders(self, customer):
+                    return []
+
+                @rule_dependency
+                def customer(self, orders):
+                    return {}
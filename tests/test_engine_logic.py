@@ -156,11 +156,12 @@ class EngineTests(TestCase):
     ###
     def test_check_operator_comparison(self):
         string_type = StringType('yo yo')
-        with patch.object(string_type, 'contains', return_value=True):
+        # operator types have __slots__, so patch the class
+        with patch.object(StringType, 'contains', return_value=True):
             result = engine._do_operator_comparison(
                 string_type, 'contains', 'its mocked')
             self.assertTrue(result)
-            string_type.contains.assert_called_once_with('its mocked')
+            StringType.contains.assert_called_once_with('its mocked')
 
     ###
     ### Actions
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+from business_rules import run
+from business_rules.actions import BaseActions, rule_action
+from business_rules.executor import (
+    BlockingExecutor,
+    get_default_executor,
+    get_executor,
+    set_blocking_default
+)
+from business_rules.fields import FIELD_NUMERIC
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    rule_dependency
+)
+
+from . import TestCase
+
+POOL = BlockingExecutor(max_workers=2)
+
+
+class BlockingVariables(BaseVariables):
+
+    def __init__(self):
+        self.threads = {}
+
+    @numeric_rule_variable(blocking=True)
+    def stock(self):
+        self.threads['stock'] = threading.current_thread()
+        time.sleep(0.05)
+        return 10
+
+    @numeric_rule_variable(blocking=POOL)
+    def reserved(self, order_lines):
+        self.threads['reserved'] = threading.current_thread()
+        return sum(order_lines)
+
+    @rule_dependency(blocking=POOL)
+    def order_lines(self):
+        self.threads['order_lines'] = threading.current_thread()
+        return [1, 2]
+
+    @numeric_rule_variable()
+    def price(self):
+        self.threads['price'] = threading.current_thread()
+        return 5
+
+
+class BlockingActions(BaseActions):
+
+    def __init__(self):
+        self.threads = {}
+
+    @rule_action(params={'value': FIELD_NUMERIC}, blocking=POOL)
+    def save(self, value):
+        self.threads['save'] = threading.current_thread()
+        return value
+
+
+def rule(name, value):
+    return {
+        'conditions': {'name': name, 'operator': 'greater_than_or_equal_to',
+                       'value': value},
+        'actions': [{'name': 'save', 'params': {'value': 1}}],
+    }
+
+
+class BlockingExecutorTests(TestCase):
+
+    def tearDown(self):
+        set_blocking_default(False)
+        super().tearDown()
+
+    def test_blocking_variables_and_actions_run_in_threads(self):
+        variables, actions = BlockingVariables(), BlockingActions()
+        result = asyncio.run(run(rule('reserved', 3), variables, actions))
+        self.assertEqual(result['action_result'], 1)
+        for name in ('reserved', 'order_lines'):
+            self.assertTrue(variables.threads[name].name.startswith(
+                'business-rules'))
+        self.assertIsNot(variables.threads['reserved'],
+                         threading.main_thread())
+        self.assertIsNot(actions.threads['save'], threading.main_thread())
+
+        asyncio.run(run(rule('price', 3), variables, actions))
+        self.assertIs(variables.threads['price'], threading.main_thread())
+
+    def test_event_loop_is_not_blocked(self):
+        async def evaluate():
+            ticks = 0
+
+            async def tick():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.005)
+
+            ticker = asyncio.ensure_future(tick())
+            await asyncio.gather(*[
+                run(rule('stock', 1), BlockingVariables(), BlockingActions())
+                for _ in range(3)])
+            ticker.cancel()
+            return ticks
+
+        self.assertGreater(asyncio.run(evaluate()), 3)
+        self.assertGreaterEqual(get_default_executor().stats['completed'], 3)
+
+    def test_blocking_default(self):
+        variables = BlockingVariables()
+        set_blocking_default(True)
+        self.assertIs(get_executor(variables.price), get_default_executor())
+        asyncio.run(run(rule('price', 3), variables, BlockingActions()))
+        self.assertIsNot(variables.threads['price'], threading.main_thread())
+
+    def test_coroutines_are_not_offloaded(self):
+        async def coroutine_variable():
+            return 1
+
+        coroutine_variable.blocking = True
+        self.assertIsNone(get_executor(coroutine_variable))
+
+    def test_queue_stats(self):
+        executor = BlockingExecutor(max_workers=1)
+
+        async def calls():
+            return await asyncio.gather(*[
+                executor.run(time.sleep, 0.01) for _ in range(4)])
+
+        asyncio.run(calls())
+        stats = executor.stats
+        self.assertEqual(stats['submitted'], 4)
+        self.assertEqual(stats['completed'], 4)
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['running'], 0)
+        self.assertEqual(stats['max_queued'], 3)
+        self.assertGreater(stats['queue_time'], 0)
+        executor.shutdown()
+
+    def test_cancelled_calls_leave_the_queue(self):
+        executor = BlockingExecutor(max_workers=1)
+
+        async def cancel_queued():
+            first = asyncio.ensure_future(executor.run(time.sleep, 0.05))
+            second = asyncio.ensure_future(executor.run(time.sleep, 0.05))
+            await asyncio.sleep(0.01)
+            second.cancel()
+            await first
+
+        asyncio.run(cancel_queued())
+        self.assertEqual(executor.stats['queued'], 0)
+        self.assertEqual(executor.stats['completed'], 1)
+        executor.shutdown()
+
+    def test_invalid_pool_size(self):
+        with self.assertRaises(AssertionError):
+            BlockingExecutor(max_workers=0)
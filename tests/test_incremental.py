@@ -0,0 +1,77 @@
+import asyncio
+
+from business_rules.incremental import IncrementalEngine, InMemoryStateStore
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+class CountingVariables(BaseVariables):
+
+    def __init__(self, data):
+        self.data = data
+        self.calls = []
+
+    @numeric_rule_variable
+    def price(self):
+        self.calls.append('price')
+        return self.data['price']
+
+    @numeric_rule_variable
+    def stock(self):
+        self.calls.append('stock')
+        return self.data['stock']
+
+
+RULES = [
+    {'conditions': {'name': 'price', 'operator': 'greater_than', 'value': 10},
+     'actions': [{'name': 'expensive'}]},
+    {'conditions': {'all': [
+        {'name': 'stock', 'operator': 'less_than', 'value': 5},
+        {'name': 'price', 'operator': 'less_than', 'value': 100},
+    ]},
+     'actions': [{'name': 'reorder'}]},
+]
+
+
+class IncrementalEngineTests(TestCase):
+
+    def test_first_update_reports_true_rules(self):
+        engine = IncrementalEngine(RULES)
+        variables = CountingVariables({'price': 20, 'stock': 50})
+        flipped = asyncio.run(engine.update('p1', variables))
+        self.assertEqual([change['index'] for change in flipped], [0])
+        self.assertIsNone(flipped[0]['previous'])
+        self.assertTrue(flipped[0]['current'])
+
+    def test_update_reevaluates_only_affected_subtrees(self):
+        engine = IncrementalEngine(RULES)
+        asyncio.run(engine.update(
+            'p1', CountingVariables({'price': 20, 'stock': 50})))
+
+        variables = CountingVariables({'price': 20, 'stock': 1})
+        flipped = asyncio.run(engine.update(
+            'p1', variables, changed_variables=['stock']))
+        self.assertEqual([change['index'] for change in flipped], [1])
+        self.assertFalse(flipped[0]['previous'])
+        self.assertTrue(flipped[0]['current'])
+        # price < 100 was short-circuited before, so it is read once here
+        self.assertEqual(variables.calls, ['stock', 'price'])
+
+        variables = CountingVariables({'price': 20, 'stock': 1})
+        flipped = asyncio.run(engine.update(
+            'p1', variables, changed_variables=['unrelated']))
+        self.assertEqual(flipped, [])
+        self.assertEqual(variables.calls, [])
+
+        self.assertEqual(asyncio.run(engine.outcomes('p1')), [True, True])
+
+    def test_in_memory_store_evicts_least_recently_used(self):
+        store = InMemoryStateStore(max_entities=2)
+        engine = IncrementalEngine(RULES, store=store)
+        variables = CountingVariables({'price': 1, 'stock': 1})
+        for entity_id in ('a', 'b', 'c'):
+            asyncio.run(engine.update(entity_id, variables))
+        self.assertEqual(len(store), 2)
+        self.assertIsNone(store.get('a'))
+        self.assertEqual(asyncio.run(engine.outcomes('a')), [None, None])
@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import tempfile
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.loader import InvalidRuleFile, iter_rules, load_rules
+from business_rules.model import ModelBuilder, Rule
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class LoaderVariables(BaseVariables):
+
+    @numeric_rule_variable
+    def stock(self):
+        return 3
+
+    @string_rule_variable
+    def name(self):
+        return 'apple'
+
+
+def make_rule(value, name='stock', operator='greater_than'):
+    return {
+        'conditions': {'all': [
+            {'name': name, 'operator': operator, 'value': value},
+            {'name': 'name', 'operator': 'contains', 'value': 'a"],{\\'},
+        ]},
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': value}}],
+    }
+
+
+RULES = [make_rule(value) for value in range(20)]
+
+
+class LoaderTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, content, name='rules.json'):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as rules_file:
+            rules_file.write(content)
+        return path
+
+    def test_loads_json_array_in_small_chunks(self):
+        path = self.write(json.dumps(RULES, indent=2))
+        for chunk_size in (1, 7, 1 << 16):
+            rules = load_rules(path, LoaderVariables, ReturnNumericActions,
+                               chunk_size=chunk_size)
+            self.assertEqual([rule.to_dict() for rule in rules], RULES)
+            self.assertIsInstance(rules[0], Rule)
+
+    def test_loads_memory_mapped_file(self):
+        path = self.write(json.dumps(RULES))
+        self.assertEqual(load_rules(path, use_mmap=True, chunk_size=10),
+                         RULES)
+        self.assertEqual(load_rules(self.write('', 'empty.json'),
+                                    use_mmap=True), [])
+
+    def test_loads_json_lines(self):
+        content = '\n'.join(json.dumps(rule) for rule in RULES) + '\n\n'
+        self.assertEqual(load_rules(self.write(content), chunk_size=5), RULES)
+        self.assertEqual(load_rules(io.StringIO(content), jsonl=True), RULES)
+        self.assertEqual(load_rules(io.BytesIO(content.encode())), RULES)
+
+    def test_yields_rules_as_they_are_parsed(self):
+        rules = iter_rules(io.BytesIO(json.dumps(RULES).encode()),
+                           chunk_size=16)
+        self.assertEqual(next(rules), RULES[0])
+        self.assertEqual(len(list(rules)), len(RULES) - 1)
+
+    def test_reports_errors_and_goes_on(self):
+        content = '[{}, {"conditions": {"bad": ]}, 3, %s, %s, %s, %s, ' \
+                  '{"ok": 1},, %s' % (
+                      json.dumps(make_rule(1, name='unknown')),
+                      json.dumps(make_rule(1, operator='unknown')),
+                      json.dumps(RULES[0]),
+                      json.dumps(dict(RULES[1], actions=[{'name': 'other'}])),
+                      json.dumps(RULES[2])[:-5])
+        errors = []
+        rules = load_rules(io.StringIO(content), LoaderVariables,
+                           ReturnNumericActions, errors=errors, chunk_size=3)
+        self.assertEqual(rules, [RULES[0]])
+        self.assertEqual([error['index'] for error in errors],
+                         [0, 1, 2, 3, 4, 6, 7, 8, 9])
+        self.assertIn('Variable unknown is not defined', errors[3]['error'])
+        self.assertIn('Operator unknown does not exist', errors[4]['error'])
+        self.assertIn('Action other is not defined', errors[5]['error'])
+
+    def test_shares_constants_between_loads(self):
+        builder = ModelBuilder()
+        first = load_rules(io.StringIO(json.dumps(RULES)), builder=builder)
+        second = load_rules(io.StringIO(json.dumps(RULES)), builder=builder)
+        self.assertIs(first[0]['conditions']['all'][1],
+                      second[0]['conditions']['all'][1])
+
+    def test_invalid_documents(self):
+        for content in ('{"rules": []}x', '[1] [2]', 'x[]'):
+            with self.assertRaises(InvalidRuleFile):
+                load_rules(io.StringIO(content), jsonl=False)
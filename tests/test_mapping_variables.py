@@ -0,0 +1,93 @@
+import asyncio
+from decimal import Decimal
+
+from mock import patch
+
+from business_rules import export_rule_data, run, run_all_sync, run_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.loader import validate_rule
+from business_rules.operators import NumericType, StringType
+from business_rules.ruleset import RuleSet
+from business_rules.variables import (
+    BaseVariables,
+    MappingSchema,
+    MappingVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ProductVariables(BaseVariables):
+
+    @numeric_rule_variable()
+    def price(self):
+        raise NotImplementedError
+
+    @string_rule_variable()
+    def region(self):
+        raise NotImplementedError
+
+
+SCHEMA = MappingSchema(export_rule_data(ProductVariables,
+                                        ReturnNumericActions)['variables'])
+
+RULE = {
+    'conditions': {'all': [
+        {'name': 'price', 'operator': 'less_than', 'value': 10},
+        {'name': 'region', 'operator': 'equal_to', 'value': 'north'},
+    ]},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 1}}],
+}
+
+
+class MappingVariablesTests(TestCase):
+
+    def test_schema(self):
+        self.assertEqual(SCHEMA.field_types, {'price': NumericType,
+                                              'region': StringType})
+        self.assertEqual(
+            MappingSchema({'price': 'numeric', 'region': StringType})
+            .field_types, SCHEMA.field_types)
+        self.assertEqual(SCHEMA.get_all_variables(),
+                         ProductVariables.get_all_variables())
+        with self.assertRaises(AssertionError):
+            MappingSchema({'price': 'decimal'})
+        with self.assertRaises(AssertionError):
+            MappingSchema({'price': int})
+
+    def test_engines(self):
+        actions = ReturnNumericActions()
+        variables = MappingVariables({'price': 5, 'region': 'north'}, SCHEMA)
+        self.assertEqual(variables.get_variable('price'),
+                         (NumericType, Decimal(5)))
+        self.assertEqual(run_sync(RULE, variables, actions)['action_result'],
+                         1)
+        self.assertEqual(
+            asyncio.run(run(RULE, variables, actions))['action_result'], 1)
+        self.assertIsNone(run_sync(RULE, MappingVariables(
+            {'price': 5, 'region': 'south'}, SCHEMA), actions))
+
+        # missing values read as None
+        self.assertIsNone(run_sync(RULE, MappingVariables({'price': 5},
+                                                          SCHEMA), actions))
+        with self.assertRaisesRegex(AssertionError, 'not defined'):
+            run_sync({'conditions': {'name': 'stock', 'operator': 'equal_to',
+                                     'value': 1},
+                      'actions': RULE['actions']}, variables, actions)
+
+    def test_no_method_dispatch(self):
+        variables = MappingVariables({'price': 5, 'region': 'north'}, SCHEMA)
+        with patch('business_rules.engine._get_variable_method') as method:
+            asyncio.run(run(RULE, variables, ReturnNumericActions()))
+            run_all_sync([RULE], variables, ReturnNumericActions())
+        self.assertEqual(method.call_count, 0)
+
+    def test_schema_stands_for_the_variables_class(self):
+        validate_rule(RULE, SCHEMA)
+        rule_set = RuleSet([RULE])
+        variables = MappingVariables({'price': 5, 'region': 'north'}, SCHEMA)
+        self.assertIsNotNone(rule_set.decision_table(variables))
+        self.assertEqual(rule_set.run_sync(variables, ReturnNumericActions())
+                         [0]['action_result'], 1)
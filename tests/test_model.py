@@ -0,0 +1,141 @@
+import asyncio
+import json
+
+from business_rules import run, run_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.analysis import analyze_rules
+from business_rules.cache import ResultCache
+from business_rules.engine import InvalidRuleDefinition
+from business_rules.model import (
+    Condition,
+    ConditionGroup,
+    ModelBuilder,
+    Rule,
+    build_rules
+)
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    select_multiple_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ModelVariables(BaseVariables):
+
+    @numeric_rule_variable
+    def stock(self):
+        return 3
+
+    @string_rule_variable
+    def name(self):
+        return 'apple'
+
+    @select_multiple_rule_variable()
+    def tags(self):
+        return ['fruit', 'red']
+
+
+RULES = [
+    {
+        'id': 'first',
+        'conditions': {'all': [
+            {'name': 'stock', 'operator': 'greater_than', 'value': 1},
+            {'any': [
+                {'name': 'name', 'operator': 'equal_to', 'value': 'pear'},
+                {'name': 'tags', 'operator': 'contains_all',
+                 'value': ['fruit']},
+            ]},
+        ]},
+        'actions': [{'name': 'return_numeric', 'params': {'return_value': 7}}],
+    },
+    {
+        'conditions': {'name': 'stock', 'operator': 'greater_than',
+                       'value': 1},
+        'actions': [{'name': 'return_numeric', 'params': {'return_value': 7}}],
+    },
+    {
+        'conditions': True,
+        'actions': [{'name': 'return_numeric'}],
+    },
+]
+
+
+class ModelTests(TestCase):
+
+    def test_round_trip(self):
+        rules = json.loads(json.dumps(RULES))
+        model = build_rules(rules)
+        self.assertEqual([rule.to_dict() for rule in model], RULES)
+        self.assertEqual(model, RULES)
+        self.assertEqual(json.loads(json.dumps([rule.to_dict()
+                                                for rule in model])), RULES)
+        self.assertEqual(model[0]['id'], 'first')
+        self.assertIsInstance(model[0], Rule)
+        self.assertIsInstance(model[0]['conditions'], ConditionGroup)
+
+    def test_nodes_are_slotted(self):
+        condition = build_rules(RULES)[1]['conditions']
+        self.assertIsInstance(condition, Condition)
+        with self.assertRaises(AttributeError):
+            condition.__dict__
+        with self.assertRaises(TypeError):
+            condition['name'] = 'other'
+
+    def test_shares_names_and_constants(self):
+        first = json.loads(json.dumps(RULES))
+        second = json.loads(json.dumps(RULES))
+        builder = ModelBuilder()
+        model = build_rules(first, builder) + build_rules(second, builder)
+
+        condition = model[0]['conditions']['all'][0]
+        self.assertIs(condition, model[1]['conditions'])
+        self.assertIs(condition, model[3]['conditions']['all'][0])
+        self.assertIs(model[0]['actions'][0], model[4]['actions'][0])
+        tags = model[0]['conditions']['all'][1]['any'][1]['value']
+        self.assertEqual(tags, ('fruit',))
+        self.assertIs(tags, model[3]['conditions']['all'][1]['any'][1]['value'])
+        self.assertIs(condition.name, 'stock')
+
+    def test_keeps_equal_values_of_different_types_apart(self):
+        model = build_rules([
+            {'conditions': {'name': 'stock', 'operator': 'equal_to',
+                            'value': value},
+             'actions': [{'name': 'return_numeric'}]}
+            for value in (1, 1.0, True)])
+        self.assertEqual([type(rule['conditions']['value']) for rule in model],
+                         [int, float, bool])
+
+    def test_invalid_rules(self):
+        invalid = [
+            [],
+            {'conditions': True},
+            {'conditions': {'all': []}, 'actions': []},
+            {'conditions': {'all': [True], 'name': 'stock'}, 'actions': []},
+            {'conditions': {'name': 'stock', 'operator': 'equal_to'},
+             'actions': []},
+            {'conditions': True, 'actions': [{'params': {}}]},
+        ]
+        for rule in invalid:
+            with self.assertRaises(InvalidRuleDefinition):
+                ModelBuilder().build_rule(rule)
+
+    def test_engines_accept_the_model(self):
+        model = build_rules(RULES)
+        expected = {'action_name': 'return_numeric',
+                    'action_params': {'return_value': 7},
+                    'action_result': 7}
+        self.assertEqual(
+            run_sync(model[0], ModelVariables(), ReturnNumericActions()),
+            expected)
+        self.assertEqual(
+            asyncio.run(run(model[0], ModelVariables(),
+                            ReturnNumericActions(),
+                            result_cache=ResultCache())),
+            expected)
+
+    def test_analysis_accepts_the_model(self):
+        report = analyze_rules(build_rules(RULES), ModelVariables)
+        self.assertEqual(report['subsumed'], [{'index': 0, 'subsumed_by': 1}])
@@ -0,0 +1,253 @@
+import asyncio
+import random
+from unittest import skipIf
+
+from mock import patch
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.engine import VariableTimeout
+from business_rules.model import build_rules
+from business_rules.multipattern import (
+    BACKEND_PYAHOCORASICK,
+    AhoCorasick,
+    PatternIndex,
+    PrefixTrie,
+    SuffixTrie,
+    ahocorasick
+)
+from business_rules.ruleset import RuleSet
+from business_rules.sync_engine import check_conditions_recursively_sync
+from business_rules.variables import (
+    TIMEOUT_FALSE,
+    BaseVariables,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ContentVariables(BaseVariables):
+
+    def __init__(self, description, title=''):
+        self._description = description
+        self._title = title
+
+    @string_rule_variable()
+    def description(self):
+        return self._description
+
+    @string_rule_variable()
+    def title(self):
+        return self._title
+
+
+def random_strings(rng, count, alphabet='abcé', max_length=4):
+    return [''.join(rng.choice(alphabet)
+                    for _ in range(rng.randint(0, max_length)))
+            for _ in range(count)]
+
+
+def generate_rules(rng, count):
+    rules = []
+    for index in range(count):
+        leaves = [{'name': 'description',
+                   'operator': rng.choice(['contains', 'starts_with',
+                                           'ends_with']),
+                   'value': pattern}
+                  for pattern in random_strings(rng, rng.randint(1, 3))]
+        if index % 3 == 0:
+            # a guard of several conditions
+            leaves = [{rng.choice(['all', 'any']): leaves}]
+        rules.append({
+            'priority': rng.randint(0, 2),
+            'conditions': {rng.choice(['all', 'any']): leaves + [
+                {'name': 'title', 'operator': 'contains',
+                 'value': 'description', 'value_is_variable': True}]},
+            'actions': [{'name': 'return_numeric',
+                         'params': {'return_value': index}}],
+        })
+    return rules
+
+
+class MatcherTests(TestCase):
+
+    def test_matchers_find_the_patterns(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            patterns = random_strings(rng, 20)
+            for text in random_strings(rng, 20, max_length=12):
+                self.assertEqual(
+                    AhoCorasick(patterns, 'python').find(text),
+                    {pattern for pattern in patterns if pattern in text})
+                self.assertEqual(
+                    PrefixTrie(patterns).find(text),
+                    {pattern for pattern in patterns
+                     if text.startswith(pattern)})
+                self.assertEqual(
+                    SuffixTrie(patterns).find(text),
+                    {pattern for pattern in patterns
+                     if text.endswith(pattern)})
+
+    def test_overlapping_patterns(self):
+        automaton = AhoCorasick(['he', 'she', 'his', 'hers'], 'python')
+        self.assertEqual(automaton.find('ushers'), {'he', 'she', 'hers'})
+        self.assertEqual(automaton.find(''), set())
+        self.assertEqual(AhoCorasick(['', 'x'], 'python').find(''), {''})
+
+    def test_backends(self):
+        with self.assertRaisesRegex(AssertionError, 'Unknown backend'):
+            AhoCorasick(['a'], 'c')
+        if ahocorasick is None:
+            with self.assertRaises(ImportError):
+                AhoCorasick(['a'], BACKEND_PYAHOCORASICK)
+
+    @skipIf(ahocorasick is None, 'pyahocorasick is not installed')
+    def test_pyahocorasick_backend(self):
+        rng = random.Random(8)
+        patterns = random_strings(rng, 50)
+        python = AhoCorasick(patterns, 'python')
+        accelerated = AhoCorasick(patterns, BACKEND_PYAHOCORASICK)
+        for text in random_strings(rng, 50, max_length=12):
+            self.assertEqual(accelerated.find(text), python.find(text))
+
+
+COLORS = ['red', 'green', 'blue', 'cyan', 'magenta', 'yellow', 'black',
+          'white']
+
+
+def color_rules():
+    return [{'conditions': {'name': 'description', 'operator': 'contains',
+                            'value': word},
+             'actions': [{'name': 'return_numeric',
+                          'params': {'return_value': index}}]}
+            for index, word in enumerate(COLORS)]
+
+
+class CountingVariables(ContentVariables):
+
+    def __init__(self, description, delay=0):
+        super().__init__(description)
+        self.delay = delay
+        self.reads = 0
+
+    @string_rule_variable()
+    def description(self):
+        self.reads += 1
+        return self._description
+
+
+class SlowVariables(CountingVariables):
+
+    @string_rule_variable(timeout=0.05)
+    async def slow_description(self):
+        self.reads += 1
+        await asyncio.sleep(self.delay)
+        return self._description
+
+
+class PatternIndexTests(TestCase):
+
+    def test_indexes_variables_with_many_patterns(self):
+        rules = generate_rules(random.Random(1), 20)
+        index = PatternIndex(rules)
+        self.assertEqual(list(index.matchers), ['description'])
+        self.assertEqual(len(PatternIndex(rules[:1])), 0)
+
+    def test_same_results_as_the_operators(self):
+        rng = random.Random(2)
+        rules = generate_rules(rng, 40)
+        actions = ReturnNumericActions()
+        for built in (rules, build_rules(rules)):
+            indexed, plain = RuleSet(built), RuleSet(
+                built, use_pattern_index=False)
+            self.assertIsNotNone(indexed.pattern_index)
+            self.assertIsNone(plain.pattern_index)
+            for text in random_strings(rng, 30, max_length=10):
+                variables = ContentVariables(text, title=text[:2])
+                for first in (True, False):
+                    self.assertEqual(
+                        indexed.run_sync(variables, actions, first),
+                        plain.run_sync(variables, actions, first), text)
+                self.assertEqual(
+                    asyncio.run(indexed.run(variables, actions, False)),
+                    plain.run_sync(variables, actions, False))
+
+    def test_guards(self):
+        rules = generate_rules(random.Random(3), 30)
+        index = PatternIndex(rules)
+        self.assertEqual(
+            sorted(index.guards),
+            [position for position, rule in enumerate(rules)
+             if 'all' in rule['conditions']])
+        self.assertEqual(index.guard_variables, {'description'})
+        values = {'description': 'abcab'}
+        candidates = index.candidates(range(30), values, {})
+        for position, rule in enumerate(rules):
+            if position in index.guards:
+                self.assertEqual(position in candidates, bool(
+                    check_conditions_recursively_sync(
+                        index.guards[position], ContentVariables('abcab'))))
+            else:
+                self.assertIn(position, candidates)
+        self.assertEqual(index.candidates([2, 1], values, {}),
+                         [position for position in [2, 1]
+                          if position in candidates])
+
+    def test_variable_errors_are_left_to_the_rules(self):
+        rule_set = RuleSet(generate_rules(random.Random(4), 20))
+        with self.assertRaisesRegex(AssertionError, 'not a valid string'):
+            rule_set.run_sync(ContentVariables(5), ReturnNumericActions())
+
+    def test_one_pass_per_evaluation(self):
+        rule_set = RuleSet(color_rules())
+        with patch.object(AhoCorasick, 'find',
+                          autospec=True,
+                          side_effect=AhoCorasick.find) as find:
+            results = rule_set.run_sync(
+                ContentVariables('a green and yellow box'),
+                ReturnNumericActions(), stop_on_first_trigger=False)
+        self.assertEqual([result['action_result'] for result in results],
+                         [1, 5])
+        self.assertEqual(find.call_count, 1)
+
+    def test_guard_variables_read_once(self):
+        rule_set = RuleSet(color_rules())
+        variables = CountingVariables('a green and yellow box')
+        results = rule_set.run_sync(variables, ReturnNumericActions(),
+                                    stop_on_first_trigger=False)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(variables.reads, 1)
+        results = asyncio.run(rule_set.run(variables, ReturnNumericActions(),
+                                           stop_on_first_trigger=False))
+        self.assertEqual(len(results), 2)
+        self.assertEqual(variables.reads, 2)
+
+    def test_guard_variable_timeout(self):
+        rules = color_rules()
+        for rule in rules:
+            rule['conditions']['name'] = 'slow_description'
+        rule_set = RuleSet(rules)
+
+        async def evaluate(variables, **kwargs):
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            try:
+                return await rule_set.run(variables, ReturnNumericActions(),
+                                          **kwargs)
+            finally:
+                self.assertLess(loop.time() - start, 0.09)
+
+        variables = SlowVariables('green', delay=1)
+        with self.assertRaises(VariableTimeout):
+            asyncio.run(evaluate(variables))
+        self.assertEqual(variables.reads, 1)
+
+        variables = SlowVariables('green', delay=1)
+        self.assertEqual(asyncio.run(evaluate(
+            variables, on_timeout=TIMEOUT_FALSE)), [])
+        self.assertEqual(variables.reads, 1)
+
+        variables = SlowVariables('green')
+        results = asyncio.run(evaluate(variables))
+        self.assertEqual(results[0]['action_result'], 1)
+        self.assertEqual(variables.reads, 1)
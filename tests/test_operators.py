@@ -1,7 +1,12 @@
 from decimal import Decimal
 
+from mock import patch
+
+from business_rules.model import build_rules
 from business_rules.operators import (
+    LIST_LOOKUPS,
     BooleanType,
+    ListConstant,
     NumericType,
     SelectMultipleType,
     SelectType,
@@ -51,6 +56,45 @@ class StringOperatorTests(TestCase):
         self.assertFalse(StringType("").non_empty())
         self.assertFalse(StringType(None).non_empty())
 
+    def test_in_list(self):
+        self.assertTrue(StringType("foo").in_list(["bar", "foo"]))
+        self.assertFalse(StringType("foo").in_list(["Foo"]))
+        self.assertFalse(StringType("foo").in_list([]))
+        self.assertTrue(StringType(None).in_list(["", "bar"]))
+        self.assertTrue(StringType("foo").not_in_list(("Foo", "bar")))
+        self.assertFalse(StringType("foo").not_in_list({"foo"}))
+        self.assertTrue(StringType("foo").in_list_case_insensitive(["FOO"]))
+        self.assertFalse(
+            StringType("foo").not_in_list_case_insensitive(["fOo"]))
+        with self.assertRaisesRegex(AssertionError, "not a valid list"):
+            StringType("foo").in_list("foo")
+        with self.assertRaisesRegex(AssertionError, "not a valid string"):
+            StringType("foo").in_list(["foo", 1])
+
+    def test_in_list_lookup_built_with_the_rule(self):
+        in_list = StringType.get_operator_function("in_list")
+        with patch("business_rules.operators.StringType.cast",
+                   side_effect=StringType.cast) as cast:
+            values = ListConstant(["bar", "foo"], LIST_LOOKUPS["in_list"])
+            self.assertEqual(cast.call_count, 2)
+            self.assertTrue(in_list("foo", values))
+            self.assertFalse(in_list("baz", values))
+        self.assertEqual(cast.call_count, 2)
+
+        condition = build_rules([{
+            'conditions': {'name': 'name', 'operator': 'in_list',
+                           'value': ['bar', 'foo']},
+            'actions': []}])[0]['conditions']
+        self.assertIsInstance(condition['value'], ListConstant)
+        self.assertEqual(condition['value'], ('bar', 'foo'))
+        self.assertTrue(in_list("foo", condition['value']))
+
+        # a plain list is looked up as it is at each call
+        values = ["bar"]
+        self.assertFalse(in_list("foo", values))
+        values.append("foo")
+        self.assertTrue(in_list("foo", values))
+
 
 class NumericOperatorTests(TestCase):
 
@@ -118,6 +162,29 @@ class NumericOperatorTests(TestCase):
         self.assertTrue(NumericType(10).less_than_or_equal_to(10.000002))
         self.assertTrue(NumericType(10).less_than_or_equal_to(10))
 
+    def test_numeric_in_list(self):
+        numbers = [20, 1, 10.000001, Decimal('5.5')]
+        self.assertTrue(NumericType(10).in_list(numbers))
+        self.assertTrue(NumericType(5.5).in_list(numbers))
+        self.assertTrue(NumericType(Decimal('19.999999')).in_list(numbers))
+        self.assertFalse(NumericType(10.00001).in_list(numbers))
+        self.assertFalse(NumericType(0).in_list(numbers))
+        self.assertFalse(NumericType(30).in_list(numbers))
+        self.assertFalse(NumericType(10).in_list([]))
+        self.assertTrue(NumericType(10.1).not_in_list(numbers))
+        self.assertFalse(NumericType(1).not_in_list(numbers))
+        with self.assertRaisesRegex(AssertionError, "not a valid numeric"):
+            NumericType(1).in_list([1, "2"])
+
+    def test_in_list_matches_equal_to(self):
+        numbers = [1, 2.5, 10, 10.0000015, 11]
+        for value in (0, 1, 1.000001, 2.4999995, 10.0000008, 10.000003,
+                      10.999999, 11.0000011, 12):
+            expected = any(NumericType(value).equal_to(number)
+                           for number in numbers)
+            self.assertEqual(NumericType(value).in_list(numbers), expected,
+                             value)
+
 
 class BooleanOperatorTests(TestCase):
 
@@ -192,3 +259,66 @@ class SelectMultipleOperatorTests(TestCase):
                          shares_no_elements_with([2, 3]))
         self.assertFalse(SelectMultipleType([1, 2, "a"]).
                          shares_no_elements_with([4, "A"]))
+
+
+class OperatorFunctionTests(TestCase):
+    """ Functional forms of the operators, evaluated on cast values """
+
+    def test_types_have_no_instance_dict(self):
+        for field_type, value in ((StringType, 'a'), (NumericType, 1),
+                                  (BooleanType, True), (SelectType, [1]),
+                                  (SelectMultipleType, [1])):
+            with self.assertRaises(AttributeError):
+                field_type(value).__dict__
+
+    def test_cast(self):
+        self.assertEqual(NumericType.cast(1.5), Decimal('1.5'))
+        self.assertEqual(StringType.cast(None), '')
+        with self.assertRaisesRegex(AssertionError, 'not a valid boolean'):
+            BooleanType.cast('yes')
+
+    def test_functions_match_methods(self):
+        cases = [
+            (StringType, 'hello', 'starts_with', 'he'),
+            (StringType, 'hello', 'equal_to_case_insensitive', 'HELLO'),
+            (StringType, '', 'non_empty', None),
+            (NumericType, 10, 'greater_than_or_equal_to', 10.0000001),
+            (NumericType, 10, 'less_than_or_equal_to', 9.999),
+            (NumericType, 10, 'equal_to', 10),
+            (NumericType, 10, 'in_list', [1, 10.0000001]),
+            (StringType, 'Hello', 'in_list_case_insensitive', ['hello']),
+            (BooleanType, False, 'is_false', None),
+            (SelectType, ['a', 'B'], 'contains', 'b'),
+            (SelectMultipleType, [1, 2], 'shares_exactly_one_element_with',
+             [2, 3]),
+        ]
+        for field_type, value, operator, other in cases:
+            function = field_type.get_operator_function(operator)
+            method = getattr(field_type(value), operator)
+            expected = method() if other is None else method(other)
+            self.assertEqual(function(field_type.cast(value), other),
+                             expected, operator)
+
+    def test_subclass_epsilon(self):
+        class CoarseNumericType(NumericType):
+            __slots__ = ()
+            EPSILON = Decimal('0.1')
+
+        for operator, other, expected in (
+                ('equal_to', 10.05, True), ('greater_than', 9.95, False),
+                ('greater_than_or_equal_to', 10.05, True),
+                ('less_than', 10.05, False),
+                ('less_than_or_equal_to', 9.95, True),
+                ('in_list', [1, 10.05], True),
+                ('not_in_list', [10.05], False)):
+            function = CoarseNumericType.get_operator_function(operator)
+            self.assertEqual(function(Decimal(10), other), expected,
+                             operator)
+            self.assertEqual(getattr(CoarseNumericType(10), operator)(other),
+                             expected, operator)
+        self.assertFalse(NumericType.get_operator_function('equal_to')(
+            Decimal(10), 10.05))
+
+    def test_unknown_operator(self):
+        with self.assertRaisesRegex(AssertionError, 'does not exist'):
+            StringType.get_operator_function('cast')
@@ -0,0 +1,127 @@
+import asyncio
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.engine import run
+from business_rules.optimizer import count_nodes, simplify
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+def leaf(name, operator, value):
+    return {'name': name, 'operator': operator, 'value': value}
+
+
+class OptimizerTests(TestCase):
+
+    def test_flattens_and_unwraps(self):
+        conditions = {'all': [
+            {'all': [leaf('x', 'equal_to', 'a')]},
+            {'any': [leaf('y', 'equal_to', 'b')]},
+            {'all': [leaf('z', 'equal_to', 'c'), leaf('w', 'equal_to', 'd')]},
+        ]}
+        simplified, changes = simplify(conditions)
+        self.assertEqual(simplified, {'all': [
+            leaf('x', 'equal_to', 'a'), leaf('y', 'equal_to', 'b'),
+            leaf('z', 'equal_to', 'c'), leaf('w', 'equal_to', 'd')]})
+        self.assertEqual(count_nodes(conditions), 8)
+        self.assertEqual(count_nodes(simplified), 5)
+        self.assertIn('flattened nested all', changes)
+        self.assertIn('unwrapped single condition any', changes)
+
+    def test_removes_duplicates(self):
+        simplified, changes = simplify({'any': [
+            leaf('x', 'equal_to', 'a'), leaf('x', 'equal_to', 'a')]})
+        self.assertEqual(simplified, leaf('x', 'equal_to', 'a'))
+        self.assertEqual(changes[0], 'removed duplicate condition x equal_to a')
+
+    def test_removes_duplicates_keeping_the_first(self):
+        group = {'all': [leaf('y', 'less_than', 1), leaf('x', 'less_than', 2)]}
+        simplified, changes = simplify({'any': [
+            leaf('x', 'shares_at_least_one_element_with', ['a', 'b']),
+            group,
+            leaf('x', 'equal_to', {'a': [1]}),
+            {'all': [leaf('y', 'less_than', 1), leaf('x', 'less_than', 2)]},
+            leaf('x', 'shares_at_least_one_element_with', ['a', 'b']),
+            leaf('x', 'equal_to', {'a': [1]}),
+        ]})
+        self.assertEqual(simplified, {'any': [
+            leaf('x', 'shares_at_least_one_element_with', ['a', 'b']),
+            group,
+            leaf('x', 'equal_to', {'a': [1]}),
+        ]})
+        self.assertEqual(len(changes), 3)
+
+    def test_large_groups(self):
+        leaves = [leaf('x', 'equal_to', str(index % 5000))
+                  for index in range(10000)]
+        simplified, changes = simplify({'any': leaves})
+        self.assertEqual(simplified['any'], leaves[:5000])
+        self.assertEqual(len(changes), 5000)
+
+    def test_folds_bounds_in_all(self):
+        simplified, _ = simplify({'all': [
+            leaf('x', 'greater_than', 5),
+            leaf('x', 'greater_than', 10),
+            leaf('x', 'less_than_or_equal_to', 20),
+            leaf('x', 'less_than', 30),
+            leaf('y', 'greater_than', 1),
+        ]})
+        self.assertEqual(simplified, {'all': [
+            leaf('x', 'greater_than', 10),
+            leaf('x', 'less_than_or_equal_to', 20),
+            leaf('y', 'greater_than', 1),
+        ]})
+
+    def test_folds_bounds_in_any(self):
+        simplified, _ = simplify({'any': [
+            leaf('x', 'greater_than', 5), leaf('x', 'greater_than', 10)]})
+        self.assertEqual(simplified, leaf('x', 'greater_than', 5))
+        simplified, _ = simplify({'any': [
+            leaf('x', 'greater_than', 5), leaf('x', 'less_than', 10)]})
+        self.assertIs(simplified, True)
+
+    def test_contradiction_is_constant_false(self):
+        simplified, changes = simplify({'any': [
+            {'all': [leaf('x', 'greater_than', 10),
+                     leaf('x', 'less_than', 5)]},
+            {'all': [leaf('x', 'equal_to', 1), leaf('x', 'equal_to', 2)]},
+        ]})
+        self.assertIs(simplified, False)
+        self.assertIn('all is always False: contradictory bounds on x',
+                      changes)
+        # touching bounds are kept, x == 5 satisfies both
+        simplified, _ = simplify({'all': [
+            leaf('x', 'greater_than_or_equal_to', 5),
+            leaf('x', 'less_than_or_equal_to', 5)]})
+        self.assertIsInstance(simplified, dict)
+
+    def test_ignores_non_numeric_and_variable_values(self):
+        conditions = {'all': [
+            leaf('x', 'equal_to', 'a'), leaf('x', 'equal_to', 'b'),
+            dict(leaf('x', 'greater_than', 'y'), value_is_variable=True),
+            leaf('x', 'greater_than', True)]}
+        simplified, changes = simplify(conditions)
+        self.assertEqual(simplified, conditions)
+        self.assertEqual(changes, [])
+
+    def test_engine_evaluates_simplified_conditions(self):
+        class Variables(BaseVariables):
+            @numeric_rule_variable
+            def x(self):
+                return 12
+
+        for conditions in (
+                {'all': [leaf('x', 'greater_than', 5),
+                         {'all': [leaf('x', 'greater_than', 10)]}]},
+                {'all': [leaf('x', 'greater_than', 10),
+                         leaf('x', 'less_than', 5)]}):
+            simplified, _ = simplify(conditions)
+            results = [
+                asyncio.run(run({'conditions': tree,
+                                 'actions': [{'name': 'return_numeric',
+                                              'params': {'return_value': 1}}]},
+                                Variables(), ReturnNumericActions()))
+                for tree in (conditions, simplified)
+            ]
+            self.assertEqual(results[0], results[1])
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import time
+
+from business_rules import run_all, run_all_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.profiling import Profiler, active_profiler
+from business_rules.ruleset import RuleSet
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ProductVariables(BaseVariables):
+
+    def __init__(self, price, region):
+        self._price = price
+        self._region = region
+
+    @numeric_rule_variable()
+    def price(self):
+        return self._price
+
+    @string_rule_variable()
+    def region(self):
+        return self._region
+
+
+class SlowPriceVariables(ProductVariables):
+
+    @numeric_rule_variable()
+    def price(self):
+        time.sleep(0.001)
+        return self._price
+
+
+RULES = [{
+    'id': 'cheap north',
+    'conditions': {'all': [
+        {'name': 'price', 'operator': 'less_than', 'value': 10},
+        {'name': 'region', 'operator': 'equal_to', 'value': 'north'},
+    ]},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 1}}],
+}, {
+    'id': 'never',
+    'conditions': {'any': [
+        {'name': 'price', 'operator': 'less_than', 'value': 0},
+        {'name': 'region', 'operator': 'equal_to', 'value': 'west'},
+    ]},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 2}}],
+}]
+
+# price < 10 for 2 of the 4 facts, north for 1 of those
+FACTS = [(5, 'north'), (5, 'south'), (50, 'north'), (50, 'south')]
+
+
+class ProfilerTests(TestCase):
+
+    def check_report(self, report):
+        cheap, never = report['rules']
+        self.assertEqual((cheap['id'], cheap['evaluations'],
+                          cheap['triggered']), ('cheap north', 4, 1))
+        self.assertEqual(cheap['hit_rate'], 0.25)
+        root, price, region = cheap['nodes']
+        self.assertEqual(root['kind'], 'all')
+        self.assertEqual(root['short_circuit_rate'], 0.5)
+        self.assertEqual((price['path'], price['evaluations'],
+                          price['hit_rate']), ([0], 4, 0.5))
+        self.assertEqual((region['path'], region['reached_rate'],
+                          region['hit_rate']), ([1], 0.5, 0.5))
+
+        self.assertEqual(never['triggered'], 0)
+        self.assertEqual(never['nodes'][0]['short_circuit_rate'], 0)
+        self.assertEqual({variable['name']: variable['calls']
+                          for variable in report['variables']},
+                         {'price': 8, 'region': 6})
+
+    def test_async_report(self):
+        profiler = Profiler()
+
+        async def workload():
+            await asyncio.gather(*[
+                run_all(RULES, ProductVariables(*facts),
+                        ReturnNumericActions()) for facts in FACTS])
+
+        with profiler:
+            asyncio.run(workload())
+        self.assertIsNone(active_profiler())
+        self.check_report(profiler.report())
+        self.assertEqual(json.loads(profiler.to_json())['rules'][0]['id'],
+                         'cheap north')
+        table = profiler.to_table()
+        self.assertIn('rule 0 (cheap north)', table)
+        self.assertIn('region equal_to', table)
+
+    def test_sync_report(self):
+        profiler = Profiler()
+        with profiler:
+            for facts in FACTS:
+                run_all_sync(RULES, ProductVariables(*facts),
+                             ReturnNumericActions())
+        self.check_report(profiler.report())
+
+    def test_rule_set_skips_decision_table(self):
+        rule_set = RuleSet(RULES)
+        profiler = Profiler()
+        with profiler:
+            for facts in FACTS:
+                rule_set.run_sync(ProductVariables(*facts),
+                                  ReturnNumericActions())
+        report = profiler.report()
+        self.assertEqual(report['rules'][0]['nodes'][1]['evaluations'], 4)
+
+    def test_not_profiling(self):
+        run_all_sync(RULES, ProductVariables(5, 'north'),
+                     ReturnNumericActions())
+        self.assertEqual(Profiler().report(), {'rules': [], 'variables': []})
+
+    def test_suggest_order(self):
+        profiler = Profiler()
+        with profiler:
+            for price in range(20):
+                run_all_sync(RULES, SlowPriceVariables(price, 'south'),
+                             ReturnNumericActions())
+        # region is cheaper and false every time, price is false half of
+        # the time
+        self.assertEqual(profiler.suggest_order(RULES[0]), {'all': [
+            {'name': 'region', 'operator': 'equal_to', 'value': 'north'},
+            {'name': 'price', 'operator': 'less_than', 'value': 10},
+        ]})
+        with self.assertRaises(AssertionError):
+            Profiler().suggest_order(RULES[0])
@@ -0,0 +1,95 @@
+import asyncio
+
+from business_rules import run_all, run_all_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.engine import InvalidRuleDefinition
+from business_rules.model import build_rules
+from business_rules.ruleset import RuleSet
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+class TierVariables(BaseVariables):
+
+    def __init__(self, amount):
+        self.amount = amount
+        self.calls = 0
+
+    @numeric_rule_variable
+    def amount_spent(self):
+        self.calls += 1
+        return self.amount
+
+
+def tier(minimum, discount, priority=None):
+    rule = {
+        'conditions': {'name': 'amount_spent',
+                       'operator': 'greater_than_or_equal_to',
+                       'value': minimum},
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': discount}}],
+    }
+    if priority is not None:
+        rule['priority'] = priority
+    return rule
+
+
+# listed in the wrong order on purpose, the priorities fix it
+TIERS = [tier(0, 0, priority=1), tier(100, 5, priority=2),
+         tier(1000, 10, priority=3), tier(1000, 99)]
+
+
+def discounts(results):
+    return [result['action_result'] for result in results]
+
+
+class RuleSetTests(TestCase):
+
+    def test_first_match_in_priority_order(self):
+        rule_set = RuleSet(TIERS, use_decision_table=False)
+        variables = TierVariables(150)
+        results = asyncio.run(rule_set.run(variables, ReturnNumericActions()))
+        self.assertEqual(discounts(results), [5])
+        # the 1000 tier is checked first, then the 100 tier wins
+        self.assertEqual(variables.calls, 2)
+
+    def test_first_match_through_decision_table(self):
+        rule_set = RuleSet(TIERS)
+        variables = TierVariables(150)
+        results = asyncio.run(rule_set.run(variables, ReturnNumericActions()))
+        self.assertEqual(discounts(results), [5])
+        self.assertEqual(variables.calls, 1)
+        self.assertIsNotNone(rule_set.decision_table(variables))
+
+    def test_all_matches(self):
+        results = RuleSet(TIERS).run_sync(
+            TierVariables(5000), ReturnNumericActions(),
+            stop_on_first_trigger=False)
+        self.assertEqual(discounts(results), [10, 5, 0, 99])
+
+    def test_candidates(self):
+        rule_set = RuleSet(build_rules(TIERS))
+        variables = TierVariables(5000)
+        results = rule_set.run_sync(variables, ReturnNumericActions(),
+                                    candidates=[3, 0, 1, 1])
+        self.assertEqual(discounts(results), [5])
+        self.assertEqual(rule_set.ordered([3, 0, 1]),
+                         [TIERS[1], TIERS[0], TIERS[3]])
+
+    def test_run_all(self):
+        results = asyncio.run(run_all(TIERS, TierVariables(150),
+                                      ReturnNumericActions(),
+                                      stop_on_first_trigger=True))
+        self.assertEqual(discounts(results), [5])
+        results = run_all_sync(TIERS, TierVariables(50),
+                               ReturnNumericActions())
+        self.assertEqual(discounts(results), [0])
+        self.assertEqual(run_all_sync([], TierVariables(50),
+                                      ReturnNumericActions()), [])
+
+    def test_invalid_priority(self):
+        for priority in ('high', True, None):
+            with self.assertRaisesRegex(InvalidRuleDefinition, 'Priority'):
+                RuleSet([tier(0, 0, priority=1), dict(tier(0, 0),
+                                                      priority=priority)])
@@ -0,0 +1,96 @@
+from business_rules import run_all_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.specialize import specialize, specialize_conditions
+from business_rules.variables import (
+    BaseVariables,
+    MappingSchema,
+    MappingVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class OrderVariables(BaseVariables):
+
+    @string_rule_variable()
+    def country(self):
+        raise NotImplementedError
+
+    @numeric_rule_variable()
+    def month(self):
+        raise NotImplementedError
+
+    @numeric_rule_variable()
+    def total(self):
+        raise NotImplementedError
+
+
+def _rule(conditions, value):
+    return {'conditions': conditions, 'actions': [
+        {'name': 'return_numeric', 'params': {'return_value': value}}]}
+
+
+RULES = [
+    _rule({'all': [
+        {'name': 'country', 'operator': 'equal_to', 'value': 'DE'},
+        {'name': 'total', 'operator': 'greater_than', 'value': 100},
+    ]}, 1),
+    _rule({'all': [
+        {'name': 'country', 'operator': 'equal_to', 'value': 'FR'},
+        {'name': 'total', 'operator': 'greater_than', 'value': 50},
+    ]}, 2),
+    _rule({'any': [
+        {'name': 'month', 'operator': 'equal_to', 'value': 12},
+        {'name': 'total', 'operator': 'less_than', 'value': 10},
+    ]}, 3),
+    _rule({'name': 'month', 'operator': 'less_than', 'value': 6}, 4),
+]
+
+
+class SpecializeTests(TestCase):
+
+    def test_folds_known_variables(self):
+        rules = specialize(RULES, {'country': 'DE', 'month': 12})
+        self.assertEqual([rule['conditions'] for rule in rules], [
+            {'name': 'total', 'operator': 'greater_than', 'value': 100},
+            True,
+        ])
+        self.assertEqual(
+            [rule['actions'][0]['params']['return_value'] for rule in rules],
+            [1, 3])
+        # the input rules are left as they are
+        self.assertIn('all', RULES[0]['conditions'])
+
+    def test_same_actions_as_the_original_rules(self):
+        schema = MappingSchema({'country': 'string', 'month': 'numeric',
+                                'total': 'numeric'})
+        known = {'country': 'FR', 'month': 3}
+        rules = specialize(RULES, known, OrderVariables)
+        for total in (5, 60, 200):
+            facts = dict(known, total=total)
+            self.assertEqual(
+                run_all_sync(rules, MappingVariables(facts, schema),
+                             ReturnNumericActions()),
+                run_all_sync(RULES, MappingVariables(facts, schema),
+                             ReturnNumericActions()))
+
+    def test_variable_values(self):
+        conditions = {'name': 'total', 'operator': 'greater_than',
+                      'value': 'month', 'value_is_variable': True}
+        self.assertIs(specialize_conditions(
+            conditions, {'total': 20, 'month': 12}), True)
+        # the other variable isn't known
+        self.assertEqual(specialize_conditions(conditions, {'total': 20}),
+                         conditions)
+
+    def test_keeps_conditions_that_raise(self):
+        conditions = {'name': 'month', 'operator': 'less_than',
+                      'value': 'June'}
+        self.assertEqual(specialize_conditions(conditions, {'month': 3},
+                                               OrderVariables), conditions)
+        # not a variable of the class
+        conditions = {'name': 'stock', 'operator': 'equal_to', 'value': 1}
+        self.assertEqual(specialize_conditions(conditions, {'stock': 1},
+                                               OrderVariables), conditions)
@@ -0,0 +1,205 @@
+import random
+import sqlite3
+
+from business_rules.sql import to_sql
+from business_rules.sync_engine import check_conditions_recursively_sync
+from business_rules.variables import (
+    BaseVariables,
+    boolean_rule_variable,
+    numeric_rule_variable,
+    select_multiple_rule_variable,
+    select_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class ProductVariables(BaseVariables):
+
+    def __init__(self, row):
+        self.row = row
+
+    @numeric_rule_variable
+    def price(self):
+        return self.row['price']
+
+    @numeric_rule_variable
+    def cost(self):
+        return self.row['cost']
+
+    @string_rule_variable
+    def name(self):
+        return self.row['name']
+
+    @boolean_rule_variable
+    def in_stock(self):
+        return bool(self.row['in_stock'])
+
+    @select_rule_variable()
+    def category(self):
+        return [self.row['category']]
+
+    @select_multiple_rule_variable()
+    def color(self):
+        return [self.row['color']]
+
+    @string_rule_variable
+    def description(self):
+        return self.row['description']
+
+
+COLUMNS = {'price': 'p.price', 'cost': 'p.cost', 'name': 'p.name',
+           'in_stock': 'p.in_stock', 'category': 'p.category',
+           'color': 'p.color'}
+
+NAMES = ['Apple', 'apple', 'Apple pie', 'pineapple', '100%_pure',
+         '100% pure', 'a\\b', '', None]
+
+LEAVES = [
+    {'name': 'price', 'operator': 'greater_than', 'value': 10},
+    {'name': 'price', 'operator': 'greater_than_or_equal_to', 'value': 10},
+    {'name': 'price', 'operator': 'less_than', 'value': 10.5},
+    {'name': 'price', 'operator': 'less_than_or_equal_to', 'value': 10.5},
+    {'name': 'price', 'operator': 'equal_to', 'value': 10.0000001},
+    {'name': 'price', 'operator': 'greater_than', 'value': 'cost',
+     'value_is_variable': True},
+    {'name': 'price', 'operator': 'equal_to', 'value': 'cost',
+     'value_is_variable': True},
+    {'name': 'name', 'operator': 'equal_to', 'value': 'Apple'},
+    {'name': 'name', 'operator': 'equal_to', 'value': ''},
+    {'name': 'name', 'operator': 'not_equal_to', 'value': 'Apple'},
+    {'name': 'name', 'operator': 'equal_to_case_insensitive',
+     'value': 'APPLE'},
+    {'name': 'name', 'operator': 'not_equal_to_case_insensitive',
+     'value': 'APPLE'},
+    {'name': 'name', 'operator': 'starts_with', 'value': 'App'},
+    {'name': 'name', 'operator': 'starts_with', 'value': '100%_'},
+    {'name': 'name', 'operator': 'ends_with', 'value': 'apple'},
+    {'name': 'name', 'operator': 'contains', 'value': 'a\\b'},
+    {'name': 'name', 'operator': 'contains', 'value': ''},
+    {'name': 'name', 'operator': 'matches_regex', 'value': '^[A-Z]'},
+    {'name': 'name', 'operator': 'non_empty', 'value': None},
+    {'name': 'in_stock', 'operator': 'is_true', 'value': None},
+    {'name': 'in_stock', 'operator': 'is_false', 'value': None},
+    {'name': 'category', 'operator': 'contains', 'value': 'FRUIT'},
+    {'name': 'category', 'operator': 'does_not_contain', 'value': 'fruit'},
+    {'name': 'color', 'operator': 'shares_at_least_one_element_with',
+     'value': ['Red', 'green']},
+    {'name': 'color', 'operator': 'is_contained_by', 'value': ['red']},
+    {'name': 'color', 'operator': 'shares_no_elements_with',
+     'value': ['red', 'green']},
+    {'name': 'color', 'operator': 'contains_all', 'value': ['red']},
+    {'name': 'description', 'operator': 'equal_to', 'value': 'x'},
+    {'name': 'price', 'operator': 'in_list', 'value': [10, 20.0000001]},
+    {'name': 'price', 'operator': 'not_in_list', 'value': [10.5, 1]},
+    {'name': 'price', 'operator': 'in_list', 'value': []},
+    {'name': 'name', 'operator': 'in_list', 'value': ['Apple', 'pineapple']},
+    {'name': 'name', 'operator': 'in_list', 'value': ['Apple', '']},
+    {'name': 'name', 'operator': 'not_in_list', 'value': ['apple', '']},
+    {'name': 'name', 'operator': 'in_list_case_insensitive',
+     'value': ['APPLE', 'a\\b']},
+    {'name': 'name', 'operator': 'not_in_list_case_insensitive',
+     'value': ['APPLE']},
+    {'name': 'name', 'operator': 'not_in_list', 'value': []},
+]
+
+
+def random_tree(rng, depth=0):
+    if depth == 2 or rng.random() < 0.4:
+        return rng.choice(LEAVES + [True, False])
+    return {rng.choice(['all', 'any']): [
+        random_tree(rng, depth + 1) for _ in range(rng.randint(1, 3))]}
+
+
+class SqlTests(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.connection = sqlite3.connect(':memory:')
+        self.addCleanup(self.connection.close)
+        self.connection.execute(
+            'CREATE TABLE p (id INTEGER PRIMARY KEY, price REAL, cost REAL, '
+            'name TEXT, in_stock INTEGER, category TEXT, color TEXT, '
+            'description TEXT)')
+        rng = random.Random(3)
+        self.rows = []
+        for row_id in range(300):
+            row = {
+                'id': row_id,
+                'price': rng.choice([1, 10, 10.000001, 10.5, 10.5000001, 20]),
+                'cost': rng.choice([1, 10, 10.5, 20]),
+                'name': rng.choice(NAMES),
+                'in_stock': rng.choice([0, 1]),
+                'category': rng.choice(['fruit', 'Fruit', 'vegetable']),
+                'color': rng.choice(['red', 'RED', 'green', 'blue']),
+                'description': rng.choice(['x', 'y']),
+            }
+            self.rows.append(row)
+            self.connection.execute(
+                'INSERT INTO p VALUES (:id, :price, :cost, :name, :in_stock, '
+                ':category, :color, :description)', row)
+
+    def select(self, conditions, case_sensitive_like=True):
+        where, params, residual = to_sql(
+            conditions, COLUMNS, ProductVariables,
+            case_sensitive_like=case_sensitive_like)
+        candidates = [
+            self.rows[row_id] for row_id, in self.connection.execute(
+                f'SELECT p.id FROM p WHERE {where}', params)]
+        if residual is not None:
+            candidates = [row for row in candidates if self.matches(
+                residual, row)]
+        return [row['id'] for row in candidates]
+
+    def matches(self, conditions, row):
+        return check_conditions_recursively_sync(conditions,
+                                                 ProductVariables(row))
+
+    def expected(self, conditions):
+        return [row['id'] for row in self.rows if self.matches(conditions,
+                                                               row)]
+
+    def test_leaves_match_the_engine(self):
+        self.connection.execute('PRAGMA case_sensitive_like = ON')
+        for conditions in LEAVES:
+            self.assertEqual(self.select(conditions),
+                             self.expected(conditions), conditions)
+
+    def test_trees_match_the_engine(self):
+        rng = random.Random(5)
+        for case_sensitive_like in (True, False):
+            self.connection.execute(
+                'PRAGMA case_sensitive_like = {0}'.format(
+                    'ON' if case_sensitive_like else 'OFF'))
+            for _ in range(100):
+                conditions = random_tree(rng)
+                self.assertEqual(
+                    self.select(conditions, case_sensitive_like),
+                    self.expected(conditions), conditions)
+
+    def test_residual(self):
+        regex = LEAVES[17]
+        where, params, residual = to_sql(
+            {'all': [LEAVES[0], regex, LEAVES[27]]}, COLUMNS,
+            ProductVariables)
+        self.assertEqual(where, 'p.price > ?')
+        self.assertEqual(params, [10.000001])
+        self.assertEqual(residual, {'all': [regex, LEAVES[27]]})
+
+        tree = {'any': [LEAVES[0], regex]}
+        self.assertEqual(to_sql(tree, COLUMNS, ProductVariables),
+                         ('1 = 1', [], tree))
+        where, params, residual = to_sql(
+            {'any': [LEAVES[12], LEAVES[7]]}, COLUMNS, ProductVariables,
+            paramstyle='format', case_sensitive_like=False)
+        self.assertEqual(where,
+                         "(p.name LIKE %s ESCAPE '\\') OR (p.name = %s)")
+        self.assertEqual(params, ['App%', 'Apple'])
+        self.assertEqual(residual, {'any': [LEAVES[12], LEAVES[7]]})
+        self.assertEqual(to_sql(False, COLUMNS, ProductVariables),
+                         ('1 = 0', [], None))
+
+    def test_unknown_paramstyle(self):
+        with self.assertRaisesRegex(AssertionError, 'paramstyle'):
+            to_sql(True, COLUMNS, ProductVariables, paramstyle='named')
@@ -0,0 +1,81 @@
+import asyncio
+
+from business_rules import run, run_sync
+from business_rules.actions import ReturnNumericActions
+from business_rules.cache import ResultCache
+from business_rules.sync_engine import supports_sync
+from business_rules.variables import (
+    CACHE_EVALUATION,
+    BaseVariables,
+    numeric_rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+
+class SyncVariables(BaseVariables):
+
+    def __init__(self):
+        self.calls = 0
+
+    @numeric_rule_variable(cache_scope=CACHE_EVALUATION)
+    def stock(self):
+        self.calls += 1
+        return 3
+
+    @string_rule_variable
+    def name(self):
+        return 'apple'
+
+
+class AsyncVariables(BaseVariables):
+
+    @numeric_rule_variable
+    async def stock(self):
+        return 3
+
+
+RULE = {
+    'conditions': {'any': [
+        {'name': 'name', 'operator': 'equal_to', 'value': 'pear'},
+        {'all': [
+            {'name': 'stock', 'operator': 'greater_than', 'value': 1},
+            {'name': 'stock', 'operator': 'less_than', 'value': 5},
+        ]},
+    ]},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 7}}],
+}
+
+
+class SyncEngineTests(TestCase):
+
+    def test_detects_coroutine_variables(self):
+        self.assertFalse(SyncVariables.has_coroutine_variables)
+        self.assertTrue(AsyncVariables.has_coroutine_variables)
+        self.assertTrue(supports_sync(SyncVariables(), ReturnNumericActions()))
+        self.assertFalse(supports_sync(AsyncVariables(),
+                                       ReturnNumericActions()))
+        with self.assertRaisesRegex(AssertionError, 'use engine.run'):
+            run_sync(RULE, AsyncVariables(), ReturnNumericActions())
+
+    def test_same_result_as_async_engine(self):
+        actions = ReturnNumericActions()
+        variables = SyncVariables()
+        result = run_sync(RULE, variables, actions)
+        self.assertEqual(result, asyncio.run(run(RULE, SyncVariables(),
+                                                 actions)))
+        self.assertEqual(result['action_result'], 7)
+        self.assertEqual(variables.calls, 1)
+
+        rule = dict(RULE, conditions={'name': 'stock', 'operator': 'equal_to',
+                                      'value': 4})
+        self.assertIsNone(run_sync(rule, SyncVariables(), actions))
+
+    def test_result_cache(self):
+        cache = ResultCache()
+        actions = ReturnNumericActions()
+        run_sync(RULE, SyncVariables(), actions, result_cache=cache)
+        result = run_sync(RULE, SyncVariables(), actions, result_cache=cache)
+        self.assertEqual(result['action_result'], 7)
+        self.assertEqual(cache.stats['hits'], 1)
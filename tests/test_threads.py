@@ -0,0 +1,144 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from mock import patch
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.cache import ResultCache, ShardedVariableCache
+from business_rules.incremental import InMemoryStateStore
+from business_rules.model import ModelBuilder, build_rules
+from business_rules.operators import StringType
+from business_rules.ruleset import RuleSet
+from business_rules.variables import BaseVariables, numeric_rule_variable
+
+from . import TestCase
+
+
+class PriceVariables(BaseVariables):
+
+    def __init__(self, price):
+        self._price = price
+
+    @numeric_rule_variable()
+    def price(self):
+        return self._price
+
+
+RULES = [{
+    'priority': threshold % 3,
+    'conditions': {'name': 'price', 'operator': 'greater_than',
+                   'value': threshold},
+    'actions': [{'name': 'return_numeric',
+                 'params': {'return_value': threshold}}],
+} for threshold in range(0, 100, 7)]
+
+
+class ThreadSafetyTests(TestCase):
+
+    def test_shared_rule_set_and_cache(self):
+        rule_set = RuleSet(build_rules(RULES), use_decision_table=False)
+        actions = ReturnNumericActions()
+
+        def evaluate(price, cache=None):
+            return [result['action_result'] for result in rule_set.run_sync(
+                PriceVariables(price), actions, stop_on_first_trigger=False,
+                result_cache=cache)]
+
+        expected = [evaluate(price % 110) for price in range(400)]
+        cache = ResultCache(shards=8)
+        with ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(lambda price: evaluate(price % 110, cache),
+                                    range(400)))
+        self.assertEqual(results, expected)
+        stats = cache.stats
+        self.assertEqual(stats['hits'] + stats['misses'],
+                         400 * len(RULES))
+        # threads missing the same key at once both compute it
+        self.assertEqual(stats['size'], 110 * len(RULES))
+        self.assertGreaterEqual(stats['misses'], stats['size'])
+
+    def test_shared_list_lookups(self):
+        in_list = StringType.get_operator_function('in_list')
+        conditions = build_rules([{
+            'conditions': {'name': 'name', 'operator': 'in_list',
+                           'value': [str(index + offset)
+                                     for offset in range(3)]},
+            'actions': [],
+        } for index in range(5000)])
+
+        def check(index):
+            values = conditions[index % len(conditions)]['conditions'][
+                'value']
+            return (in_list(str(index % len(conditions) + 1), values),
+                    in_list('x', values))
+
+        with patch('business_rules.operators.StringType.cast') as cast:
+            with ThreadPoolExecutor(8) as pool:
+                results = list(pool.map(check, range(20000)))
+        self.assertEqual(set(results), {(True, False)})
+        # the lookups were built with the rules
+        cast.assert_not_called()
+
+    def test_sharded_result_cache_evicts_per_shard(self):
+        cache = ResultCache(max_size=8, shards=4)
+        for key in range(100):
+            cache.set(key, True)
+        self.assertLessEqual(len(cache), 8)
+        self.assertEqual(cache.stats['evictions'], 100 - len(cache))
+        with self.assertRaises(AssertionError):
+            ResultCache(shards=0)
+
+    def test_sharded_variable_cache_computes_once(self):
+        cache = ShardedVariableCache(shards=4)
+        calls = []
+        lock = threading.Lock()
+
+        def compute(key):
+            with lock:
+                calls.append(key)
+            return key * 2
+
+        with ThreadPoolExecutor(8) as pool:
+            values = list(pool.map(
+                lambda key: cache.get_or_compute_sync(
+                    key % 10, lambda: compute(key % 10)),
+                range(200)))
+        self.assertEqual(values, [key % 10 * 2 for key in range(200)])
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(len(cache), 10)
+
+    def test_shared_state_store(self):
+        class YieldingStates(OrderedDict):
+            def get(self, key, default=None):
+                value = super().get(key, default)
+                # let another thread evict the entity before it is moved
+                time.sleep(0.0001)
+                return value
+
+        store = InMemoryStateStore(max_entities=2)
+        store._states = YieldingStates()
+
+        def work(worker):
+            for index in range(200):
+                entity_id = (worker + index) % 6
+                store.set(entity_id, {'index': index})
+                store.get(entity_id)
+                if index % 7 == 0:
+                    store.delete((entity_id + 1) % 6)
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(work, range(8)))
+        self.assertLessEqual(len(store), 2)
+
+    def test_model_is_immutable(self):
+        rule = ModelBuilder().build_rule(RULES[1])
+        with self.assertRaises(AttributeError):
+            rule.conditions = True
+        with self.assertRaises(AttributeError):
+            del rule['conditions'].value
+        with self.assertRaises(TypeError):
+            rule['actions'][0]['params']['return_value'] = 1
+        self.assertEqual(pickle.loads(pickle.dumps(rule)), RULES[1])
@@ -0,0 +1,107 @@
+import asyncio
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.engine import VariableTimeout, run
+from business_rules.operators import NumericType
+from business_rules.variables import (
+    TIMEOUT_DEFAULT,
+    TIMEOUT_FALSE,
+    BaseVariables,
+    numeric_rule_variable,
+    rule_variable
+)
+
+from . import TestCase
+
+
+class SlowVariables(BaseVariables):
+
+    def __init__(self):
+        self.cancelled = []
+
+    async def _slow(self, name, value):
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            self.cancelled.append(name)
+            raise
+        return value
+
+    @numeric_rule_variable
+    def fast(self):
+        return 1
+
+    @numeric_rule_variable
+    def slow(self):
+        return self._slow('slow', 100)
+
+    @numeric_rule_variable(timeout=0.01, on_timeout=TIMEOUT_DEFAULT,
+                           timeout_default=50)
+    def slow_with_default(self):
+        return self._slow('slow_with_default', 100)
+
+    @numeric_rule_variable(timeout=0.01, on_timeout=TIMEOUT_FALSE)
+    def slow_as_false(self):
+        return self._slow('slow_as_false', 100)
+
+
+def rule(conditions):
+    return {
+        'conditions': conditions,
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}],
+    }
+
+
+def greater_than(name, value):
+    return {'name': name, 'operator': 'greater_than', 'value': value}
+
+
+class TimeoutTests(TestCase):
+
+    def test_invalid_policy(self):
+        with self.assertRaisesRegex(AssertionError, 'not a valid timeout'):
+            rule_variable(NumericType, on_timeout='ignore')
+
+    def test_run_deadline_raises_by_default(self):
+        variables = SlowVariables()
+        with self.assertRaises(VariableTimeout) as context:
+            asyncio.run(run(rule(greater_than('slow', 10)), variables,
+                            ReturnNumericActions(), deadline=0.01))
+        self.assertEqual(context.exception.name, 'slow')
+        self.assertEqual(variables.cancelled, ['slow'])
+
+    def test_run_variable_timeout_as_false(self):
+        result = asyncio.run(run(
+            rule({'any': [greater_than('slow', 10), greater_than('fast', 0)]}),
+            SlowVariables(),
+            ReturnNumericActions(),
+            variable_timeout=0.01,
+            on_timeout=TIMEOUT_FALSE,
+        ))
+        self.assertEqual(result['action_result'], 1)
+
+    def test_declared_default_value(self):
+        actions = ReturnNumericActions()
+        variables = SlowVariables()
+        self.assertIsNotNone(asyncio.run(run(
+            rule(greater_than('slow_with_default', 10)), variables, actions)))
+        self.assertIsNone(asyncio.run(run(
+            rule(greater_than('slow_with_default', 60)), variables, actions)))
+        self.assertIsNone(asyncio.run(run(
+            rule(greater_than('slow_as_false', 10)), variables, actions)))
+        self.assertEqual(variables.cancelled,
+                         ['slow_with_default'] * 2 + ['slow_as_false'])
+
+    def test_expired_deadline_skips_remaining_variables(self):
+        variables = SlowVariables()
+        result = asyncio.run(run(
+            rule({'all': [greater_than('slow', 10),
+                          greater_than('slow_with_default', 10)]}),
+            variables,
+            ReturnNumericActions(),
+            deadline=0.01,
+            on_timeout=TIMEOUT_FALSE,
+        ))
+        self.assertIsNone(result)
+        self.assertEqual(variables.cancelled, ['slow'])
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+
+from mock import patch
+
+from business_rules.actions import ReturnNumericActions
+from business_rules.cache import GLOBAL_VARIABLE_CACHE, VariableCache
+from business_rules.engine import run
+from business_rules.operators import NumericType
+from business_rules.variables import (
+    CACHE_EVALUATION,
+    CACHE_INSTANCE,
+    BaseVariables,
+    numeric_rule_variable,
+    rule_variable,
+    string_rule_variable
+)
+
+from . import TestCase
+
+CALLS = []
+
+
+class CachedVariables(BaseVariables):
+
+    def __init__(self, region='eu'):
+        self.region = region
+
+    @numeric_rule_variable(cache_scope=CACHE_EVALUATION)
+    def per_evaluation(self):
+        CALLS.append('per_evaluation')
+        return 5
+
+    @numeric_rule_variable(cache_scope=CACHE_INSTANCE)
+    def per_instance(self):
+        CALLS.append('per_instance')
+        return 5
+
+    @string_rule_variable(cache_ttl=60, cache_key=lambda self: self.region)
+    def current_month(self):
+        CALLS.append('current_month')
+        return 'December'
+
+
+def between(name):
+    return {
+        'conditions': {'all': [
+            {'name': name, 'operator': 'greater_than', 'value': 1},
+            {'name': name, 'operator': 'less_than', 'value': 10},
+        ]},
+        'actions': [{'name': 'return_numeric',
+                     'params': {'return_value': 1}}],
+    }
+
+
+MONTH_RULE = {
+    'conditions': {'name': 'current_month', 'operator': 'equal_to',
+                   'value': 'December'},
+    'actions': [{'name': 'return_numeric', 'params': {'return_value': 1}}],
+}
+
+
+class VariableCacheScopeTests(TestCase):
+
+    def setUp(self):
+        del CALLS[:]
+        GLOBAL_VARIABLE_CACHE.clear()
+
+    def test_invalid_scope(self):
+        with self.assertRaisesRegex(AssertionError, 'not a valid cache scope'):
+            rule_variable(NumericType, cache_scope='forever')
+
+    def test_evaluation_scope(self):
+        variables = CachedVariables()
+        actions = ReturnNumericActions()
+        asyncio.run(run(between('per_evaluation'), variables, actions))
+        asyncio.run(run(between('per_evaluation'), variables, actions))
+        self.assertEqual(CALLS, ['per_evaluation'] * 2)
+
+    def test_instance_scope(self):
+        variables = CachedVariables()
+        actions = ReturnNumericActions()
+        asyncio.run(run(between('per_instance'), variables, actions))
+        asyncio.run(run(between('per_instance'), variables, actions))
+        asyncio.run(run(between('per_instance'), CachedVariables(), actions))
+        self.assertEqual(CALLS, ['per_instance'] * 2)
+
+    def test_global_scope_with_ttl_and_key(self):
+        actions = ReturnNumericActions()
+        with patch('business_rules.cache.time.monotonic', return_value=0):
+            asyncio.run(run(MONTH_RULE, CachedVariables('eu'), actions))
+            asyncio.run(run(MONTH_RULE, CachedVariables('eu'), actions))
+            asyncio.run(run(MONTH_RULE, CachedVariables('us'), actions))
+        self.assertEqual(CALLS, ['current_month'] * 2)
+        with patch('business_rules.cache.time.monotonic', return_value=61):
+            asyncio.run(run(MONTH_RULE, CachedVariables('eu'), actions))
+        self.assertEqual(CALLS, ['current_month'] * 3)
+
+
+class VariableCacheTests(TestCase):
+
+    def test_single_flight_in_event_loop(self):
+        cache = VariableCache()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 42
+
+        async def main():
+            return await asyncio.gather(
+                *[cache.get_or_compute('key', compute) for _ in range(10)])
+
+        self.assertEqual(asyncio.run(main()), [42] * 10)
+        self.assertEqual(len(calls), 1)
+
+    def test_single_flight_across_threads(self):
+        cache = VariableCache()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return 42
+
+        def worker():
+            results.append(asyncio.run(cache.get_or_compute('key', compute)))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_errors_are_not_cached(self):
+        cache = VariableCache()
+
+        def compute():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            asyncio.run(cache.get_or_compute('key', compute))
+        self.assertEqual(asyncio.run(cache.get_or_compute('key', lambda: 1)), 1)